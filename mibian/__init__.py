@@ -5,45 +5,244 @@ Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
 '''
 
 from math import log, e
-try:
-	from scipy.stats import norm
-except ImportError:
-	print('Mibian requires scipy to work properly')
+from mibian import instrumentation
+from mibian import normal as norm
 
 # WARNING: All numbers should be floats -> x = 1.0
 
-def impliedVolatility(className, args, callPrice=None, putPrice=None, high=500.0, low=0.0):
+# The pricing core only needs the standard library. Submodules are imported on
+# first access as attributes of the package, those of the vectorized features
+# then loading NumPy and SciPy.
+_SUBMODULES = ['batch', 'cache', 'chain', 'instrumentation', 'lattice', \
+		'montecarlo', 'normal', 'parallel', 'portfolio', 'rational', \
+		'scenario', 'server', 'shared', 'stream', 'surface', 'table', 'taylor', \
+		'tracker']
+
+def __getattr__(name):
+	if name not in _SUBMODULES:
+		raise AttributeError("module 'mibian' has no attribute " + repr(name))
+	from importlib import import_module
+	try:
+		return import_module('mibian.' + name)
+	except ModuleNotFoundError as error:
+		dependency = (error.name or '').split('.')[0]
+		if dependency not in ['numpy', 'scipy']:
+			raise
+		raise ImportError('mibian.%s requires %s, which is not installed' % \
+				(name, dependency), name=error.name) from error
+
+def __dir__():
+	return sorted(set(globals()) | set(_SUBMODULES))
+
+def impliedVolatility(className, args, callPrice=None, putPrice=None, high=500.0, \
+		low=0.0, tolerance=1e-10, relTolerance=1e-10, maxIterations=100, \
+		guess=None, table=None):
 	'''Returns the estimated implied volatility'''
+	return solveImpliedVolatility(className, args, callPrice, putPrice, high, \
+			low, tolerance, relTolerance, maxIterations, guess, table)[0]
+
+def solveImpliedVolatility(className, args, callPrice=None, putPrice=None, \
+		high=500.0, low=0.0, tolerance=1e-10, relTolerance=1e-10, \
+		maxIterations=100, guess=None, table=None):
+	'''Returns the implied volatility and the number of solver iterations:
+	[Implied volatility, Iterations]
+
+	Newton steps driven by the analytic vega, falling back to Brent's method
+	on the bracket [low, high] whenever a step leaves it. The search stops
+	when the repriced option is within tolerance + relTolerance * price of
+	the target price. With a mibian.table.InversionTable, the Newton steps
+	start from the table estimate inside the table bracket, and the search
+	on [low, high] only runs if they leave it.'''
+	model = globals()[className]
 	if callPrice:
-		target = callPrice
-		restimate = eval(className)(args, volatility=high, performance=True).callPrice  
-		if restimate < target:
-			return high
-		if args[0]>args[1] + callPrice:
-			return 0.001            
-	if putPrice:
-		target = putPrice
-		restimate = eval(className)(args, volatility=high, performance=True).putPrice
-		if restimate < target:
-			return high
-		if args[1]>args[0] + putPrice:
-			return 0.001            
-	decimals = len(str(target).split('.')[1])		# Count decimals
-	for i in range(10000):	# To avoid infinite loops
-		mid = (high + low) / 2
-		if mid < 0.00001:
-			mid = 0.00001
-		if callPrice:
-			estimate = eval(className)(args, volatility=mid, performance=True).callPrice
-		if putPrice:
-			estimate = eval(className)(args, volatility=mid, performance=True).putPrice
-		if round(estimate, decimals) == target: 
+		target = float(callPrice)
+		price = lambda o: o.callPrice
+	else:
+		target = float(putPrice)
+		price = lambda o: o.putPrice
+
+	if table is not None and guess is None:
+		[mid, tableLow, tableHigh] = table.estimate(className, args, \
+				target if callPrice else None, None if callPrice else target)
+		i = -1
+		if mid == mid:
+			for i in range(maxIterations):
+				estimate = model(args, volatility=mid, performance=True)
+				diff = price(estimate) - target
+				if abs(diff) <= tolerance + relTolerance * abs(target):
+					return _exit(mid, i + 1, 'converged')
+				vega = estimate._vega()
+				if className == 'GK':	# GK vega is per unit of volatility
+					vega /= 100
+				step = mid - diff / vega if vega > 0 else tableHigh
+				if not tableLow < step < tableHigh:
+					break
+				mid = step
+			guess = mid
+		# The seeded steps count against the same budget
+		[volatility, iterations] = solveImpliedVolatility(className, args, \
+				callPrice, putPrice, high, low, tolerance, relTolerance, \
+				maxIterations - i - 1, guess)
+		return [volatility, iterations + i + 1]
+
+	tolerance = tolerance + relTolerance * abs(target)
+
+	# Bracket
+	if low < 0.00001:
+		low = 0.00001
+	upper = model(args, volatility=high, performance=True)
+	fHigh = price(upper) - target
+	if fHigh < 0:
+		return _exit(high, 0, 'high')
+	fLow = price(model(args, volatility=low, performance=True)) - target
+	if fLow > 0:
+		return _exit(0.001, 0, 'low')
+
+	# Starting point: the inflection point of the price in the volatility,
+	# from where Newton steps are monotonic
+	if guess is None:
+		moneyness = abs(upper._a_ * (upper._d1_ + upper._d2_) / 2)
+		guess = 100 * (2 * moneyness / upper.daysToExpiration)**0.5
+		if guess <= low or guess >= high:
+			guess = (2 * 3.141592653589793 / upper.daysToExpiration)**0.5 * \
+					100 * target / upper.underlyingPrice
+	mid = min(max(guess, low), high)
+
+	for i in range(maxIterations):
+		estimate = model(args, volatility=mid, performance=True)
+		diff = price(estimate) - target
+		if abs(diff) <= tolerance:
+			return _exit(mid, i + 1, 'converged')
+		if diff > 0:
+			high, fHigh = mid, diff
+		else:
+			low, fLow = mid, diff
+		vega = estimate._vega()
+		if className == 'GK':	# GK vega is per unit of volatility
+			vega /= 100
+		step = mid - diff / vega if vega > 0 else high
+		if not low < step < high:
 			break
-		elif estimate > target: 
-			high = mid
-		elif estimate < target: 
-			low = mid
-	return mid
+		mid = step
+	else:
+		return _exit(mid, maxIterations, 'maxIterations')
+
+	f = lambda v: price(model(args, volatility=v, performance=True)) - target
+	[mid, iterations] = _brent(f, low, high, fLow, fHigh, tolerance, \
+			maxIterations - i - 1)
+	iterations += i + 1
+	return _exit(mid, iterations, \
+			'maxIterations' if iterations == maxIterations else 'brent')
+
+def _exit(volatility, iterations, reason):
+	'''Returns the solver result, recording why it stopped when instrumented:
+	[Implied volatility, Iterations]'''
+	if instrumentation.enabled:
+		instrumentation.recordSolver(reason, iterations)
+	return [volatility, iterations]
+
+def _brent(f, a, b, fa, fb, tolerance, maxIterations):
+	'''Returns a root of f bracketed by [a, b] using Brent's method:
+	[Root, Iterations]'''
+	c, fc = b, fb
+	d = e = b - a
+	i = 0
+	for i in range(1, maxIterations + 1):
+		if (fb > 0) == (fc > 0):
+			c, fc = a, fa
+			d = e = b - a
+		if abs(fc) < abs(fb):
+			a, fa, b, fb, c, fc = b, fb, c, fc, b, fb
+		xTolerance = 4.4e-16 * abs(b) + 1e-13
+		m = (c - b) / 2
+		if abs(fb) <= tolerance or abs(m) <= xTolerance:
+			return [b, i]
+		if abs(e) >= xTolerance and abs(fa) > abs(fb):
+			# Inverse quadratic interpolation, or secant when a == c
+			s = fb / fa
+			if a == c:
+				p, q = 2 * m * s, 1 - s
+			else:
+				q, r = fa / fc, fb / fc
+				p = s * (2 * m * q * (q - r) - (b - a) * (r - 1))
+				q = (q - 1) * (r - 1) * (s - 1)
+			if p > 0:
+				q = -q
+			p = abs(p)
+			if 2 * p < min(3 * m * q - abs(xTolerance * q), abs(e * q)):
+				e, d = d, p / q
+			else:
+				d = e = m
+		else:
+			d = e = m
+		a, fa = b, fb
+		if abs(d) > xTolerance:
+			b += d
+		else:
+			b += xTolerance if m > 0 else -xTolerance
+		fb = f(b)
+	return [b, i]
+
+def _lazy(methods):
+	'''Returns the lazily computed attributes of a model:
+	{attribute: [method, attributes set by the method]}'''
+	return dict((name, [method, names]) for method, names in methods.items() \
+			for name in names)
+
+# Higher order greeks of every model, each computed on its own first access.
+# Vannas and volgas are per volatility point, charms and colors
+# the changes of deltas and gammas per day passing, as thetas; the carry yield
+# is held fixed, as by the first order greeks.
+HIGHER_ORDER_GREEKS = ['vanna', 'volga', 'callCharm', 'putCharm', 'speed', \
+		'color']
+
+def _greek(self, name):
+	'''Computes a greek on first access and memoizes it in its slot, along
+	with the other greeks returned by the same method, the higher order greeks
+	each on their own'''
+	try:
+		[method, names] = type(self)._greeks_[name]
+	except KeyError:
+		if name not in HIGHER_ORDER_GREEKS:
+			raise AttributeError(name)
+		value = self._higherOrder([name])[name]
+		setattr(self, name, value)
+		return value
+	values = getattr(self, method)()
+	if len(names) == 1:
+		values = [values]
+	for i, value in zip(names, values):
+		setattr(self, i, value)
+	return values[names.index(name)]
+
+def _higherOrderGreeks(s, carry, q, r, t, v, d1, d2, density, cdf, greeks):
+	'''Returns the selected higher order greeks from the terms shared with
+	the first order ones, numbers or arrays alike: s the underlying price,
+	carry its discount e**(-qt), q the carry yield, r the rate, t the time to
+	expiration in years, v the volatility, density the normal density at d1
+	and cdf the normal distribution function: {greek: value}'''
+	root = t**0.5
+	a = v * root
+	weight = carry * density
+	result = {}
+	if 'vanna' in greeks:
+		result['vanna'] = -weight * d2 / v / 100
+	if 'volga' in greeks:
+		result['volga'] = s * weight * root * d1 * d2 / v / 10000
+	# Change of d1 with the time to expiration
+	if 'callCharm' in greeks or 'putCharm' in greeks or 'color' in greeks:
+		drift = (2 * (r - q) * t - d2 * a) / (2 * t * a)
+	if 'callCharm' in greeks:
+		result['callCharm'] = (q * carry * cdf(d1) - weight * drift) / 365
+	if 'putCharm' in greeks:
+		result['putCharm'] = (-q * carry * cdf(-d1) - weight * drift) / 365
+	if 'speed' in greeks or 'color' in greeks:
+		gamma = weight / (s * a)
+	if 'speed' in greeks:
+		result['speed'] = -gamma / s * (d1 / a + 1)
+	if 'color' in greeks:
+		result['color'] = gamma * (q + 1 / (2 * t) + drift * d1) / 365
+	return result
 
 class GK:
 	'''Garman-Kohlhagen
@@ -68,6 +267,12 @@ class GK:
 		c.putRhoF				# Returns the call foreign rho
 		c.vega					# Returns the option vega
 		c.gamma					# Returns the option gamma
+		c.vanna					# Returns the option vanna
+		c.volga					# Returns the option volga
+		c.callCharm				# Returns the call charm
+		c.putCharm				# Returns the put charm
+		c.speed					# Returns the option speed
+		c.color					# Returns the option color
 
 		c = mibian.GK([1.4565, 1.45, 1, 2, 30], callPrice=0.0359)
 		c.impliedVolatility		# Returns the implied volatility from the call price
@@ -79,6 +284,20 @@ class GK:
 		c.putCallParity			# Returns the put-call parity
 	'''
 
+	_greeks_ = _lazy({'_delta': ['callDelta', 'putDelta'], \
+			'_delta2': ['callDelta2', 'putDelta2'], \
+			'_theta': ['callTheta', 'putTheta'], \
+			'_rhod': ['callRhoD', 'putRhoD'], \
+			'_rhof': ['callRhoF', 'putRhoF'], '_vega': ['vega'], \
+			'_gamma': ['gamma'], \
+			'_exerciceProbability': ['exerciceProbability']})
+	__slots__ = ('underlyingPrice', 'strikePrice', 'domesticRate', \
+			'foreignRate', 'daysToExpiration', 'volatility', 'callPrice', \
+			'putPrice', 'impliedVolatility', 'putCallParity', '_a_', '_d1_', \
+			'_d2_', '_domesticDiscount_', '_foreignDiscount_') + \
+			tuple(_greeks_) + tuple(HIGHER_ORDER_GREEKS)
+	__getattr__ = _greek
+
 	def __init__(self, args, volatility=None, callPrice=None, putPrice=None, \
 			performance=None):
 		self.underlyingPrice = float(args[0])
@@ -87,11 +306,9 @@ class GK:
 		self.foreignRate = float(args[3]) / 100
 		self.daysToExpiration = float(args[4]) / 365
 
-		for i in ['callPrice', 'putPrice', 'callDelta', 'putDelta', \
-				'callDelta2', 'putDelta2', 'callTheta', 'putTheta', \
-				'callRhoD', 'putRhoD', 'callRhoF', 'callRhoF', 'vega', \
-				'gamma', 'impliedVolatility', 'putCallParity']:
-			self.__dict__[i] = None
+		for i in ['callPrice', 'putPrice', 'impliedVolatility', \
+				'putCallParity']:
+			setattr(self, i, None)
 		
 		if volatility:
 			self.volatility = float(volatility) / 100
@@ -101,19 +318,15 @@ class GK:
 				(self.domesticRate - self.foreignRate + \
 				(self.volatility**2)/2) * self.daysToExpiration) / self._a_
 			self._d2_ = self._d1_ - self._a_
-			# Reduces performance overhead when computing implied volatility
-			if performance:		
-				[self.callPrice, self.putPrice] = self._price()
-			else:
-				[self.callPrice, self.putPrice] = self._price()
-				[self.callDelta, self.putDelta] = self._delta()
-				[self.callDelta2, self.putDelta2] = self._delta2()
-				[self.callTheta, self.putTheta] = self._theta()
-				[self.callRhoD, self.putRhoD] = self._rhod()
-				[self.callRhoF, self.putRhoF] = self._rhof()
-				self.vega = self._vega()
-				self.gamma = self._gamma()
-				self.exerciceProbability = norm.cdf(self._d2_)
+			self._domesticDiscount_ = e**(-self.domesticRate * \
+					self.daysToExpiration)
+			self._foreignDiscount_ = e**(-self.foreignRate * \
+					self.daysToExpiration)
+			# Greeks are computed on first access
+			[self.callPrice, self.putPrice] = self._price()
+		else:
+			for i in list(self._greeks_) + HIGHER_ORDER_GREEKS:
+				setattr(self, i, None)
 		if callPrice:
 			self.callPrice = round(float(callPrice), 6)
 			self.impliedVolatility = impliedVolatility(\
@@ -135,13 +348,11 @@ class GK:
 		if self.strikePrice == 0:
 			raise ZeroDivisionError('The strike price cannot be zero')
 		else:
-			call = e**(-self.foreignRate * self.daysToExpiration) * \
-					self.underlyingPrice * norm.cdf(self._d1_) - \
-					e**(-self.domesticRate * self.daysToExpiration) * \
+			call = self._foreignDiscount_ * self.underlyingPrice * \
+					norm.cdf(self._d1_) - self._domesticDiscount_ * \
 					self.strikePrice * norm.cdf(self._d2_)
-			put = e**(-self.domesticRate * self.daysToExpiration) * \
-					self.strikePrice * norm.cdf(-self._d2_) - \
-					e**(-self.foreignRate * self.daysToExpiration) * \
+			put = self._domesticDiscount_ * self.strikePrice * \
+					norm.cdf(-self._d2_) - self._foreignDiscount_ * \
 					self.underlyingPrice * norm.cdf(-self._d1_)
 		return [call, put]
 
@@ -153,7 +364,7 @@ class GK:
 		if self.strikePrice == 0:
 			raise ZeroDivisionError('The strike price cannot be zero')
 		else:
-			_b_ = e**-(self.foreignRate * self.daysToExpiration)
+			_b_ = self._foreignDiscount_
 			call = norm.cdf(self._d1_) * _b_
 			put = -norm.cdf(-self._d1_) * _b_
 		return [call, put]
@@ -166,7 +377,7 @@ class GK:
 		if self.strikePrice == 0:
 			raise ZeroDivisionError('The strike price cannot be zero')
 		else:
-			_b_ = e**-(self.domesticRate * self.daysToExpiration)
+			_b_ = self._domesticDiscount_
 			call = -norm.cdf(self._d2_) * _b_
 			put = norm.cdf(-self._d2_) * _b_
 		return [call, put]
@@ -178,13 +389,12 @@ class GK:
 		if self.strikePrice == 0:
 			raise ZeroDivisionError('The strike price cannot be zero')
 		else:
-			return self.underlyingPrice * e**-(self.foreignRate * \
-					self.daysToExpiration) * norm.pdf(self._d1_) * \
-					self.daysToExpiration**0.5
+			return self.underlyingPrice * self._foreignDiscount_ * \
+					norm.pdf(self._d1_) * self.daysToExpiration**0.5
 
 	def _theta(self):
 		'''Returns the option theta: [Call theta, Put theta]'''
-		_b_ = e**-(self.foreignRate * self.daysToExpiration)
+		_b_ = self._foreignDiscount_
 		call = -self.underlyingPrice * _b_ * norm.pdf(self._d1_) * \
 				self.volatility / (2 * self.daysToExpiration**0.5) + \
 				self.foreignRate * self.underlyingPrice * _b_ * \
@@ -200,27 +410,34 @@ class GK:
 	def _rhod(self):
 		'''Returns the option domestic rho: [Call rho, Put rho]'''
 		call = self.strikePrice * self.daysToExpiration * \
-				e**(-self.domesticRate * self.daysToExpiration) * \
-				norm.cdf(self._d2_) / 100
+				self._domesticDiscount_ * norm.cdf(self._d2_) / 100
 		put = -self.strikePrice * self.daysToExpiration * \
-				e**(-self.domesticRate * self.daysToExpiration) * \
-				norm.cdf(-self._d2_) / 100
+				self._domesticDiscount_ * norm.cdf(-self._d2_) / 100
 		return [call, put]
 
 	def _rhof(self):
 		'''Returns the option foreign rho: [Call rho, Put rho]'''
 		call = -self.underlyingPrice * self.daysToExpiration * \
-				e**(-self.foreignRate * self.daysToExpiration) * \
-				norm.cdf(self._d1_) / 100
+				self._foreignDiscount_ * norm.cdf(self._d1_) / 100
 		put = self.underlyingPrice * self.daysToExpiration * \
-				e**(-self.foreignRate * self.daysToExpiration) * \
-				norm.cdf(-self._d1_) / 100
+				self._foreignDiscount_ * norm.cdf(-self._d1_) / 100
 		return [call, put]
 
+	def _exerciceProbability(self):
+		'''Returns the probability of exercise'''
+		return norm.cdf(self._d2_)
+
 	def _gamma(self):
 		'''Returns the option gamma'''
-		return (norm.pdf(self._d1_) * e**-(self.foreignRate * \
-				self.daysToExpiration)) / (self.underlyingPrice * self._a_)
+		return (norm.pdf(self._d1_) * self._foreignDiscount_) / \
+				(self.underlyingPrice * self._a_)
+
+	def _higherOrder(self, greeks):
+		'''Returns the selected higher order greeks: {greek: value}'''
+		return _higherOrderGreeks(self.underlyingPrice, \
+				self._foreignDiscount_, self.foreignRate, self.domesticRate, \
+				self.daysToExpiration, self.volatility, self._d1_, self._d2_, \
+				norm.pdf(self._d1_), norm.cdf, greeks)
 
 	def _parity(self):
 		'''Returns the put-call parity'''
@@ -250,6 +467,12 @@ class BS:
 		c.putRho				# Returns the put rho
 		c.vega					# Returns the option vega
 		c.gamma					# Returns the option gamma
+		c.vanna					# Returns the option vanna
+		c.volga					# Returns the option volga
+		c.callCharm				# Returns the call charm
+		c.putCharm				# Returns the put charm
+		c.speed					# Returns the option speed
+		c.color					# Returns the option color
 
 		c = mibian.BS([1.4565, 1.45, 1, 30], callPrice=0.0359)
 		c.impliedVolatility		# Returns the implied volatility from the call price
@@ -261,6 +484,18 @@ class BS:
 		c.putCallParity			# Returns the put-call parity
 		'''
 
+	_greeks_ = _lazy({'_delta': ['callDelta', 'putDelta'], \
+			'_delta2': ['callDelta2', 'putDelta2'], \
+			'_theta': ['callTheta', 'putTheta'], \
+			'_rho': ['callRho', 'putRho'], '_vega': ['vega'], \
+			'_gamma': ['gamma'], \
+			'_exerciceProbability': ['exerciceProbability']})
+	__slots__ = ('underlyingPrice', 'strikePrice', 'interestRate', \
+			'daysToExpiration', 'volatility', 'callPrice', 'putPrice', \
+			'impliedVolatility', 'putCallParity', '_a_', '_d1_', '_d2_', \
+			'_discount_') + tuple(_greeks_) + tuple(HIGHER_ORDER_GREEKS)
+	__getattr__ = _greek
+
 	def __init__(self, args, volatility=None, callPrice=None, putPrice=None, \
 			performance=None):
 		self.underlyingPrice = float(args[0])
@@ -268,11 +503,9 @@ class BS:
 		self.interestRate = float(args[2]) / 100
 		self.daysToExpiration = float(args[3]) / 365
 
-		for i in ['callPrice', 'putPrice', 'callDelta', 'putDelta', \
-				'callDelta2', 'putDelta2', 'callTheta', 'putTheta', \
-				'callRho', 'putRho', 'vega', 'gamma', 'impliedVolatility', \
+		for i in ['callPrice', 'putPrice', 'impliedVolatility', \
 				'putCallParity']:
-			self.__dict__[i] = None
+			setattr(self, i, None)
 		
 		if volatility:
 			self.volatility = float(volatility) / 100
@@ -282,17 +515,12 @@ class BS:
 					(self.interestRate + (self.volatility**2) / 2) * \
 					self.daysToExpiration) / self._a_
 			self._d2_ = self._d1_ - self._a_
-			if performance:
-				[self.callPrice, self.putPrice] = self._price()
-			else:
-				[self.callPrice, self.putPrice] = self._price()
-				[self.callDelta, self.putDelta] = self._delta()
-				[self.callDelta2, self.putDelta2] = self._delta2()
-				[self.callTheta, self.putTheta] = self._theta()
-				[self.callRho, self.putRho] = self._rho()
-				self.vega = self._vega()
-				self.gamma = self._gamma()
-				self.exerciceProbability = norm.cdf(self._d2_)
+			self._discount_ = e**(-self.interestRate * self.daysToExpiration)
+			# Greeks are computed on first access
+			[self.callPrice, self.putPrice] = self._price()
+		else:
+			for i in list(self._greeks_) + HIGHER_ORDER_GREEKS:
+				setattr(self, i, None)
 		if callPrice:
 			self.callPrice = round(float(callPrice), 6)
 			self.impliedVolatility = impliedVolatility(\
@@ -315,10 +543,8 @@ class BS:
 			raise ZeroDivisionError('The strike price cannot be zero')
 		else:
 			call = self.underlyingPrice * norm.cdf(self._d1_) - \
-					self.strikePrice * e**(-self.interestRate * \
-					self.daysToExpiration) * norm.cdf(self._d2_)
-			put = self.strikePrice * e**(-self.interestRate * \
-					self.daysToExpiration) * norm.cdf(-self._d2_) - \
+					self.strikePrice * self._discount_ * norm.cdf(self._d2_)
+			put = self.strikePrice * self._discount_ * norm.cdf(-self._d2_) - \
 					self.underlyingPrice * norm.cdf(-self._d1_)
 		return [call, put]
 
@@ -342,7 +568,7 @@ class BS:
 		if self.strikePrice == 0:
 			raise ZeroDivisionError('The strike price cannot be zero')
 		else:
-			_b_ = e**-(self.interestRate * self.daysToExpiration)
+			_b_ = self._discount_
 			call = -norm.cdf(self._d2_) * _b_
 			put = norm.cdf(-self._d2_) * _b_
 		return [call, put]
@@ -359,7 +585,7 @@ class BS:
 
 	def _theta(self):
 		'''Returns the option theta: [Call theta, Put theta]'''
-		_b_ = e**-(self.interestRate * self.daysToExpiration)
+		_b_ = self._discount_
 		call = -self.underlyingPrice * norm.pdf(self._d1_) * self.volatility / \
 				(2 * self.daysToExpiration**0.5) - self.interestRate * \
 				self.strikePrice * _b_ * norm.cdf(self._d2_)
@@ -370,17 +596,27 @@ class BS:
 
 	def _rho(self):
 		'''Returns the option rho: [Call rho, Put rho]'''
-		_b_ = e**-(self.interestRate * self.daysToExpiration)
+		_b_ = self._discount_
 		call = self.strikePrice * self.daysToExpiration * _b_ * \
 				norm.cdf(self._d2_) / 100
 		put = -self.strikePrice * self.daysToExpiration * _b_ * \
 				norm.cdf(-self._d2_) / 100
 		return [call, put]
 
+	def _exerciceProbability(self):
+		'''Returns the probability of exercise'''
+		return norm.cdf(self._d2_)
+
 	def _gamma(self):
 		'''Returns the option gamma'''
 		return norm.pdf(self._d1_) / (self.underlyingPrice * self._a_)
 
+	def _higherOrder(self, greeks):
+		'''Returns the selected higher order greeks: {greek: value}'''
+		return _higherOrderGreeks(self.underlyingPrice, 1.0, 0.0, \
+				self.interestRate, self.daysToExpiration, self.volatility, \
+				self._d1_, self._d2_, norm.pdf(self._d1_), norm.cdf, greeks)
+
 	def _parity(self):
 		'''Put-Call Parity'''
 		return self.callPrice - self.putPrice - self.underlyingPrice + \
@@ -408,6 +644,12 @@ class Me:
 		c.putRho				# Returns the put rho
 		c.vega					# Returns the option vega
 		c.gamma					# Returns the option gamma
+		c.vanna					# Returns the option vanna
+		c.volga					# Returns the option volga
+		c.callCharm				# Returns the call charm
+		c.putCharm				# Returns the put charm
+		c.speed					# Returns the option speed
+		c.color					# Returns the option color
 
 		c = mibian.Me([52, 50, 1, 1, 30], callPrice=0.0359)
 		c.impliedVolatility		# Returns the implied volatility from the call price
@@ -419,6 +661,19 @@ class Me:
 		c.putCallParity			# Returns the put-call parity
 	'''
 
+	_greeks_ = _lazy({'_delta': ['callDelta', 'putDelta'], \
+			'_delta2': ['callDelta2', 'putDelta2'], \
+			'_theta': ['callTheta', 'putTheta'], \
+			'_rho': ['callRho', 'putRho'], '_vega': ['vega'], \
+			'_gamma': ['gamma'], \
+			'_exerciceProbability': ['exerciceProbability']})
+	__slots__ = ('underlyingPrice', 'strikePrice', 'interestRate', \
+			'dividend', 'dividendYield', 'daysToExpiration', 'volatility', \
+			'callPrice', 'putPrice', 'impliedVolatility', 'putCallParity', \
+			'_a_', '_d1_', '_d2_', '_discount_', '_dividendDiscount_') + \
+			tuple(_greeks_) + tuple(HIGHER_ORDER_GREEKS)
+	__getattr__ = _greek
+
 	def __init__(self, args, volatility=None, callPrice=None, putPrice=None, \
 			performance=None):
 		self.underlyingPrice = float(args[0])
@@ -428,11 +683,9 @@ class Me:
 		self.dividendYield = self.dividend / self.underlyingPrice
 		self.daysToExpiration = float(args[4]) / 365
 
-		for i in ['callPrice', 'putPrice', 'callDelta', 'putDelta', \
-				'callDelta2', 'putDelta2', 'callTheta', 'putTheta', \
-				'callRho', 'putRho', 'vega', 'gamma', 'impliedVolatility', \
+		for i in ['callPrice', 'putPrice', 'impliedVolatility', \
 				'putCallParity']:
-			self.__dict__[i] = None
+			setattr(self, i, None)
 		
 		if volatility:
 			self.volatility = float(volatility) / 100
@@ -443,17 +696,14 @@ class Me:
 					(self.volatility**2) / 2) * self.daysToExpiration) / \
 					self._a_
 			self._d2_ = self._d1_ - self._a_
-			if performance:
-				[self.callPrice, self.putPrice] = self._price()
-			else:
-				[self.callPrice, self.putPrice] = self._price()
-				[self.callDelta, self.putDelta] = self._delta()
-				[self.callDelta2, self.putDelta2] = self._delta2()
-				[self.callTheta, self.putTheta] = self._theta()
-				[self.callRho, self.putRho] = self._rho()
-				self.vega = self._vega()
-				self.gamma = self._gamma()
-				self.exerciceProbability = norm.cdf(self._d2_)
+			self._discount_ = e**(-self.interestRate * self.daysToExpiration)
+			self._dividendDiscount_ = e**(-self.dividendYield * \
+					self.daysToExpiration)
+			# Greeks are computed on first access
+			[self.callPrice, self.putPrice] = self._price()
+		else:
+			for i in list(self._greeks_) + HIGHER_ORDER_GREEKS:
+				setattr(self, i, None)
 		if callPrice:
 			self.callPrice = round(float(callPrice), 6)
 			self.impliedVolatility = impliedVolatility(\
@@ -475,14 +725,12 @@ class Me:
 		if self.strikePrice == 0:
 			raise ZeroDivisionError('The strike price cannot be zero')
 		else:
-			call = self.underlyingPrice * e**(-self.dividendYield * \
-					self.daysToExpiration) * norm.cdf(self._d1_) - \
-					self.strikePrice * e**(-self.interestRate * \
-					self.daysToExpiration) * norm.cdf(self._d2_)
-			put = self.strikePrice * e**(-self.interestRate * \
-					self.daysToExpiration) * norm.cdf(-self._d2_) - \
-					self.underlyingPrice * e**(-self.dividendYield * \
-					self.daysToExpiration) * norm.cdf(-self._d1_)
+			call = self.underlyingPrice * self._dividendDiscount_ * \
+					norm.cdf(self._d1_) - self.strikePrice * \
+					self._discount_ * norm.cdf(self._d2_)
+			put = self.strikePrice * self._discount_ * \
+					norm.cdf(-self._d2_) - self.underlyingPrice * \
+					self._dividendDiscount_ * norm.cdf(-self._d1_)
 		return [call, put]
 
 	def _delta(self):
@@ -493,7 +741,7 @@ class Me:
 		if self.strikePrice == 0:
 			raise ZeroDivisionError('The strike price cannot be zero')
 		else:
-			_b_ = e**(-self.dividendYield * self.daysToExpiration)
+			_b_ = self._dividendDiscount_
 			call = _b_ * norm.cdf(self._d1_)
 			put = _b_ *	(norm.cdf(self._d1_) - 1)
 		return [call, put]
@@ -507,7 +755,7 @@ class Me:
 		if self.strikePrice == 0:
 			raise ZeroDivisionError('The strike price cannot be zero')
 		else:
-			_b_ = e**-(self.interestRate * self.daysToExpiration)
+			_b_ = self._discount_
 			call = -norm.cdf(self._d2_) * _b_
 			put = norm.cdf(-self._d2_) * _b_
 		return [call, put]
@@ -519,14 +767,13 @@ class Me:
 		if self.strikePrice == 0:
 			raise ZeroDivisionError('The strike price cannot be zero')
 		else:
-			return self.underlyingPrice * e**(-self.dividendYield * \
-					self.daysToExpiration) * norm.pdf(self._d1_) * \
-					self.daysToExpiration**0.5 / 100
+			return self.underlyingPrice * self._dividendDiscount_ * \
+					norm.pdf(self._d1_) * self.daysToExpiration**0.5 / 100
 
 	def _theta(self):
 		'''Returns the option theta: [Call theta, Put theta]'''
-		_b_ = e**-(self.interestRate * self.daysToExpiration)
-		_d_ = e**(-self.dividendYield * self.daysToExpiration)
+		_b_ = self._discount_
+		_d_ = self._dividendDiscount_
 		call = -self.underlyingPrice * _d_ * norm.pdf(self._d1_) * \
 				self.volatility / (2 * self.daysToExpiration**0.5) + \
 				self.dividendYield * self.underlyingPrice * _d_ * \
@@ -541,17 +788,28 @@ class Me:
 
 	def _rho(self):
 		'''Returns the option rho: [Call rho, Put rho]'''
-		_b_ = e**-(self.interestRate * self.daysToExpiration)
+		_b_ = self._discount_
 		call = self.strikePrice * self.daysToExpiration * _b_ * \
 				norm.cdf(self._d2_) / 100
 		put = -self.strikePrice * self.daysToExpiration * _b_ * \
 				norm.cdf(-self._d2_) / 100
 		return [call, put]
 
+	def _exerciceProbability(self):
+		'''Returns the probability of exercise'''
+		return norm.cdf(self._d2_)
+
 	def _gamma(self):
 		'''Returns the option gamma'''
-		return e**(-self.dividendYield * self.daysToExpiration) * \
-				norm.pdf(self._d1_) / (self.underlyingPrice * self._a_)
+		return self._dividendDiscount_ * norm.pdf(self._d1_) / \
+				(self.underlyingPrice * self._a_)
+
+	def _higherOrder(self, greeks):
+		'''Returns the selected higher order greeks: {greek: value}'''
+		return _higherOrderGreeks(self.underlyingPrice, \
+				self._dividendDiscount_, self.dividendYield, self.interestRate, \
+				self.daysToExpiration, self.volatility, self._d1_, self._d2_, \
+				norm.pdf(self._d1_), norm.cdf, greeks)
 
 	# Verify
 	def _parity(self):
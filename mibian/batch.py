@@ -0,0 +1,600 @@
+'''
+MibianLib - Options Pricing Open Source Library - http://code.mibian.net/
+Copyright (C) 2011 Yassine Maaroufi - <yassinemaaroufi@mibian.net>
+Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
+
+MibianLib vectorized batch pricing
+'''
+
+from math import e
+import numpy as np
+from mibian import HIGHER_ORDER_GREEKS, _higherOrderGreeks
+from mibian.normal import cdfArray, pdfArray
+
+# Every input is either a number or a NumPy array; inputs are broadcast
+# together and every output is an array of the broadcast shape.
+# Results agree with the scalar classes to within floating point rounding.
+
+# With dtype=np.float32 the models compute and return single precision
+# arrays, half the memory of float64 ones. Over log moneyness within -/+0.7,
+# 1 to 730 days, volatilities of 5 to 150 and rates up to 10, the error
+# versus float64 is at most, with T in years:
+#	prices											1e-6 (S + K)
+#	deltas, dual deltas, exercise probabilities		1e-5
+#	thetas											1e-5 (S + K) / 365
+#	rhos											1e-5 (S + K) T / 100
+#	vegas											1e-5 (S + K) T**0.5, / 100 but GK
+#	gammas											1e-5 / (S volatility T**0.5)
+
+# Names of the inputs of each model, in order
+_arguments = {'GK': ['underlyingPrice', 'strikePrice', 'domesticRate', \
+		'foreignRate', 'daysToExpiration'], \
+		'BS': ['underlyingPrice', 'strikePrice', 'interestRate', \
+		'daysToExpiration'], \
+		'Me': ['underlyingPrice', 'strikePrice', 'interestRate', \
+		'annualDividends', 'daysToExpiration']}
+
+def _inputs(*values, dtype=np.float64):
+	'''Returns the inputs as broadcast float arrays'''
+	return np.broadcast_arrays(*[np.asarray(v, dtype=dtype) \
+			for v in values])
+
+def impliedVolatility(className, args, callPrice=None, putPrice=None, \
+		high=500.0, low=0.0, tolerance=1e-10, relTolerance=1e-10, \
+		maxIterations=100, guess=None, table=None):
+	'''Returns an array of estimated implied volatilities'''
+	return solveImpliedVolatility(className, args, callPrice, putPrice, high, \
+			low, tolerance, relTolerance, maxIterations, guess, table)[0]
+
+def solveImpliedVolatility(className, args, callPrice=None, putPrice=None, \
+		high=500.0, low=0.0, tolerance=1e-10, relTolerance=1e-10, \
+		maxIterations=100, guess=None, table=None):
+	'''Returns the implied volatilities and the number of solver iterations
+	of each option: [Implied volatilities, Iterations]
+
+	Quotes that are NaN are skipped and give a NaN volatility. A
+	mibian.table.InversionTable provides the starting points when there is
+	no guess.'''
+	isCall = callPrice is not None
+	target = callPrice if isCall else putPrice
+	if table is not None and guess is None:
+		guess = table.estimateArray(className, args, callPrice, putPrice)[0]
+	factors = _factors(className, args)
+	[target, guess] = _inputs(target, np.nan if guess is None else guess, \
+			factors[0])[:2]
+	factors = [np.broadcast_to(i, target.shape).ravel() for i in factors]
+	[volatility, iterations] = _solve(*(factors + [target.ravel(), \
+			np.full(target.size, isCall), guess.ravel(), high, low, \
+			tolerance, relTolerance, maxIterations]))
+	return [volatility.reshape(target.shape), \
+			iterations.reshape(target.shape)]
+
+def _factors(className, args):
+	'''Returns the volatility independent pricing factors of a model:
+	[Discounted underlying, Discounted strike, Log moneyness, Square root of
+	the time to expiration]'''
+	if className == 'GK':
+		[s, k, r, q, t] = _inputs(*args[:5])
+		[r, q] = [r / 100, q / 100]
+	elif className == 'BS':
+		[s, k, r, t] = _inputs(*args[:4])
+		[r, q] = [r / 100, 0.0]
+	elif className == 'Me':
+		[s, k, r, d, t] = _inputs(*args[:5])
+		[r, q] = [r / 100, d / s]
+	else:
+		raise ValueError('Unknown model: ' + str(className))
+	if (k == 0).any():
+		raise ZeroDivisionError('The strike price cannot be zero')
+	t = t / 365
+	underlying = s * e**(-q * t)
+	strike = k * e**(-r * t)
+	return [underlying, strike, np.log(underlying / strike), t**0.5]
+
+def _black(underlying, strike, moneyness, root, volatility):
+	'''Returns the option prices and the vega per volatility point from the
+	pricing factors: [Call prices, Put prices, Vegas]'''
+	a = volatility / 100 * root
+	d1 = moneyness / a + a / 2
+	d2 = d1 - a
+	call = underlying * cdfArray(d1) - strike * cdfArray(d2)
+	put = strike * cdfArray(-d2) - underlying * cdfArray(-d1)
+	return [call, put, underlying * pdfArray(d1) * root / 100]
+
+def _solve(underlying, strike, moneyness, root, target, isCall, guess, high, \
+		low, tolerance, relTolerance, maxIterations):
+	'''Returns the implied volatilities of flat arrays of pricing factors
+	and quotes: [Implied volatilities, Iterations]
+
+	Newton steps on the vega, replaced by a bisection of the bracket of the
+	option whenever they leave it.'''
+	size = len(target)
+	volatility = np.full(size, np.nan)
+	iterations = np.zeros(size, dtype=np.int64)
+	tolerance = tolerance + relTolerance * np.abs(target)
+	low = max(low, 0.00001)
+	lows = np.full(size, low)
+	highs = np.full(size, float(high))
+
+	with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+		def price(i, v):
+			[call, put, vega] = _black(underlying[i], strike[i], \
+					moneyness[i], root[i], v)
+			return [np.where(isCall[i], call, put) - target[i], vega]
+
+		# Bracket
+		active = np.flatnonzero(~np.isnan(target))
+		above = price(active, highs[active])[0] < 0
+		volatility[active[above]] = high
+		active = active[~above]
+		below = price(active, lows[active])[0] > 0
+		volatility[active[below]] = 0.001
+		active = active[~below]
+
+		# Starting point: the inflection point of the price in the volatility
+		start = guess[active]
+		inflection = 100 * (2 * np.abs(moneyness[active]))**0.5 / root[active]
+		brenner = 100 * (2 * np.pi)**0.5 * target[active] / \
+				(underlying[active] * root[active])
+		inflection = np.where((inflection > low) & (inflection < high), \
+				inflection, brenner)
+		start = np.where(np.isnan(start), inflection, start)
+		volatility[active] = np.clip(start, low, high)
+
+		for i in range(maxIterations):
+			if not len(active):
+				break
+			v = volatility[active]
+			[diff, vega] = price(active, v)
+			iterations[active] += 1
+			done = np.abs(diff) <= tolerance[active]
+			highs[active] = np.where(diff > 0, v, highs[active])
+			lows[active] = np.where(diff > 0, lows[active], v)
+			step = v - diff / vega
+			bisection = (lows[active] + highs[active]) / 2
+			step = np.where((step > lows[active]) & (step < highs[active]), \
+					step, bisection)
+			done |= highs[active] - lows[active] <= 4e-16 * v + 1e-13
+			volatility[active] = np.where(done, v, step)
+			active = active[~done]
+	return [volatility, iterations]
+
+def _higherOrder(option, carry, q, r, greeks):
+	'''Sets the higher order greeks selected by greeks (None, True for all or
+	names) of vectorized options in one pass, the others to None'''
+	if greeks is True:
+		greeks = HIGHER_ORDER_GREEKS
+	greeks = list(greeks or [])
+	unknown = [i for i in greeks if i not in HIGHER_ORDER_GREEKS]
+	if unknown:
+		raise ValueError('Unknown higher order greeks: ' + ', '.join(unknown))
+	for i in HIGHER_ORDER_GREEKS:
+		option.__dict__[i] = None
+	if greeks:
+		option.__dict__.update(_higherOrderGreeks(option.underlyingPrice, \
+				carry, q, r, option.daysToExpiration, option.volatility, \
+				option._d1_, option._d2_, pdfArray(option._d1_), cdfArray, \
+				greeks))
+
+class GK:
+	'''Garman-Kohlhagen, vectorized
+	Used for pricing many European options on currencies at once
+
+	GK([underlyingPrice, strikePrice, domesticRate, foreignRate, \
+			daysToExpiration], volatility=x, performance=None, \
+			dtype=np.float64, higherOrder=None)
+
+	eg:
+		c = mibian.batch.GK([1.4565, [1.40, 1.45, 1.50], 1, 2, 30], \
+				volatility=[21, 20, 19])
+		c.callPrice				# Returns an array of call prices
+		c.putRhoF				# Returns an array of put foreign rhos
+
+	higherOrder selects the greeks of mibian.HIGHER_ORDER_GREEKS computed,
+	all of them if True, none by default, the others being None.
+	'''
+
+	def __init__(self, args, volatility, performance=None, \
+			dtype=np.float64, higherOrder=None):
+		[self.underlyingPrice, self.strikePrice, self.domesticRate, \
+				self.foreignRate, self.daysToExpiration, self.volatility] = \
+				_inputs(*(list(args[:5]) + [volatility]), dtype=dtype)
+		self.domesticRate = self.domesticRate / 100
+		self.foreignRate = self.foreignRate / 100
+		self.daysToExpiration = self.daysToExpiration / 365
+		self.volatility = self.volatility / 100
+		if (self.strikePrice == 0).any():
+			raise ZeroDivisionError('The strike price cannot be zero')
+
+		for i in ['callDelta', 'putDelta', 'callDelta2', 'putDelta2', \
+				'callTheta', 'putTheta', 'callRhoD', 'putRhoD', 'callRhoF', \
+				'putRhoF', 'vega', 'gamma', 'exerciceProbability']:
+			self.__dict__[i] = None
+
+		self._a_ = self.volatility * self.daysToExpiration**0.5
+		self._d1_ = (np.log(self.underlyingPrice / self.strikePrice) + \
+			(self.domesticRate - self.foreignRate + \
+			(self.volatility**2)/2) * self.daysToExpiration) / self._a_
+		self._d2_ = self._d1_ - self._a_
+		[self.callPrice, self.putPrice] = self._price()
+		if not performance:
+			[self.callDelta, self.putDelta] = self._delta()
+			[self.callDelta2, self.putDelta2] = self._delta2()
+			[self.callTheta, self.putTheta] = self._theta()
+			[self.callRhoD, self.putRhoD] = self._rhod()
+			[self.callRhoF, self.putRhoF] = self._rhof()
+			self.vega = self._vega()
+			self.gamma = self._gamma()
+			self.exerciceProbability = cdfArray(self._d2_)
+		_higherOrder(self, e**(-self.foreignRate * self.daysToExpiration), \
+				self.foreignRate, self.domesticRate, higherOrder)
+
+	def _price(self):
+		'''Returns the option prices: [Call prices, Put prices]'''
+		call = e**(-self.foreignRate * self.daysToExpiration) * \
+				self.underlyingPrice * cdfArray(self._d1_) - \
+				e**(-self.domesticRate * self.daysToExpiration) * \
+				self.strikePrice * cdfArray(self._d2_)
+		put = e**(-self.domesticRate * self.daysToExpiration) * \
+				self.strikePrice * cdfArray(-self._d2_) - \
+				e**(-self.foreignRate * self.daysToExpiration) * \
+				self.underlyingPrice * cdfArray(-self._d1_)
+		return [call, put]
+
+	def _delta(self):
+		'''Returns the option deltas: [Call deltas, Put deltas]'''
+		_b_ = e**-(self.foreignRate * self.daysToExpiration)
+		call = cdfArray(self._d1_) * _b_
+		put = -cdfArray(-self._d1_) * _b_
+		return [call, put]
+
+	def _delta2(self):
+		'''Returns the dual deltas: [Call dual deltas, Put dual deltas]'''
+		_b_ = e**-(self.domesticRate * self.daysToExpiration)
+		call = -cdfArray(self._d2_) * _b_
+		put = cdfArray(-self._d2_) * _b_
+		return [call, put]
+
+	def _vega(self):
+		'''Returns the option vegas'''
+		return self.underlyingPrice * e**-(self.foreignRate * \
+				self.daysToExpiration) * pdfArray(self._d1_) * \
+				self.daysToExpiration**0.5
+
+	def _theta(self):
+		'''Returns the option thetas: [Call thetas, Put thetas]'''
+		_b_ = e**-(self.foreignRate * self.daysToExpiration)
+		call = -self.underlyingPrice * _b_ * pdfArray(self._d1_) * \
+				self.volatility / (2 * self.daysToExpiration**0.5) + \
+				self.foreignRate * self.underlyingPrice * _b_ * \
+				cdfArray(self._d1_) - self.domesticRate * self.strikePrice * \
+				_b_ * cdfArray(self._d2_)
+		put = -self.underlyingPrice * _b_ * pdfArray(self._d1_) * \
+				self.volatility / (2 * self.daysToExpiration**0.5) - \
+				self.foreignRate * self.underlyingPrice * _b_ * \
+				cdfArray(-self._d1_) + self.domesticRate * self.strikePrice * \
+				_b_ * cdfArray(-self._d2_)
+		return [call / 365, put / 365]
+
+	def _rhod(self):
+		'''Returns the option domestic rhos: [Call rhos, Put rhos]'''
+		call = self.strikePrice * self.daysToExpiration * \
+				e**(-self.domesticRate * self.daysToExpiration) * \
+				cdfArray(self._d2_) / 100
+		put = -self.strikePrice * self.daysToExpiration * \
+				e**(-self.domesticRate * self.daysToExpiration) * \
+				cdfArray(-self._d2_) / 100
+		return [call, put]
+
+	def _rhof(self):
+		'''Returns the option foreign rhos: [Call rhos, Put rhos]'''
+		call = -self.underlyingPrice * self.daysToExpiration * \
+				e**(-self.foreignRate * self.daysToExpiration) * \
+				cdfArray(self._d1_) / 100
+		put = self.underlyingPrice * self.daysToExpiration * \
+				e**(-self.foreignRate * self.daysToExpiration) * \
+				cdfArray(-self._d1_) / 100
+		return [call, put]
+
+	def _gamma(self):
+		'''Returns the option gammas'''
+		return (pdfArray(self._d1_) * e**-(self.foreignRate * \
+				self.daysToExpiration)) / (self.underlyingPrice * self._a_)
+
+class BS:
+	'''Black-Scholes, vectorized
+	Used for pricing many European options on stocks without dividends at once
+
+	BS([underlyingPrice, strikePrice, interestRate, daysToExpiration], \
+			volatility=x, performance=None, dtype=np.float64, \
+			higherOrder=None)
+
+	eg:
+		c = mibian.batch.BS([81, [75, 80, 85], 6, 60], volatility=30)
+		c.callPrice				# Returns an array of call prices
+		c.putRho				# Returns an array of put rhos
+		c = mibian.batch.BS([81, [75, 80, 85], 6, 60], volatility=30, \
+				higherOrder=['vanna', 'volga'])
+		c.vanna					# Returns an array of vannas
+	'''
+
+	def __init__(self, args, volatility, performance=None, \
+			dtype=np.float64, higherOrder=None):
+		[self.underlyingPrice, self.strikePrice, self.interestRate, \
+				self.daysToExpiration, self.volatility] = \
+				_inputs(*(list(args[:4]) + [volatility]), dtype=dtype)
+		self.interestRate = self.interestRate / 100
+		self.daysToExpiration = self.daysToExpiration / 365
+		self.volatility = self.volatility / 100
+		if (self.strikePrice == 0).any():
+			raise ZeroDivisionError('The strike price cannot be zero')
+
+		for i in ['callDelta', 'putDelta', 'callDelta2', 'putDelta2', \
+				'callTheta', 'putTheta', 'callRho', 'putRho', 'vega', \
+				'gamma', 'exerciceProbability']:
+			self.__dict__[i] = None
+
+		self._a_ = self.volatility * self.daysToExpiration**0.5
+		self._d1_ = (np.log(self.underlyingPrice / self.strikePrice) + \
+				(self.interestRate + (self.volatility**2) / 2) * \
+				self.daysToExpiration) / self._a_
+		self._d2_ = self._d1_ - self._a_
+		[self.callPrice, self.putPrice] = self._price()
+		if not performance:
+			[self.callDelta, self.putDelta] = self._delta()
+			[self.callDelta2, self.putDelta2] = self._delta2()
+			[self.callTheta, self.putTheta] = self._theta()
+			[self.callRho, self.putRho] = self._rho()
+			self.vega = self._vega()
+			self.gamma = self._gamma()
+			self.exerciceProbability = cdfArray(self._d2_)
+		_higherOrder(self, 1.0, 0.0, self.interestRate, higherOrder)
+
+	def _price(self):
+		'''Returns the option prices: [Call prices, Put prices]'''
+		call = self.underlyingPrice * cdfArray(self._d1_) - \
+				self.strikePrice * e**(-self.interestRate * \
+				self.daysToExpiration) * cdfArray(self._d2_)
+		put = self.strikePrice * e**(-self.interestRate * \
+				self.daysToExpiration) * cdfArray(-self._d2_) - \
+				self.underlyingPrice * cdfArray(-self._d1_)
+		return [call, put]
+
+	def _delta(self):
+		'''Returns the option deltas: [Call deltas, Put deltas]'''
+		call = cdfArray(self._d1_)
+		put = -cdfArray(-self._d1_)
+		return [call, put]
+
+	def _delta2(self):
+		'''Returns the dual deltas: [Call dual deltas, Put dual deltas]'''
+		_b_ = e**-(self.interestRate * self.daysToExpiration)
+		call = -cdfArray(self._d2_) * _b_
+		put = cdfArray(-self._d2_) * _b_
+		return [call, put]
+
+	def _vega(self):
+		'''Returns the option vegas'''
+		return self.underlyingPrice * pdfArray(self._d1_) * \
+				self.daysToExpiration**0.5 / 100
+
+	def _theta(self):
+		'''Returns the option thetas: [Call thetas, Put thetas]'''
+		_b_ = e**-(self.interestRate * self.daysToExpiration)
+		call = -self.underlyingPrice * pdfArray(self._d1_) * self.volatility / \
+				(2 * self.daysToExpiration**0.5) - self.interestRate * \
+				self.strikePrice * _b_ * cdfArray(self._d2_)
+		put = -self.underlyingPrice * pdfArray(self._d1_) * self.volatility / \
+				(2 * self.daysToExpiration**0.5) + self.interestRate * \
+				self.strikePrice * _b_ * cdfArray(-self._d2_)
+		return [call / 365, put / 365]
+
+	def _rho(self):
+		'''Returns the option rhos: [Call rhos, Put rhos]'''
+		_b_ = e**-(self.interestRate * self.daysToExpiration)
+		call = self.strikePrice * self.daysToExpiration * _b_ * \
+				cdfArray(self._d2_) / 100
+		put = -self.strikePrice * self.daysToExpiration * _b_ * \
+				cdfArray(-self._d2_) / 100
+		return [call, put]
+
+	def _gamma(self):
+		'''Returns the option gammas'''
+		return pdfArray(self._d1_) / (self.underlyingPrice * self._a_)
+
+class Me:
+	'''Merton, vectorized
+	Used for pricing many European options on stocks with dividends at once
+
+	Me([underlyingPrice, strikePrice, interestRate, annualDividends, \
+			daysToExpiration], volatility=x, performance=None, \
+			dtype=np.float64, higherOrder=None)
+
+	eg:
+		c = mibian.batch.Me([52, [48, 50, 52], 1, 1, 30], volatility=20)
+		c.callPrice				# Returns an array of call prices
+		c.gamma					# Returns an array of gammas
+	'''
+
+	def __init__(self, args, volatility, performance=None, \
+			dtype=np.float64, higherOrder=None):
+		[self.underlyingPrice, self.strikePrice, self.interestRate, \
+				self.dividend, self.daysToExpiration, self.volatility] = \
+				_inputs(*(list(args[:5]) + [volatility]), dtype=dtype)
+		self.interestRate = self.interestRate / 100
+		self.dividendYield = self.dividend / self.underlyingPrice
+		self.daysToExpiration = self.daysToExpiration / 365
+		self.volatility = self.volatility / 100
+		if (self.strikePrice == 0).any():
+			raise ZeroDivisionError('The strike price cannot be zero')
+
+		for i in ['callDelta', 'putDelta', 'callDelta2', 'putDelta2', \
+				'callTheta', 'putTheta', 'callRho', 'putRho', 'vega', \
+				'gamma', 'exerciceProbability']:
+			self.__dict__[i] = None
+
+		self._a_ = self.volatility * self.daysToExpiration**0.5
+		self._d1_ = (np.log(self.underlyingPrice / self.strikePrice) + \
+				(self.interestRate - self.dividendYield + \
+				(self.volatility**2) / 2) * self.daysToExpiration) / \
+				self._a_
+		self._d2_ = self._d1_ - self._a_
+		[self.callPrice, self.putPrice] = self._price()
+		if not performance:
+			[self.callDelta, self.putDelta] = self._delta()
+			[self.callDelta2, self.putDelta2] = self._delta2()
+			[self.callTheta, self.putTheta] = self._theta()
+			[self.callRho, self.putRho] = self._rho()
+			self.vega = self._vega()
+			self.gamma = self._gamma()
+			self.exerciceProbability = cdfArray(self._d2_)
+		_higherOrder(self, e**(-self.dividendYield * self.daysToExpiration), \
+				self.dividendYield, self.interestRate, higherOrder)
+
+	def _price(self):
+		'''Returns the option prices: [Call prices, Put prices]'''
+		call = self.underlyingPrice * e**(-self.dividendYield * \
+				self.daysToExpiration) * cdfArray(self._d1_) - \
+				self.strikePrice * e**(-self.interestRate * \
+				self.daysToExpiration) * cdfArray(self._d2_)
+		put = self.strikePrice * e**(-self.interestRate * \
+				self.daysToExpiration) * cdfArray(-self._d2_) - \
+				self.underlyingPrice * e**(-self.dividendYield * \
+				self.daysToExpiration) * cdfArray(-self._d1_)
+		return [call, put]
+
+	def _delta(self):
+		'''Returns the option deltas: [Call deltas, Put deltas]'''
+		_b_ = e**(-self.dividendYield * self.daysToExpiration)
+		call = _b_ * cdfArray(self._d1_)
+		put = _b_ *	(cdfArray(self._d1_) - 1)
+		return [call, put]
+
+	def _delta2(self):
+		'''Returns the dual deltas: [Call dual deltas, Put dual deltas]'''
+		_b_ = e**-(self.interestRate * self.daysToExpiration)
+		call = -cdfArray(self._d2_) * _b_
+		put = cdfArray(-self._d2_) * _b_
+		return [call, put]
+
+	def _vega(self):
+		'''Returns the option vegas'''
+		return self.underlyingPrice * e**(-self.dividendYield * \
+				self.daysToExpiration) * pdfArray(self._d1_) * \
+				self.daysToExpiration**0.5 / 100
+
+	def _theta(self):
+		'''Returns the option thetas: [Call thetas, Put thetas]'''
+		_b_ = e**-(self.interestRate * self.daysToExpiration)
+		_d_ = e**(-self.dividendYield * self.daysToExpiration)
+		call = -self.underlyingPrice * _d_ * pdfArray(self._d1_) * \
+				self.volatility / (2 * self.daysToExpiration**0.5) + \
+				self.dividendYield * self.underlyingPrice * _d_ * \
+				cdfArray(self._d1_) - self.interestRate * \
+				self.strikePrice * _b_ * cdfArray(self._d2_)
+		put = -self.underlyingPrice * _d_ * pdfArray(self._d1_) * \
+				self.volatility / (2 * self.daysToExpiration**0.5) - \
+				self.dividendYield * self.underlyingPrice * _d_ * \
+				cdfArray(-self._d1_) + self.interestRate * \
+				self.strikePrice * _b_ * cdfArray(-self._d2_)
+		return [call / 365, put / 365]
+
+	def _rho(self):
+		'''Returns the option rhos: [Call rhos, Put rhos]'''
+		_b_ = e**-(self.interestRate * self.daysToExpiration)
+		call = self.strikePrice * self.daysToExpiration * _b_ * \
+				cdfArray(self._d2_) / 100
+		put = -self.strikePrice * self.daysToExpiration * _b_ * \
+				cdfArray(-self._d2_) / 100
+		return [call, put]
+
+	def _gamma(self):
+		'''Returns the option gammas'''
+		return e**(-self.dividendYield * self.daysToExpiration) * \
+				pdfArray(self._d1_) / (self.underlyingPrice * self._a_)
+
+class OptionResults:
+	'''Columnar container for the prices and greeks of many options
+
+	OptionResults(size, fields)
+
+	Each field is one contiguous row of a single typed array, and indexing
+	hands out lightweight per-option views.
+
+	eg:
+		r = mibian.batch.OptionResults.fromBatch(mibian.batch.BS([81, \
+				[75, 80, 85], 6, 60], volatility=30))
+		len(r)					# Returns the number of options
+		r.callPrice				# Returns the array of call prices
+		r[1].callDelta			# Returns the call delta of the second option
+		r[1].asDict()			# Returns every field of the second option
+	'''
+
+	__slots__ = ('fields', 'values', '_index')
+
+	def __init__(self, size, fields, dtype=np.float64):
+		self.fields = tuple(fields)
+		self.values = np.zeros((len(self.fields), size), dtype=dtype)
+		self._index = dict((name, i) for i, name in enumerate(self.fields))
+
+	@classmethod
+	def fromBatch(cls, batch, fields=None):
+		'''Returns the results of a batch model: every price and greek it has
+		computed, or only the given fields'''
+		if fields is None:
+			fields = [i for i in ['callPrice', 'putPrice', 'callDelta', \
+					'putDelta', 'callDelta2', 'putDelta2', 'callTheta', \
+					'putTheta', 'callRho', 'putRho', 'callRhoD', 'putRhoD', \
+					'callRhoF', 'putRhoF', 'vega', 'gamma', \
+					'exerciceProbability'] \
+					if getattr(batch, i, None) is not None]
+		columns = [np.ravel(getattr(batch, i)) for i in fields]
+		results = cls(len(columns[0]) if columns else 0, fields)
+		for i, column in enumerate(columns):
+			results.values[i] = column
+		return results
+
+	def __getattr__(self, name):
+		if name.startswith('_'):
+			raise AttributeError(name)
+		try:
+			return self.values[self._index[name]]
+		except KeyError:
+			raise AttributeError(name)
+
+	def __len__(self):
+		return self.values.shape[1]
+
+	def __getitem__(self, i):
+		if i < 0:
+			i += len(self)
+		if not 0 <= i < len(self):
+			raise IndexError('Option index out of range')
+		return OptionRow(self, i)
+
+	def __iter__(self):
+		for i in range(len(self)):
+			yield OptionRow(self, i)
+
+class OptionRow:
+	'''View on the fields of one option in an OptionResults container'''
+
+	__slots__ = ('results', 'index')
+
+	def __init__(self, results, index):
+		self.results = results
+		self.index = index
+
+	def __getattr__(self, name):
+		if name.startswith('_'):
+			raise AttributeError(name)
+		try:
+			i = self.results._index[name]
+		except KeyError:
+			raise AttributeError(name)
+		return float(self.results.values[i, self.index])
+
+	def asDict(self):
+		'''Returns the fields of the option: {field: value}'''
+		return dict(zip(self.results.fields, \
+				self.results.values[:, self.index].tolist()))
@@ -0,0 +1,108 @@
+'''
+MibianLib - Options Pricing Open Source Library - http://code.mibian.net/
+Copyright (C) 2011 Yassine Maaroufi - <yassinemaaroufi@mibian.net>
+Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
+
+MibianLib pricing cache
+'''
+
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+import mibian
+
+class PricingCache:
+	'''Bounded LRU cache of priced models and implied volatilities
+
+	PricingCache(maxSize=10000, ttl=None, decimals=8)
+
+	Inputs are rounded to the given number of decimals before being used as
+	keys, so quotes differing only by floating point noise share an entry.
+	Entries older than ttl seconds are recomputed. A cache can be shared
+	between threads.
+
+	eg:
+		cache = mibian.cache.PricingCache(maxSize=50000, ttl=60)
+		c = cache.price('BS', [81, 80, 6, 60], volatility=30)
+		c.callDelta				# Returns the call delta of the cached BS object
+		cache.impliedVolatility('BS', [52, 60, 5, 30], callPrice=3)
+		cache.stats()			# Returns the hits, misses, evictions, etc.
+	'''
+
+	def __init__(self, maxSize=10000, ttl=None, decimals=8):
+		if maxSize < 1:
+			raise ValueError('The cache size must be at least 1')
+		self.maxSize = maxSize
+		self.ttl = ttl
+		self.decimals = decimals
+		self._entries = OrderedDict()
+		self._lock = Lock()
+		self.clear()
+
+	def price(self, className, args, volatility):
+		'''Returns the model object priced at the given volatility'''
+		key = (className, self._quantize(args), 'volatility', \
+				round(float(volatility), self.decimals))
+		return self._get(key, lambda: \
+				getattr(mibian, className)(args, volatility=volatility))
+
+	def impliedVolatility(self, className, args, callPrice=None, \
+			putPrice=None):
+		'''Returns the implied volatility of a call or a put price'''
+		if callPrice:
+			key = (className, self._quantize(args), 'callPrice', \
+					round(float(callPrice), self.decimals))
+		else:
+			key = (className, self._quantize(args), 'putPrice', \
+					round(float(putPrice), self.decimals))
+		return self._get(key, lambda: mibian.impliedVolatility(className, \
+				args, callPrice=callPrice, putPrice=putPrice))
+
+	def stats(self):
+		'''Returns the cache statistics: {hits, misses, evictions,
+		expirations, size, maxSize}'''
+		with self._lock:
+			return {'hits': self._hits, 'misses': self._misses, \
+					'evictions': self._evictions, \
+					'expirations': self._expirations, \
+					'size': len(self._entries), 'maxSize': self.maxSize}
+
+	def clear(self):
+		'''Empties the cache and resets its statistics'''
+		with self._lock:
+			self._entries.clear()
+			self._hits = self._misses = 0
+			self._evictions = self._expirations = 0
+
+	def __len__(self):
+		return len(self._entries)
+
+	def _quantize(self, args):
+		'''Returns the rounded inputs as a hashable key'''
+		return tuple(round(float(i), self.decimals) for i in args)
+
+	def _get(self, key, compute):
+		'''Returns the cached value of key, computing it on a miss'''
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None:
+				if entry[1] is None or entry[1] > monotonic():
+					self._entries.move_to_end(key)
+					self._hits += 1
+					return entry[0]
+				del self._entries[key]
+				self._expirations += 1
+			self._misses += 1
+
+		# Computed outside of the lock so that other threads are not blocked
+		value = compute()
+		expiry = None if self.ttl is None else monotonic() + self.ttl
+
+		with self._lock:
+			self._entries[key] = (value, expiry)
+			self._entries.move_to_end(key)
+			while len(self._entries) > self.maxSize:
+				self._entries.popitem(last=False)
+				self._evictions += 1
+		return value
@@ -0,0 +1,253 @@
+'''
+MibianLib - Options Pricing Open Source Library - http://code.mibian.net/
+Copyright (C) 2011 Yassine Maaroufi - <yassinemaaroufi@mibian.net>
+Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
+
+MibianLib option chains
+'''
+
+import numpy as np
+
+from mibian.batch import OptionResults, _arguments, _factors, _solve
+from mibian.normal import cdfArray, pdfArray
+
+# The options of a chain are kept flat, grouped by expiry. Factors shared by
+# the options of an expiry (discounted underlying price, rate discount, log
+# forward price and square root of the time to expiration) are cached per
+# expiry, computed by mibian.batch._factors for a unit strike, and the
+# discounted strikes per option, so that pricing or inverting the chain only
+# computes the volatility dependent terms. Updates recompute the factors of
+# the expiries whose inputs changed only, and the discounted strikes on rate
+# changes.
+
+class OptionChain:
+	'''European options of one underlying, indexed by expiry and strike
+
+	OptionChain(className, args, strikes, days)
+
+	args are the model inputs without the strike and the expiration:
+		BS: [underlyingPrice, interestRate]
+		GK: [underlyingPrice, domesticRate, foreignRate]
+		Me: [underlyingPrice, interestRate, annualDividends]
+	Rates and dividends are numbers or one value per expiry. strikes are
+	shared by every expiry, or given per expiry as {daysToExpiration:
+	strikes}. Results and quotes are flat arrays in the order of the
+	strikePrice and daysToExpiration arrays of the chain.
+
+	eg:
+		c = mibian.chain.OptionChain('Me', [52, 1, 1], [48, 50, 52], \
+				[30, 60, 90])
+		c.price(20).callPrice			# Returns the array of call prices
+		c.update(annualDividends={60: 1.2})	# Returns [1, 0], the expiries
+										# and strikes recomputed
+		c.impliedVolatility(putPrices=[0.3, 0.8, 1.7] * 3)
+		c.index(60, 50)					# Returns 4, the position of an option
+	'''
+
+	def __init__(self, className, args, strikes, days):
+		if className not in _arguments:
+			raise ValueError('Unknown model: ' + str(className))
+		self.className = className
+		self.underlyingPrice = float(args[0])
+		self.days = np.asarray(days, dtype=np.float64).ravel()
+		if isinstance(strikes, dict):
+			strikes = [strikes[i] for i in days]
+		else:
+			strikes = [strikes] * len(self.days)
+		strikes = [np.asarray(i, dtype=np.float64).ravel() for i in strikes]
+		self.strikePrice = np.concatenate(strikes)
+		if (self.strikePrice == 0).any():
+			raise ZeroDivisionError('The strike price cannot be zero')
+		self._offsets = np.concatenate([[0], \
+				np.cumsum([len(i) for i in strikes])])
+		self._expiry = np.repeat(np.arange(len(self.days)), \
+				[len(i) for i in strikes])
+		self.daysToExpiration = self.days[self._expiry]
+		self._expiryIndex = dict((d, i) for i, d in enumerate(self.days))
+		self._index = dict(((d, k), i) for i, [d, k] in \
+				enumerate(zip(self.daysToExpiration, self.strikePrice)))
+
+		# Per expiry inputs: the rate, then the carry input of the model
+		self._names = _arguments[className][2:-1]
+		self._inputs = dict((name, np.array(np.broadcast_to(np.asarray( \
+				value, dtype=np.float64), self.days.shape))) \
+				for name, value in zip(self._names, args[1:]))
+		self._time = self.days / 365
+		[self._underlying, self._discount, self._logForward, self._root] = \
+				[np.empty(self.days.shape) for i in range(4)]
+		self._strike = np.empty(self.strikePrice.shape)
+		self._logStrike = np.log(self.strikePrice)
+		expiries = np.arange(len(self.days))
+		self._expiryFactors(expiries)
+		self._strikeFactors(expiries)
+
+	def __len__(self):
+		return len(self.strikePrice)
+
+	def index(self, daysToExpiration, strikePrice):
+		'''Returns the position of an option in the results and quotes'''
+		return self._index[(float(daysToExpiration), float(strikePrice))]
+
+	def update(self, underlyingPrice=None, **inputs):
+		'''Updates the underlying price or per expiry inputs, given by name as
+		a number or one value per expiry, or as {daysToExpiration: value}
+		for some expiries. Only the factors of the expiries whose inputs
+		changed are recomputed, and the per option ones only on rate changes.
+		Returns the numbers of expiries and of options whose factors were
+		recomputed: [Expiries, Options]
+
+		eg:
+			c.update(interestRate={30: 1.1, 60: 1.2})
+			c.update(underlyingPrice=52.4)
+		'''
+		rate = np.zeros(self.days.shape, dtype=bool)
+		carry = np.zeros(self.days.shape, dtype=bool)
+		for name, value in inputs.items():
+			if name not in self._inputs:
+				raise TypeError('Unknown input of %s: %s' % (self.className, \
+						name))
+			column = self._inputs[name]
+			if isinstance(value, dict):
+				new = column.copy()
+				for days, i in value.items():
+					new[self._expiryIndex[days]] = i
+			else:
+				new = np.broadcast_to(np.asarray(value, dtype=np.float64), \
+						column.shape)
+			changed = new != column
+			column[changed] = new[changed]
+			if name == self._names[0]:
+				rate |= changed
+			else:
+				carry |= changed
+		underlying = underlyingPrice is not None and \
+				float(underlyingPrice) != self.underlyingPrice
+		if underlying:
+			self.underlyingPrice = float(underlyingPrice)
+			# The Me carry is the dividend yield of the underlying price
+			if self.className == 'Me':
+				carry[:] = True
+		expiries = np.arange(len(self.days)) if underlying else \
+				np.flatnonzero(rate | carry)
+		self._expiryFactors(expiries)
+		return [len(expiries), self._strikeFactors(np.flatnonzero(rate))]
+
+	def price(self, volatility, performance=None, dtype=np.float64):
+		'''Returns the prices, and unless performance the greeks, of the
+		options of the chain as mibian.batch.OptionResults, the fields and
+		units being those of the mibian.batch model
+
+		volatility is a number or one value per option. With dtype=np.float32
+		the results are computed and held in single precision, the cached
+		factors staying in float64, within the error bounds of the
+		mibian.batch models.'''
+		fields = ['callPrice', 'putPrice']
+		if not performance:
+			fields += ['callDelta', 'putDelta', 'callDelta2', 'putDelta2', \
+					'callTheta', 'putTheta'] + (['callRhoD', 'putRhoD', \
+					'callRhoF', 'putRhoF'] if self.className == 'GK' else \
+					['callRho', 'putRho']) + ['vega', 'gamma', \
+					'exerciceProbability']
+		results = OptionResults(len(self), fields, dtype)
+		v = np.broadcast_to(np.asarray(volatility, dtype=dtype), \
+				self.strikePrice.shape) / 100
+		[underlying, strike, moneyness, root] = [i.astype(dtype) for i in \
+				self._factors()]
+		with np.errstate(divide='ignore', invalid='ignore'):
+			a = v * root
+			d1 = moneyness / a + a / 2
+			d2 = d1 - a
+			[n1, n2, m1, m2] = [cdfArray(i) for i in [d1, d2, -d1, -d2]]
+			results.callPrice[:] = underlying * n1 - strike * n2
+			results.putPrice[:] = strike * m2 - underlying * m1
+			if performance:
+				return results
+
+			expiry = self._expiry
+			[t, r, carry, q, discount] = [i[expiry].astype(dtype) for i in \
+					[self._time, self._rate(), self._underlying / \
+					self.underlyingPrice, self._yield(), self._discount]]
+			spot = np.asarray(self.underlyingPrice, dtype=dtype)
+			phi = pdfArray(d1)
+			density = underlying * phi
+			results.callDelta[:] = carry * n1
+			results.putDelta[:] = -carry * m1
+			results.callDelta2[:] = -n2 * discount
+			results.putDelta2[:] = m2 * discount
+			decay = -density * v / (2 * root)
+			# mibian.GK discounts the strike of its thetas at the foreign rate
+			held = self.strikePrice.astype(dtype) * carry \
+					if self.className == 'GK' else strike
+			results.callTheta[:] = (decay + q * underlying * n1 - \
+					r * held * n2) / 365
+			results.putTheta[:] = (decay - q * underlying * m1 + \
+					r * held * m2) / 365
+			if self.className == 'GK':
+				[results.callRhoD[:], results.putRhoD[:]] = \
+						[strike * t * n2 / 100, -strike * t * m2 / 100]
+				[results.callRhoF[:], results.putRhoF[:]] = \
+						[-underlying * t * n1 / 100, underlying * t * m1 / 100]
+				# Per unit of volatility, as mibian.batch.GK
+				results.vega[:] = density * root
+			else:
+				[results.callRho[:], results.putRho[:]] = \
+						[strike * t * n2 / 100, -strike * t * m2 / 100]
+				results.vega[:] = density * root / 100
+			results.gamma[:] = carry * phi / (spot * a)
+			results.exerciceProbability[:] = n2
+		return results
+
+	def impliedVolatility(self, callPrices=None, putPrices=None, guess=None, \
+			high=500.0, low=0.0, tolerance=1e-10, relTolerance=1e-10, \
+			maxIterations=100):
+		'''Returns the array of implied volatilities of call or put quotes
+		of the options of the chain, NaN where the quote is NaN, from guess
+		(a number or one volatility per option) when given'''
+		isCall = callPrices is not None
+		target = np.array(np.broadcast_to(np.asarray(callPrices if isCall \
+				else putPrices, dtype=np.float64), self.strikePrice.shape))
+		guess = np.array(np.broadcast_to(np.asarray(np.nan if guess is None \
+				else guess, dtype=np.float64), target.shape))
+		return _solve(*(self._factors() + [target, np.full(len(self), \
+				isCall), guess, high, low, tolerance, relTolerance, \
+				maxIterations]))[0]
+
+	def _factors(self):
+		'''Returns the pricing factors of every option, as
+		mibian.batch._factors: [Discounted underlying, Discounted strike, Log
+		moneyness, Square root of the time to expiration]'''
+		expiry = self._expiry
+		return [self._underlying[expiry], self._strike, \
+				self._logForward[expiry] - self._logStrike, self._root[expiry]]
+
+	def _rate(self):
+		'''Returns the per expiry rates'''
+		return self._inputs[self._names[0]] / 100
+
+	def _yield(self):
+		'''Returns the per expiry carry yields'''
+		if self.className == 'GK':
+			return self._inputs['foreignRate'] / 100
+		if self.className == 'Me':
+			return self._inputs['annualDividends'] / self.underlyingPrice
+		return np.zeros(self.days.shape)
+
+	def _expiryFactors(self, expiries):
+		'''Computes the factors of expiries, those of mibian.batch._factors
+		for a unit strike'''
+		[self._underlying[expiries], self._discount[expiries], \
+				self._logForward[expiries], self._root[expiries]] = \
+				_factors(self.className, [self.underlyingPrice, 1.0] + \
+				[self._inputs[name][expiries] for name in self._names] + \
+				[self.days[expiries]])
+
+	def _strikeFactors(self, expiries):
+		'''Computes the discounted strikes of the options of expiries,
+		returning the number of options'''
+		count = 0
+		for i in expiries:
+			options = slice(self._offsets[i], self._offsets[i + 1])
+			np.multiply(self.strikePrice[options], self._discount[i], \
+					out=self._strike[options])
+			count += int(options.stop - options.start)
+		return count
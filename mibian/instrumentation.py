@@ -0,0 +1,114 @@
+'''
+MibianLib - Options Pricing Open Source Library - http://code.mibian.net/
+Copyright (C) 2011 Yassine Maaroufi - <yassinemaaroufi@mibian.net>
+Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
+
+MibianLib instrumentation
+'''
+
+import sys
+from time import perf_counter
+
+# Disabled, instrumentation costs one flag test per implied volatility solve:
+# the counting and timing wrappers are only installed by enable().
+enabled = False
+
+# Upper bounds (seconds) of the latency histogram buckets, the last one is
+# unbounded
+BUCKETS = [1e-6 * 2**i for i in range(21)] + [float('inf')]
+MODELS = ['GK', 'BS', 'Me']
+EXITS = ['converged', 'brent', 'high', 'low', 'maxIterations']
+# Counters of the normal distribution kernels, the array ones counting an
+# evaluation per element
+KERNELS = {'cdf': 'cdfEvaluations', 'pdf': 'pdfEvaluations', \
+		'cdfArray': 'cdfEvaluations', 'pdfArray': 'pdfEvaluations'}
+
+_originals = {}
+
+def enable():
+	'''Starts counting model constructions, normal distribution evaluations
+	and solver iterations, and timing model constructions'''
+	global enabled
+	if enabled:
+		return
+	import mibian
+	from mibian import normal
+	# The kernels are also imported by name: every mibian module holding one
+	# gets the counting wrapper, and the modules imported later import it
+	for name, counter in KERNELS.items():
+		original = getattr(normal, name)
+		_originals[name] = [original, _counted(counter, original)]
+		_replace(name, *_originals[name])
+	for name in MODELS:
+		model = getattr(mibian, name)
+		_originals[name] = model.__init__
+		model.__init__ = _timed(name, model.__init__)
+	enabled = True
+
+def disable():
+	'''Stops the instrumentation, keeping the collected statistics'''
+	global enabled
+	if not enabled:
+		return
+	import mibian
+	for name in KERNELS:
+		[original, counted] = _originals.pop(name)
+		_replace(name, counted, original)
+	for name in MODELS:
+		getattr(mibian, name).__init__ = _originals.pop(name)
+	enabled = False
+
+def reset():
+	'''Clears the collected statistics'''
+	global _counters, _solver, _latency
+	_counters = {'cdfEvaluations': 0, 'pdfEvaluations': 0}
+	_solver = {'calls': 0, 'iterations': 0, \
+			'exits': dict((i, 0) for i in EXITS)}
+	_latency = dict((name, [0] * len(BUCKETS)) for name in MODELS)
+
+def snapshot():
+	'''Returns a copy of the collected statistics:
+	{constructions, cdfEvaluations, pdfEvaluations, solver, latency}'''
+	return {'constructions': dict((name, sum(_latency[name])) \
+			for name in MODELS), \
+			'cdfEvaluations': _counters['cdfEvaluations'], \
+			'pdfEvaluations': _counters['pdfEvaluations'], \
+			'solver': {'calls': _solver['calls'], \
+					'iterations': _solver['iterations'], \
+					'exits': dict(_solver['exits'])}, \
+			'latency': dict((name, {'buckets': list(BUCKETS), \
+					'counts': list(_latency[name])}) for name in MODELS)}
+
+def recordSolver(reason, iterations):
+	'''Records the exit of an implied volatility solve'''
+	_solver['calls'] += 1
+	_solver['iterations'] += iterations
+	_solver['exits'][reason] += 1
+
+def _counted(counter, function):
+	'''Returns function counting its calls, by element over arrays'''
+	def wrapper(x):
+		_counters[counter] += getattr(x, 'size', 1)
+		return function(x)
+	return wrapper
+
+def _replace(name, old, new):
+	'''Replaces a function by another in the loaded mibian modules'''
+	for moduleName, module in list(sys.modules.items()):
+		if (moduleName == 'mibian' or moduleName.startswith('mibian.')) and \
+				getattr(module, name, None) is old:
+			setattr(module, name, new)
+
+def _timed(name, init):
+	'''Returns a model constructor recording its latency'''
+	def wrapper(self, *args, **kwargs):
+		start = perf_counter()
+		init(self, *args, **kwargs)
+		elapsed = perf_counter() - start
+		i = 0
+		while elapsed > BUCKETS[i]:
+			i += 1
+		_latency[name][i] += 1
+	return wrapper
+
+reset()
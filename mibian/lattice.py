@@ -0,0 +1,270 @@
+'''
+MibianLib - Options Pricing Open Source Library - http://code.mibian.net/
+Copyright (C) 2011 Yassine Maaroufi - <yassinemaaroufi@mibian.net>
+Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
+
+MibianLib American options lattices
+'''
+
+from math import e
+
+import numpy as np
+
+import mibian.batch
+from mibian.batch import _inputs
+from mibian.normal import cdfArray, pdfArray
+
+# Lattices are recombining trees in the log of the underlying price, built for
+# every option at once: each step backward is one array operation over the
+# options and the nodes of a time step, the previous steps being discarded,
+# so memory grows with options x steps. The carry is the one of the model:
+# none for BS, the dividend yield annualDividends / underlyingPrice for Me and
+# the foreign rate for GK.
+
+class American:
+	'''American options priced on binomial (Cox-Ross-Rubinstein) or trinomial
+	(Kamrad-Ritchken) lattices
+
+	American(className, args, volatility, steps=200, method='binomial', \
+			controlVariate=True, performance=None)
+
+	args and volatility are those of the mibian.batch model, broadcast
+	together. More steps are slower but more accurate; the last step before
+	expiration is valued in closed form, which keeps the convergence smooth
+	in the number of steps. Deltas, gammas and thetas are read off the first steps of the
+	tree; vegas, per volatility point, come from two more lattices at plus and
+	minus one point, unless performance. With controlVariate, the error of the
+	same lattice on the European option, known in closed form, is removed
+	from the American prices and greeks, which mostly cancels the
+	discretization error.
+
+	eg:
+		a = mibian.lattice.American('BS', [81, [75, 80, 85], 6, 60], \
+				volatility=30, steps=200)
+		a.putPrice				# Returns an array of American put prices
+		a.putDelta				# Returns an array of American put deltas
+	'''
+
+	def __init__(self, className, args, volatility, steps=200, \
+			method='binomial', controlVariate=True, performance=None):
+		self.className = className
+		self.steps = steps
+		self.method = method
+		self.controlVariate = controlVariate
+		[s, k, r, q, t, v] = _carry(className, args, volatility)
+		self.underlyingPrice = s
+		self.volatility = v
+		v = v / 100
+		sides = np.array([1.0, -1.0]).reshape((2,) + (1,) * s.ndim)
+		[prices, deltas, gammas, thetas] = _lattice(s, k, r, q, t, v, sides, \
+				steps, method, controlVariate, True)
+		[self.callPrice, self.putPrice] = prices
+		[self.callDelta, self.putDelta] = deltas
+		[self.callGamma, self.putGamma] = gammas
+		[self.callTheta, self.putTheta] = thetas / 365
+		self.callVega = self.putVega = None
+		if not performance:
+			up = _lattice(s, k, r, q, t, v + 0.01, sides, steps, method, \
+					controlVariate)
+			down = _lattice(s, k, r, q, t, np.maximum(v - 0.01, 0), sides, \
+					steps, method, controlVariate)
+			width = (v + 0.01 - np.maximum(v - 0.01, 0)) * 100
+			[self.callVega, self.putVega] = (up - down) / width
+
+def impliedVolatility(className, args, callPrice=None, putPrice=None, \
+		steps=200, method='binomial', controlVariate=True, high=500.0, \
+		low=0.0, tolerance=1e-8, maxIterations=50):
+	'''Returns an array of American implied volatilities
+
+	Newton steps on the lattice price, with the closed form European vega as
+	slope, from the European implied volatility of the quote; steps leaving
+	the bracket of an option are replaced by a bisection of it. tolerance is
+	relative to the quotes above 1. Quotes below
+	the lattice price at the lowest volatility give 0.001, those above the
+	price at high give high, NaN quotes give NaN.
+
+	eg:
+		mibian.lattice.impliedVolatility('BS', [81, 80, 6, 60], putPrice=3.2)
+	'''
+	isCall = callPrice is not None
+	[s, k, r, q, t, target] = _carry(className, args, \
+			callPrice if isCall else putPrice)
+	shape = target.shape
+	[s, k, r, q, t, target] = [i.ravel() for i in [s, k, r, q, t, target]]
+	side = 1.0 if isCall else -1.0
+	size = len(target)
+	volatility = np.full(size, np.nan)
+	low = max(low, 0.00001)
+	lows = np.full(size, low / 100)
+	highs = np.full(size, high / 100)
+	tolerance = tolerance * (1 + np.abs(target))
+
+	def price(i, v):
+		return _lattice(s[i], k[i], r[i], q[i], t[i], v, side, steps, method, \
+				controlVariate) - target[i]
+
+	with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+		active = np.flatnonzero(~np.isnan(target))
+		above = price(active, highs[active]) < 0
+		volatility[active[above]] = high
+		active = active[~above]
+		below = price(active, lows[active]) > 0
+		volatility[active[below]] = 0.001
+		active = active[~below]
+
+		# From the European implied volatility, the early exercise premium
+		# being small next to the time value
+		guess = mibian.batch.impliedVolatility(className, args, callPrice, \
+				putPrice, high, low, tolerance=1e-6, relTolerance=0)
+		v = np.clip(np.ravel(np.broadcast_to(guess, shape)) / 100, lows, highs)
+		v = np.where(np.isnan(v), (lows + highs) / 2, v)
+
+		for i in range(maxIterations):
+			if not len(active):
+				break
+			x = v[active]
+			diff = price(active, x)
+			done = np.abs(diff) <= tolerance[active]
+			highs[active] = np.where(diff > 0, x, highs[active])
+			lows[active] = np.where(diff > 0, lows[active], x)
+			slope = _european(s[active], k[active], r[active], q[active], \
+					t[active], x, side)[4]
+			step = x - diff / slope
+			bisection = (lows[active] + highs[active]) / 2
+			step = np.where((step > lows[active]) & (step < highs[active]), \
+					step, bisection)
+			done |= highs[active] - lows[active] <= 1e-12
+			volatility[active] = np.where(done, x, step) * 100
+			v[active] = step
+			active = active[~done]
+	return volatility.reshape(shape)
+
+def _carry(className, args, last):
+	'''Returns the model inputs with the carry as a yield and the
+	volatilities or quotes last: [Underlying prices, Strike prices,
+	Interest rates, Carry yields, Times to expiration, Last]'''
+	if className == 'GK':
+		[s, k, r, q, t, last] = _inputs(*(list(args[:5]) + [last]))
+		[r, q] = [r / 100, q / 100]
+	elif className == 'BS':
+		[s, k, r, t, last] = _inputs(*(list(args[:4]) + [last]))
+		[r, q] = [r / 100, np.zeros(s.shape)]
+	elif className == 'Me':
+		[s, k, r, d, t, last] = _inputs(*(list(args[:5]) + [last]))
+		[r, q] = [r / 100, d / s]
+	else:
+		raise ValueError('Unknown model: ' + str(className))
+	if (k == 0).any():
+		raise ZeroDivisionError('The strike price cannot be zero')
+	return [s, k, r, q, t / 365, last]
+
+def _lattice(s, k, r, q, t, v, side, steps, method, controlVariate, \
+		greeks=False):
+	'''Returns the American prices of calls (side 1) or puts (side -1), side
+	broadcasting against the options, and with greeks their deltas, gammas
+	and thetas per year: [Prices, Deltas, Gammas, Thetas]'''
+	if method not in ['binomial', 'trinomial']:
+		raise ValueError('Unknown lattice method: ' + str(method))
+	if steps < 3:
+		raise ValueError('A lattice needs at least 3 steps')
+	inputs = np.broadcast_arrays(s, k, r, q, t, v, side)
+	shape = inputs[0].shape
+	result = _induct(*([i.ravel() for i in inputs] + [steps, \
+			method == 'trinomial', controlVariate, greeks]))
+	result = result.reshape(result.shape[:-1] + shape)
+	return result if greeks else result[0]
+
+def _induct(s, k, r, q, t, v, side, steps, trinomial, controlVariate, \
+		greeks):
+	'''Returns the American prices of flat arrays of options, and with
+	greeks their deltas, gammas and thetas per year, as one array: [Prices]
+	or [Prices, Deltas, Gammas, Thetas]'''
+	dt = t / steps
+	discount = e**(-r * dt)
+	if trinomial:
+		# Kamrad-Ritchken spacing of 1.5**0.5 standard deviations, more
+		# accurate for American options than the sqrt(3) of Hull
+		dx = v * (1.5 * dt)**0.5
+		drift = (r - q - v * v / 2) * (dt / 6)**0.5 / v
+		weights = [(1 / 3 - drift) * discount, 1 / 3 * discount, \
+				(1 / 3 + drift) * discount]
+		stride = 1
+	else:
+		dx = v * dt**0.5
+		up = (e**((r - q) * dt) - e**-dx) / (e**dx - e**-dx)
+		weights = [(1 - up) * discount, up * discount]
+		stride = 2
+	# Nodes are the first axis so that each step works on whole blocks of
+	# options. Exercise values are over every log price of the lattice, the
+	# nodes of step i being one in stride of those between -i and i times dx.
+	column = lambda x: x.reshape(-1, 1)
+	spots = lambda i: s * np.exp(dx * column(np.arange(-i, i + 1, stride)))
+	exercise = np.maximum(side * (s * np.exp(dx * column(np.arange(-steps, \
+			steps + 1))) - k), 0)
+	nodes = lambda i: slice(steps - i, steps + i + 1, stride)
+
+	# The last step is the closed form European value over dt, which smooths
+	# the payoff kink out of the convergence of the lattice
+	last = _european(spots(steps - 1), k, r, q, dt, v, side)[0]
+	# American values first, then the European ones of the control variate
+	values = np.stack([last, last], axis=1) if controlVariate else \
+			last[:, np.newaxis]
+	np.maximum(values[:, 0], exercise[nodes(steps - 1)], out=values[:, 0])
+	buffers = [np.empty(values.shape) for i in range(1 + trinomial)]
+	levels = {}
+	for i in range(steps - 2, -1, -1):
+		# Updated in place over the nodes of the step, the first ones of the
+		# buffer
+		width = i + 1 if stride == 2 else 2 * i + 1
+		current = values[:width]
+		low = buffers[0][:width]
+		np.multiply(values[1:width + 1], weights[1], out=low)
+		if trinomial:
+			high = buffers[1][:width]
+			np.multiply(values[2:width + 2], weights[2], out=high)
+			low += high
+		np.multiply(current, weights[0], out=current)
+		current += low
+		np.maximum(current[:, 0], exercise[nodes(i)], out=current[:, 0])
+		if greeks and i <= 2:
+			levels[i] = [spots(i)[:, np.newaxis], current.copy()]
+
+	price = values[0]
+	if greeks:
+		[spot, values] = levels[1 if trinomial else 2]
+		gamma = ((values[-1] - values[-2]) / (spot[-1] - spot[-2]) - \
+				(values[1] - values[0]) / (spot[1] - spot[0])) / \
+				((spot[-1] - spot[0]) / 2)
+		# The middle node of the level is at the current underlying price
+		theta = (values[len(values) // 2] - price) / \
+				(dt * (1 if trinomial else 2))
+		[spot, values] = levels[1]
+		delta = (values[-1] - values[0]) / (spot[-1] - spot[0])
+		result = [price, delta, gamma, theta]
+	else:
+		result = [price]
+	if controlVariate:
+		exact = _european(s, k, r, q, t, v, side)
+		result = [i[0] + j - i[1] for i, j in zip(result, exact)]
+	else:
+		result = [i[0] for i in result]
+	return np.array(result)
+
+def _european(s, k, r, q, t, v, side):
+	'''Returns the closed form European prices, deltas, gammas, thetas per
+	year and vegas per unit of volatility of calls (side 1) or puts
+	(side -1): [Prices, Deltas, Gammas, Thetas, Vegas]'''
+	with np.errstate(divide='ignore', invalid='ignore'):
+		a = v * t**0.5
+		underlying = s * np.exp(-q * t)
+		strike = k * np.exp(-r * t)
+		d1 = np.log(underlying / strike) / a + a / 2
+		d2 = d1 - a
+		density = underlying * pdfArray(d1)
+		[n1, n2] = [cdfArray(side * d1), cdfArray(side * d2)]
+		price = side * (underlying * n1 - strike * n2)
+		delta = side * underlying / s * n1
+		gamma = density / (s * s * a)
+		theta = -density * v / (2 * t**0.5) + side * (q * underlying * n1 - \
+				r * strike * n2)
+		return [price, delta, gamma, theta, density * t**0.5]
@@ -0,0 +1,169 @@
+'''
+MibianLib - Options Pricing Open Source Library - http://code.mibian.net/
+Copyright (C) 2011 Yassine Maaroufi - <yassinemaaroufi@mibian.net>
+Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
+
+MibianLib Monte Carlo pricing
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+from math import e
+import os
+
+import numpy as np
+
+import mibian.batch
+from mibian.lattice import _carry
+
+def european(paths, strike, isCall):
+	'''Payoff on the last price of the paths'''
+	return np.maximum((paths[:, -1] - strike) * (1 if isCall else -1), 0)
+
+def asian(paths, strike, isCall):
+	'''Payoff on the arithmetic average of the prices of the paths'''
+	return np.maximum((paths.mean(axis=1) - strike) * (1 if isCall else -1), 0)
+
+def lookback(paths, strike, isCall):
+	'''Payoff on the highest price of the paths for calls, the lowest for
+	puts'''
+	if isCall:
+		return np.maximum(paths.max(axis=1) - strike, 0)
+	return np.maximum(strike - paths.min(axis=1), 0)
+
+PAYOFFS = {'european': european, 'asian': asian, 'lookback': lookback}
+
+def price(className, args, volatility, payoff='european', isCall=True, \
+		steps=1, paths=1000000, chunkSize=50000, antithetic=True, \
+		controlVariate=True, targetError=None, seed=None, workers=1, \
+		executor=None):
+	'''Returns the Monte Carlo price of an option, its standard error and
+	the number of paths simulated: [Price, Standard error, Paths]
+
+	Paths of the model dynamics (no carry for BS, the dividend yield of Me,
+	the foreign rate for GK) are observed at steps evenly spaced dates up to
+	the expiration and simulated in chunks of chunkSize, so memory stays
+	bounded by chunkSize x steps, chunkSize being rounded up to an even number
+	with antithetic, which needs an even number of paths. payoff is a name of PAYOFFS or a function
+	payoff(paths, strike, isCall) of the (paths x dates) prices, defined at
+	module level to reach worker processes. With antithetic, every normal
+	draw is also used negated. With controlVariate, the discounted European
+	payoff is regressed out against its closed form price. Simulation stops
+	once the standard error is at most targetError.
+
+	Chunk i draws from the i-th stream spawned from np.random.SeedSequence
+	(seed) and chunks are accumulated in order, so that results are
+	reproducible for a seed whatever the number of workers.
+
+	eg:
+		mibian.montecarlo.price('BS', [81, 80, 6, 60], 30, payoff='asian', \
+				steps=60, targetError=0.001, seed=1, workers=8)
+	'''
+	if chunkSize < 2:
+		raise ValueError('The chunk size must be at least 2')
+	if antithetic:
+		if paths % 2:
+			raise ValueError('Antithetic sampling needs an even number of ' \
+					'paths')
+		# Whole antithetic pairs in every chunk, so that paths are simulated
+		chunkSize += chunkSize % 2
+	function = PAYOFFS.get(payoff, payoff)
+	if not callable(function):
+		raise ValueError('Unknown payoff: ' + str(payoff))
+	[s, k, r, q, t, v] = [float(i) for i in _carry(className, args, \
+			volatility)]
+	option = getattr(mibian.batch, className)(args, volatility=volatility, \
+			performance=True)
+	expected = float(option.callPrice if isCall else option.putPrice)
+
+	chunks = -(-paths // chunkSize)
+	streams = np.random.SeedSequence(seed).spawn(chunks)
+	tasks = [[s, k, r, q, t, v / 100, isCall, function, steps, \
+			min(chunkSize, paths - i * chunkSize), antithetic, streams[i]] \
+			for i in range(chunks)]
+
+	total = None
+	results = _run(tasks, workers, executor)
+	try:
+		for i, statistics in enumerate(results):
+			total = statistics if total is None else \
+					_combine(total, statistics)
+			[value, error] = _estimate(total, expected, controlVariate)
+			if targetError is not None and i and error <= targetError:
+				break
+	finally:
+		results.close()
+	return [value, error, total[0] * (2 if antithetic else 1)]
+
+def _run(tasks, workers, executor):
+	'''Yields the statistics of the chunks in order, keeping at most twice
+	as many chunks in flight as workers so that an early stop wastes little'''
+	if executor is None and (workers == 1 or len(tasks) <= 1):
+		for task in tasks:
+			yield _chunk(task)
+		return
+	pool = executor or ProcessPoolExecutor(max_workers=workers)
+	window = 2 * (workers or os.cpu_count() or 1)
+	futures = []
+	try:
+		for task in tasks:
+			futures.append(pool.submit(_chunk, task))
+			if len(futures) >= window:
+				yield futures.pop(0).result()
+		while futures:
+			yield futures.pop(0).result()
+	finally:
+		for future in futures:
+			future.cancel()
+		if executor is None:
+			pool.shutdown(wait=True, cancel_futures=True)
+
+def _chunk(task):
+	'''Simulates a chunk of paths in a worker process and returns the
+	statistics of the discounted payoffs y and European payoffs x:
+	[Samples, Mean of y, Mean of x, Sum of squares of y, Of x, Of x and y],
+	sums of squares being centered. Antithetic pairs count as one sample.'''
+	[s, k, r, q, t, v, isCall, payoff, steps, size, antithetic, stream] = task
+	generator = np.random.default_rng(stream)
+	half = -(-size // 2) if antithetic else size
+	# Normals turned into paths in place
+	paths = np.empty((2 * half if antithetic else half, steps))
+	generator.standard_normal(out=paths[:half])
+	if antithetic:
+		np.negative(paths[:half], out=paths[half:])
+	dt = t / steps
+	paths *= v * dt**0.5
+	paths += (r - q - v * v / 2) * dt
+	np.cumsum(paths, axis=1, out=paths)
+	np.exp(paths, out=paths)
+	paths *= s
+	discount = e**(-r * t)
+	y = discount * np.asarray(payoff(paths, k, isCall), dtype=np.float64)
+	x = discount * european(paths, k, isCall)
+	if antithetic:
+		y = (y[:half] + y[half:]) / 2
+		x = (x[:half] + x[half:]) / 2
+	[my, mx] = [y.mean(), x.mean()]
+	[dy, dx] = [y - my, x - mx]
+	return [len(y), my, mx, dy.dot(dy), dx.dot(dx), dx.dot(dy)]
+
+def _combine(a, b):
+	'''Returns the statistics of two sets of samples together'''
+	n = a[0] + b[0]
+	[deltaY, deltaX] = [b[1] - a[1], b[2] - a[2]]
+	weight = a[0] * b[0] / n
+	return [n, a[1] + deltaY * b[0] / n, a[2] + deltaX * b[0] / n, \
+			a[3] + b[3] + deltaY * deltaY * weight, \
+			a[4] + b[4] + deltaX * deltaX * weight, \
+			a[5] + b[5] + deltaX * deltaY * weight]
+
+def _estimate(statistics, expected, controlVariate):
+	'''Returns the price and its standard error from the statistics of the
+	samples: [Price, Standard error]'''
+	[n, my, mx, syy, sxx, sxy] = statistics
+	if controlVariate and sxx > 0:
+		beta = sxy / sxx
+		value = my - beta * (mx - expected)
+		residual = max(syy - sxy * sxy / sxx, 0.0)
+	else:
+		[value, residual] = [my, syy]
+	return [float(value), float((residual / max(n - 1, 1) / n)**0.5)]
@@ -0,0 +1,34 @@
+'''
+MibianLib - Options Pricing Open Source Library - http://code.mibian.net/
+Copyright (C) 2011 Yassine Maaroufi - <yassinemaaroufi@mibian.net>
+Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
+
+MibianLib standard normal distribution
+'''
+
+from math import erfc, exp, pi
+
+# The cdf goes through erfc rather than erf so that both tails keep full
+# relative precision: 1 + erf(x) cancels for large negative x.
+_SQRT1_2 = 0.5**0.5
+_INVSQRT2PI = (2 * pi)**-0.5
+
+def cdf(x):
+	'''Returns the standard normal cumulative distribution function at x'''
+	return 0.5 * erfc(-x * _SQRT1_2)
+
+def pdf(x):
+	'''Returns the standard normal probability density function at x'''
+	return _INVSQRT2PI * exp(-0.5 * x * x)
+
+def cdfArray(x):
+	'''Returns the standard normal cumulative distribution function over an
+	array'''
+	from scipy.special import ndtr
+	return ndtr(x)
+
+def pdfArray(x):
+	'''Returns the standard normal probability density function over an
+	array'''
+	from numpy import exp
+	return _INVSQRT2PI * exp(-0.5 * x * x)
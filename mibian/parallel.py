@@ -0,0 +1,101 @@
+'''
+MibianLib - Options Pricing Open Source Library - http://code.mibian.net/
+Copyright (C) 2011 Yassine Maaroufi - <yassinemaaroufi@mibian.net>
+Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
+
+MibianLib parallel pricing
+'''
+
+from concurrent.futures import ProcessPoolExecutor
+
+import mibian
+
+def price(className, argsList, volatilities, fields=None, workers=None, \
+		chunkSize=1000, returnExceptions=False, executor=None):
+	'''Returns the fields of every option, in input order:
+	[[field values of the first option], ...]
+
+	The options are split in chunks of chunkSize priced by a pool of worker
+	processes, with the scalar models so that the results are identical to
+	a serial loop. fields defaults to the prices followed by every greek of
+	the model. An option that fails raises its exception, or is returned as
+	the exception itself with returnExceptions.
+
+	eg:
+		mibian.parallel.price('BS', [[81, 80, 6, 60], [81, 85, 6, 60]], \
+				[30, 28], fields=['callPrice', 'callDelta'], workers=32)
+	'''
+	if fields is None:
+		fields = ['callPrice', 'putPrice'] + \
+				list(getattr(mibian, className)._greeks_)
+	items = list(zip(argsList, volatilities))
+	return _map(_priceChunk, className, items, fields, workers, chunkSize, \
+			returnExceptions, executor)
+
+def impliedVolatility(className, argsList, callPrices=None, putPrices=None, \
+		workers=None, chunkSize=1000, returnExceptions=False, executor=None, \
+		**options):
+	'''Returns the implied volatility of every call or put price, in input
+	order. options are passed on to mibian.impliedVolatility.
+
+	eg:
+		mibian.parallel.impliedVolatility('BS', [[52, 60, 5, 30]] * 2, \
+				callPrices=[3, 3.1], workers=32)
+	'''
+	if callPrices is not None:
+		items = [(args, {'callPrice': i}) for args, i in \
+				zip(argsList, callPrices)]
+	else:
+		items = [(args, {'putPrice': i}) for args, i in \
+				zip(argsList, putPrices)]
+	return _map(_impliedVolatilityChunk, className, items, options, workers, \
+			chunkSize, returnExceptions, executor)
+
+def _map(function, className, items, options, workers, chunkSize, \
+		returnExceptions, executor):
+	'''Returns the results of function over the items split in chunks, in
+	input order'''
+	if chunkSize < 1:
+		raise ValueError('The chunk size must be at least 1')
+	chunks = [items[i:i + chunkSize] for i in range(0, len(items), chunkSize)]
+	if executor is not None:
+		results = executor.map(function, [className] * len(chunks), chunks, \
+				[options] * len(chunks))
+	elif workers == 1 or len(chunks) <= 1:
+		results = map(function, [className] * len(chunks), chunks, \
+				[options] * len(chunks))
+	else:
+		with ProcessPoolExecutor(max_workers=workers) as pool:
+			results = list(pool.map(function, [className] * len(chunks), \
+					chunks, [options] * len(chunks)))
+
+	output = []
+	for chunk in results:
+		for result in chunk:
+			if isinstance(result, Exception) and not returnExceptions:
+				raise result
+			output.append(result)
+	return output
+
+def _priceChunk(className, chunk, fields):
+	'''Prices a chunk of options in a worker process'''
+	model = getattr(mibian, className)
+	results = []
+	for args, volatility in chunk:
+		try:
+			option = model(args, volatility=volatility)
+			results.append([getattr(option, i) for i in fields])
+		except Exception as error:
+			results.append(error)
+	return results
+
+def _impliedVolatilityChunk(className, chunk, options):
+	'''Inverts a chunk of option prices in a worker process'''
+	results = []
+	for args, price in chunk:
+		try:
+			results.append(mibian.impliedVolatility(className, args, \
+					**dict(price, **options)))
+		except Exception as error:
+			results.append(error)
+	return results
@@ -0,0 +1,232 @@
+'''
+MibianLib - Options Pricing Open Source Library - http://code.mibian.net/
+Copyright (C) 2011 Yassine Maaroufi - <yassinemaaroufi@mibian.net>
+Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
+
+MibianLib portfolio risk aggregation
+'''
+
+import numpy as np
+
+import mibian.batch
+from mibian.batch import _arguments, _inputs
+
+# Aggregated quantities, position weighted. vega is per volatility point for
+# every model, rho is the interest rate rho of BS and Me positions, rhoD and
+# rhoF the domestic and foreign rate rhos of GK positions.
+FIELDS = ['value', 'delta', 'gamma', 'vega', 'theta', 'rho', 'rhoD', 'rhoF']
+
+class Portfolio:
+	'''Book of option positions held in columnar storage, one set of columns
+	per model, whose risk is aggregated in one vectorized pass per model
+
+	eg:
+		p = mibian.portfolio.Portfolio()
+		ids = p.add('BS', [81, [75, 80, 85], 6, 60], volatility=30, \
+				quantity=[10, -5, 3], isCall=[True, True, False], \
+				underlying='XYZ')
+		p.remove(ids[1])
+		p.setUnderlyingPrice('XYZ', 82)
+		p.risk()				# Returns {(underlying, days): {delta, ...}}
+		p.risk(groupBy=[])		# Returns {(): {delta, ...}} for the book
+	'''
+
+	def __init__(self):
+		self._books = dict((name, _Columns(_arguments[name] + \
+				['volatility', 'quantity', 'isCall', 'underlying'])) \
+				for name in _arguments)
+		self._models = {}
+		self._labels = []
+		# Codes of the underlying labels, and of the underlying prices of the
+		# positions added without a label, with the number of positions on
+		# each code: the codes no position refers to are reused
+		self._codes = {}
+		self._prices = {}
+		self._references = []
+		self._free = []
+		self._nextId = 0
+
+	def add(self, className, args, volatility, quantity, isCall=True, \
+			underlying=None):
+		'''Adds positions, inputs being scalars or arrays broadcast together,
+		and returns their ids. Positions are grouped by their underlying
+		label, or by underlying price without one.'''
+		if className not in self._books:
+			raise ValueError('Unknown model: ' + str(className))
+		names = _arguments[className]
+		values = _inputs(*(list(args[:len(names)]) + [volatility, quantity, \
+				isCall]))
+		size = values[0].size
+		if underlying is None:
+			codes = [self._code(i, self._prices, 1) for i in \
+					values[0].ravel().tolist()]
+		else:
+			codes = self._code(underlying, self._codes, size)
+		columns = dict(zip(names + ['volatility', 'quantity', 'isCall'], \
+				[i.ravel() for i in values]))
+		columns['underlying'] = codes
+		ids = list(range(self._nextId, self._nextId + size))
+		self._nextId += size
+		self._books[className].append(ids, columns)
+		for i in ids:
+			self._models[i] = className
+		return ids
+
+	def remove(self, ids):
+		'''Removes positions by id'''
+		for i in np.atleast_1d(ids).tolist():
+			book = self._books[self._models.pop(i)]
+			self._release(int(book.column('underlying')[book.rows[i]]), 1)
+			book.remove(i)
+
+	def setUnderlyingPrice(self, underlying, price):
+		'''Moves the underlying price of every position on an underlying,
+		given by label, or by price for the positions added without one, which
+		are then grouped by the new price'''
+		for codes in [self._codes, self._prices]:
+			code = codes.get(underlying)
+			if code is None:
+				continue
+			moved = [[book, book.column('underlying') == code] for book in \
+					self._books.values()]
+			for book, rows in moved:
+				book.column('underlyingPrice')[rows] = price
+			if codes is self._prices:
+				count = self._references[code]
+				new = self._code(float(price), self._prices, count)
+				for book, rows in moved:
+					book.column('underlying')[rows] = new
+				self._release(code, count)
+
+	def risk(self, groupBy=('underlying', 'daysToExpiration'), \
+			dtype=np.float64):
+		'''Returns the aggregated value and greeks of the positions, by
+		underlying and expiration or the given subset of them:
+		{(key, ...): {value, delta, gamma, vega, theta, rho, rhoD, rhoF}}
+
+		dtype is the precision of the pricing of the positions, their
+		weighting and sums being in float64 whatever it is.'''
+		keys = [[] for i in groupBy]
+		values = []
+		for className, book in self._books.items():
+			if book.size:
+				for i, name in enumerate(groupBy):
+					keys[i].append(book.column(name))
+				values.append(_greeks(className, book, dtype))
+		if not values:
+			return {}
+		values = np.concatenate(values)
+
+		# Groups numbered from the codes of each key, sorting 1D integers
+		# rather than rows
+		group = np.zeros(len(values), dtype=np.int64)
+		levels = []
+		for key in keys:
+			[level, codes] = np.unique(np.concatenate(key), return_inverse=True)
+			group = group * len(level) + codes.ravel()
+			levels.append(level.tolist())
+		[groups, inverse] = np.unique(group, return_inverse=True)
+		totals = np.column_stack([np.bincount(inverse.ravel(), \
+				weights=values[:, i], minlength=len(groups)) \
+				for i in range(len(FIELDS))])
+
+		result = {}
+		for group, total in zip(groups.tolist(), totals.tolist()):
+			key = []
+			for name, level in reversed(list(zip(groupBy, levels))):
+				[group, code] = divmod(group, len(level))
+				key.insert(0, self._labels[int(level[code])] \
+						if name == 'underlying' else level[code])
+			result[tuple(key)] = dict(zip(FIELDS, total))
+		return result
+
+	def __len__(self):
+		return len(self._models)
+
+	def _code(self, label, codes, count):
+		'''Returns the integer code of an underlying label or price in
+		codes, counting count more positions on it'''
+		if label not in codes:
+			if self._free:
+				codes[label] = self._free.pop()
+				self._labels[codes[label]] = label
+			else:
+				codes[label] = len(self._labels)
+				self._labels.append(label)
+				self._references.append(0)
+		self._references[codes[label]] += count
+		return codes[label]
+
+	def _release(self, code, count):
+		'''Counts count positions less on a code, freeing it once no position
+		refers to it'''
+		self._references[code] -= count
+		if not self._references[code]:
+			label = self._labels[code]
+			codes = self._codes if self._codes.get(label) == code else \
+					self._prices
+			del codes[label]
+			self._free.append(code)
+
+def _greeks(className, book, dtype=np.float64):
+	'''Returns the position weighted value and greeks of the positions of a
+	model, one row per position and one column per field of FIELDS'''
+	model = getattr(mibian.batch, className)([book.column(i) for i in \
+			_arguments[className]], volatility=book.column('volatility'), \
+			dtype=dtype)
+	quantity = book.column('quantity')
+	isCall = book.column('isCall') != 0
+	side = lambda call, put: np.where(isCall, call, put) * quantity
+	zero = np.zeros(book.size)
+	if className == 'GK':
+		# GK vegas are per unit of volatility
+		[vega, rho] = [model.vega / 100, zero]
+		[rhoD, rhoF] = [side(model.callRhoD, model.putRhoD), \
+				side(model.callRhoF, model.putRhoF)]
+	else:
+		[vega, rho] = [model.vega, side(model.callRho, model.putRho)]
+		rhoD = rhoF = zero
+	return np.column_stack([side(model.callPrice, model.putPrice), \
+			side(model.callDelta, model.putDelta), model.gamma * quantity, \
+			vega * quantity, side(model.callTheta, model.putTheta), rho, rhoD, \
+			rhoF])
+
+class _Columns:
+	'''Growable columns of the positions of one model, kept dense by moving
+	the last position into the row of a removed one'''
+	__slots__ = ['values', 'ids', 'rows', 'size']
+
+	def __init__(self, names):
+		self.values = dict((name, np.empty(16)) for name in names)
+		self.ids = np.empty(16, dtype=np.int64)
+		self.rows = {}
+		self.size = 0
+
+	def append(self, ids, columns):
+		'''Appends positions: columns are {name: scalar or array}'''
+		end = self.size + len(ids)
+		if end > len(self.ids):
+			capacity = max(2 * len(self.ids), end)
+			for name, column in self.values.items():
+				self.values[name] = np.resize(column, capacity)
+			self.ids = np.resize(self.ids, capacity)
+		for name, column in self.values.items():
+			column[self.size:end] = columns[name]
+		self.ids[self.size:end] = ids
+		self.rows.update(zip(ids, range(self.size, end)))
+		self.size = end
+
+	def remove(self, id):
+		'''Removes a position'''
+		row = self.rows.pop(id)
+		last = self.size - 1
+		if row != last:
+			for column in self.values.values():
+				column[row] = column[last]
+			self.ids[row] = self.ids[last]
+			self.rows[int(self.ids[row])] = row
+		self.size = last
+
+	def column(self, name):
+		'''Returns a view of a column over the current positions'''
+		return self.values[name][:self.size]
@@ -0,0 +1,270 @@
+'''
+MibianLib - Options Pricing Open Source Library - http://code.mibian.net/
+Copyright (C) 2011 Yassine Maaroufi - <yassinemaaroufi@mibian.net>
+Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
+
+MibianLib rational implied volatility
+'''
+
+from math import e, exp, log, sqrt, pi
+
+from mibian import normal
+
+# All three models are priced in normalized form: with the discounted
+# underlying U (S e**(-qT), q being 0 for BS, the dividend yield for Me and
+# the foreign rate for GK) and the discounted strike K e**(-rT), the price
+# divided by sqrt(U K e**(-rT)) is a function b(x, s) of the log moneyness
+# x = ln(U / (K e**(-rT))) and of the total volatility s = volatility * T**0.5
+# only. Every quote is reduced to an out of the money call (x <= 0) with
+# put-call parity and b(x, s, put) = b(-x, s, call).
+#
+# As in Jaeckel's "Let's Be Rational", s is first estimated from three
+# anchors: the inflection point s_c = sqrt(2|x|) of b, and the points where
+# the tangent at s_c crosses 0 and the maximum price e**(x/2). Between them
+# s is interpolated as a cubic in b; below, a map matching b for small s is
+# interpolated and inverted, and above, likewise a map matching b for large s. Two third order
+# Householder steps then polish s, on ln(b) for low prices so that the
+# relative precision of tiny out of the money quotes is kept.
+
+_LOG_SQRT_2PI = 0.5 * log(2 * pi)
+_LOWER_MAP = 2 * pi / sqrt(27)
+
+def _inverseCdf(p):
+	'''Returns the standard normal quantile of p, replaced on first use by
+	the one of statistics, whose import is slow'''
+	global _inverseCdf
+	from statistics import NormalDist
+	_inverseCdf = NormalDist().inv_cdf
+	return _inverseCdf(p)
+
+def impliedVolatility(className, args, callPrice=None, putPrice=None, \
+		steps=2):
+	'''Returns the implied volatility of a call or a put price. A price at or
+	below the intrinsic value gives 0, one at or above the price for an
+	infinite volatility gives inf.
+
+	eg:
+		mibian.rational.impliedVolatility('Me', [52, 50, 1, 1, 30], \
+				callPrice=3)
+	'''
+	[underlying, strike, t] = _factors(className, args)
+	isCall = callPrice is not None
+	price = float(callPrice if isCall else putPrice)
+	s = normalizedVolatility(price / sqrt(underlying * strike), \
+			log(underlying / strike), isCall, steps)
+	return 100 * s / sqrt(t)
+
+def impliedVolatilityArray(className, args, callPrice=None, \
+		putPrice=None, steps=2):
+	'''Returns an array of implied volatilities of call or put prices, the
+	inputs being arrays as in mibian.batch
+
+	eg:
+		mibian.rational.impliedVolatilityArray('BS', [100, \
+				numpy.linspace(80, 120, 41), 1, 30], callPrice=quotes)
+	'''
+	from mibian.batch import _factors
+	[underlying, strike, moneyness, root] = _factors(className, args)
+	isCall = callPrice is not None
+	price = callPrice if isCall else putPrice
+	s = normalizedVolatilityArray(price / (underlying * strike)**0.5, \
+			moneyness, isCall, steps)
+	return 100 * s / root
+
+def normalizedVolatility(beta, x, isCall=True, steps=2):
+	'''Returns the total volatility s of a normalized price beta at the log
+	moneyness x'''
+	[beta, x] = _outOfTheMoney(beta, x, isCall)
+	bMax = exp(x / 2)
+	if beta <= 0:
+		return 0.0
+	if beta >= bMax:
+		return float('inf')
+	if x == 0:
+		return _polish(beta, x, 2 * _inverseCdf((1 + beta) / 2), steps, \
+				False)
+
+	sc = sqrt(-2 * x)
+	bc = _black(x, sc)
+	vc = _vega(x, sc)
+	sl = sc - bc / vc
+	su = sc + (bMax - bc) / vc
+	bl = _black(x, sl) if sl > 0 else 0.0
+	if beta < bl:
+		s = _lower(beta, x, bl, sl)
+	elif beta <= bc:
+		s = _hermite(beta, bl, bc, sl, sc, _slope(x, sl), 1 / vc)
+	else:
+		bu = _black(x, su)
+		if beta <= bu:
+			s = _hermite(beta, bc, bu, sc, su, 1 / vc, _slope(x, su))
+		else:
+			s = _upper(beta, x, bu, su, bMax)
+	return _polish(beta, x, s, steps, beta < bc)
+
+def _outOfTheMoney(beta, x, isCall):
+	'''Returns the normalized price and log moneyness of the equivalent out
+	of the money call, by put-call parity and b(x, s, put) = b(-x, s, call):
+	[Price, Log moneyness]'''
+	if (x > 0) == isCall and x != 0:
+		beta -= (1 if isCall else -1) * (exp(x / 2) - exp(-x / 2))
+	return [beta, -abs(x)]
+
+def _factors(className, args):
+	'''Returns the discounted underlying and strike and the time to
+	expiration of a model: [Underlying, Strike, Time]'''
+	if className == 'GK':
+		[r, q, t] = [float(args[2]) / 100, float(args[3]) / 100, \
+				float(args[4]) / 365]
+	elif className == 'BS':
+		[r, q, t] = [float(args[2]) / 100, 0.0, float(args[3]) / 365]
+	elif className == 'Me':
+		[r, q, t] = [float(args[2]) / 100, float(args[3]) / float(args[0]), \
+				float(args[4]) / 365]
+	else:
+		raise ValueError('Unknown model: ' + str(className))
+	if float(args[1]) == 0:
+		raise ZeroDivisionError('The strike price cannot be zero')
+	return [float(args[0]) * e**(-q * t), float(args[1]) * e**(-r * t), t]
+
+def _black(x, s):
+	'''Returns the normalized out of the money call price b(x, s)'''
+	if s <= 0:
+		return 0.0
+	return exp(x / 2) * normal.cdf(x / s + s / 2) - \
+			exp(-x / 2) * normal.cdf(x / s - s / 2)
+
+def _vega(x, s):
+	'''Returns the derivative of b(x, s) in s'''
+	h = x / s
+	t = s / 2
+	return exp(-0.5 * (h * h + t * t) - _LOG_SQRT_2PI)
+
+def _slope(x, s):
+	'''Returns the derivative of s in b, or 0 where b is flat'''
+	vega = _vega(x, s) if s > 0 else 0.0
+	return 1 / vega if vega > 0 else 0.0
+
+def _hermite(beta, b0, b1, s0, s1, slope0, slope1):
+	'''Returns the cubic Hermite interpolation of s(b) between two anchors'''
+	width = b1 - b0
+	u = (beta - b0) / width
+	v = 1 - u
+	return v * v * ((1 + 2 * u) * s0 + u * width * slope0) + \
+			u * u * ((3 - 2 * u) * s1 - v * width * slope1)
+
+def _lower(beta, x, bl, sl):
+	'''Returns s below the lower anchor, interpolating the map
+	f(s) = 2 pi |x| / 27**0.5 N(-|x| / (3 s**2)**0.5)**3, which is b(x, s) to
+	the leading orders of small s, between f(0) = 0 and f(sl)'''
+	z = -x / sqrt(3 * sl * sl)
+	fl = _LOWER_MAP * -x * normal.cdf(-z)**3
+	slope = 3 * _LOWER_MAP * -x * normal.cdf(-z)**2 * normal.pdf(z) * z / \
+			sl / _vega(x, sl)
+	f = _hermite(beta, 0.0, bl, 0.0, fl, 1.0, slope)
+	if not f > 0:
+		return 0.0
+	return x / (sqrt(3) * _inverseCdf(min((f / (_LOWER_MAP * -x))**(1 / 3.0), \
+			0.5)))
+
+def _upper(beta, x, bu, su, bMax):
+	'''Returns s above the upper anchor, interpolating the map
+	f(s) = N(-s/2), which is (bMax - b(x, s)) / 2 for large s, between f(su)
+	and f(infinity) = 0'''
+	slope = -normal.pdf(su / 2) / (2 * _vega(x, su))
+	f = _hermite(beta, bu, bMax, normal.cdf(-su / 2), 0.0, slope, -0.5)
+	if not f > 0:
+		return float('inf')
+	return -2 * _inverseCdf(min(f, 0.5))
+
+def _polish(beta, x, s, steps, logarithmic):
+	'''Returns s after third order Householder steps on b(x, s) = beta, or on
+	ln(b(x, s)) = ln(beta)'''
+	for i in range(steps):
+		if not s > 0:
+			return 0.0
+		b = _black(x, s)
+		vega = _vega(x, s)
+		q = x * x / s**3 - s / 4
+		dq = -3 * x * x / s**4 - 0.25
+		if logarithmic and b > 0:
+			ratio = vega / b
+			newton = -log(b / beta) / ratio
+			h2 = q - ratio
+			h3 = q * q + dq - 3 * ratio * q + 2 * ratio * ratio
+		else:
+			if vega <= 0:
+				return s
+			newton = (beta - b) / vega
+			h2 = q
+			h3 = q * q + dq
+		s += newton * (1 + newton * h2 / 2) / \
+				(1 + newton * (h2 + newton * h3 / 6))
+	return s
+
+def normalizedVolatilityArray(beta, x, isCall=True, steps=2):
+	'''Returns the total volatilities of arrays of normalized prices and
+	log moneyness, NaN prices giving NaN'''
+	import numpy as np
+	from scipy.special import ndtri
+	from mibian.normal import cdfArray, pdfArray
+	[beta, x, isCall] = np.broadcast_arrays(np.asarray(beta, dtype=np.float64), \
+			np.asarray(x, dtype=np.float64), np.asarray(isCall, dtype=bool))
+	theta = np.where(isCall, 1.0, -1.0)
+
+	def black(x, s):
+		return np.exp(x / 2) * cdfArray(x / s + s / 2) - \
+				np.exp(-x / 2) * cdfArray(x / s - s / 2)
+
+	def vega(x, s):
+		return np.exp(-0.5 * ((x / s)**2 + s * s / 4) - _LOG_SQRT_2PI)
+
+	with np.errstate(divide='ignore', invalid='ignore', over='ignore', \
+			under='ignore'):
+		beta = np.where(theta * x > 0, \
+				beta - theta * (np.exp(x / 2) - np.exp(-x / 2)), beta)
+		x = -np.abs(x)
+		bMax = np.exp(x / 2)
+		sc = (-2 * x)**0.5
+		bc = black(x, sc)
+		vc = vega(x, sc)
+		sl = sc - bc / vc
+		su = sc + (bMax - bc) / vc
+		bl = np.where(sl > 0, black(x, sl), 0.0)
+		bu = black(x, su)
+
+		# Lower map, cubic, upper map and at the money guesses
+		z = -x / (3 * sl * sl)**0.5
+		f = _hermite(beta, 0.0, bl, 0.0, _LOWER_MAP * -x * cdfArray(-z)**3, \
+				1.0, 3 * _LOWER_MAP * -x * cdfArray(-z)**2 * pdfArray(z) * z / \
+				sl / vega(x, sl))
+		lower = x / (3**0.5 * ndtri(np.minimum((f / (_LOWER_MAP * -x))**(1 / 3.0), \
+				0.5)))
+		middle = np.where(beta <= bc, \
+				_hermite(beta, bl, bc, sl, sc, 1 / vega(x, sl), 1 / vc), \
+				_hermite(beta, bc, bu, sc, su, 1 / vc, 1 / vega(x, su)))
+		f = _hermite(beta, bu, bMax, cdfArray(-su / 2), 0.0, \
+				-pdfArray(su / 2) / (2 * vega(x, su)), -0.5)
+		upper = -2 * ndtri(np.minimum(f, 0.5))
+		s = np.where(beta < bl, lower, np.where(beta <= bu, middle, upper))
+		s = np.where(x == 0, 2 * ndtri((1 + beta) / 2), s)
+		s = np.where(s > 0, s, 0.0)
+
+		logarithmic = (beta < bc) & (x != 0)
+		for i in range(steps):
+			b = black(x, s)
+			v = vega(x, s)
+			q = x * x / s**3 - s / 4
+			dq = -3 * x * x / s**4 - 0.25
+			ratio = v / b
+			use = logarithmic & (b > 0)
+			newton = np.where(use, -np.log(b / beta) / ratio, (beta - b) / v)
+			h2 = np.where(use, q - ratio, q)
+			h3 = np.where(use, q * q + dq - 3 * ratio * q + 2 * ratio * ratio, \
+					q * q + dq)
+			step = newton * (1 + newton * h2 / 2) / \
+					(1 + newton * (h2 + newton * h3 / 6))
+			s = np.where((s > 0) & np.isfinite(step), s + step, s)
+
+		s = np.where(beta <= 0, 0.0, np.where(beta >= bMax, np.inf, s))
+		return np.where(np.isnan(beta), np.nan, s)
@@ -0,0 +1,124 @@
+'''
+MibianLib - Options Pricing Open Source Library - http://code.mibian.net/
+Copyright (C) 2011 Yassine Maaroufi - <yassinemaaroufi@mibian.net>
+Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
+
+MibianLib scenario grids
+'''
+
+from math import e
+
+import numpy as np
+
+from mibian.batch import _inputs
+from mibian.normal import cdfArray
+
+# Cells (spot shocks x volatility shocks x positions) priced at a time when
+# no chunk size is given
+CHUNK_CELLS = 1000000
+
+def grid(className, args, volatility, spotShocks, volatilityShocks, \
+		quantity=1, isCall=True, relative=True, aggregate=False, \
+		chunkSize=None, dtype=np.float64):
+	'''Returns the P&L of positions over every pair of spot and volatility
+	shocks: an array [spot shock, volatility shock, position], or
+	[spot shock, volatility shock] summed over the positions with aggregate
+
+	Spot shocks are relative moves of the underlying price (0.01 for +1%),
+	or absolute ones without relative; volatility shocks are added to the
+	volatility, in points. Only the terms depending on a shock are computed
+	per scenario: the discounted strikes and square roots of the times to
+	expiration are computed once, the log moneyness once per spot shock and
+	the total volatility once per volatility shock. Positions are priced in
+	chunks of chunkSize to bound the memory used.
+
+	With dtype=np.float32 the scenarios are priced, and the P&L returned,
+	in single precision, halving the memory of the grid. The unshocked
+	values, the put-call parity differences and the sums over positions of
+	aggregate stay in float64, and the P&L of each cell is within 1e-6 times
+	(shocked underlying price + strike price) x quantity of the float64 one.
+
+	eg:
+		mibian.scenario.grid('BS', [81, [75, 80, 85], 6, 60], 30, \
+				np.linspace(-0.2, 0.2, 41), np.linspace(-10, 10, 21), \
+				quantity=[10, -5, 3], isCall=[True, True, False])
+	'''
+	if className == 'GK':
+		[s, k, r, q, t, vol, quantity, isCall] = _inputs(*(list(args[:5]) + \
+				[volatility, quantity, isCall]))
+		[r, q, d] = [r / 100, q / 100, None]
+	elif className == 'BS':
+		[s, k, r, t, vol, quantity, isCall] = _inputs(*(list(args[:4]) + \
+				[volatility, quantity, isCall]))
+		[r, q, d] = [r / 100, 0.0, None]
+	elif className == 'Me':
+		[s, k, r, d, t, vol, quantity, isCall] = _inputs(*(list(args[:5]) + \
+				[volatility, quantity, isCall]))
+		[r, q] = [r / 100, None]
+	else:
+		raise ValueError('Unknown model: ' + str(className))
+	if (k == 0).any():
+		raise ZeroDivisionError('The strike price cannot be zero')
+	[s, k, r, t, vol, quantity, isCall] = [np.ravel(i) for i in \
+			[s, k, r, t, vol, quantity, isCall]]
+	t = t / 365
+	strike = k * e**(-r * t)
+	root = t**0.5
+	if d is None:
+		carry = e**(-np.ravel(q) * t)
+	else:
+		d = np.ravel(d)
+	spotShocks = np.asarray(spotShocks, dtype=np.float64).reshape(-1, 1, 1)
+	volatilityShocks = np.asarray(volatilityShocks, \
+			dtype=np.float64).reshape(1, -1, 1)
+	isCall = isCall != 0
+
+	size = len(s)
+	shape = (spotShocks.shape[0], volatilityShocks.shape[1])
+	if chunkSize is None:
+		chunkSize = max(1, CHUNK_CELLS // (shape[0] * shape[1]))
+	result = np.zeros(shape if aggregate else shape + (size,), \
+			dtype=np.float64 if aggregate else dtype)
+	# Inputs of the shocked values at the precision of the grid
+	[spotShocks, volatilityShocks, spots, strikes, roots, vols] = \
+			[i.astype(dtype) for i in [spotShocks, volatilityShocks, s, \
+			strike, root, vol]]
+	if d is None:
+		carries = carry.astype(dtype)
+	else:
+		dividends = (d * t).astype(dtype)
+
+	with np.errstate(divide='ignore', invalid='ignore'):
+		for start in range(0, size, chunkSize):
+			i = slice(start, start + chunkSize)
+			spot = spots[i] * (1 + spotShocks) if relative else \
+					spots[i] + spotShocks
+			# Me dividends are a yield of the shocked underlying price
+			if d is None:
+				underlying = spot * carries[i]
+				base = s[i] * carry[i]
+			else:
+				underlying = spot * np.exp(-dividends[i] / spot)
+				base = s[i] * np.exp(-d[i] * t[i] / s[i])
+			shocked = _value(underlying, strikes[i], np.log(underlying / \
+					strikes[i]), np.maximum(vols[i] + volatilityShocks, 0) / \
+					100 * roots[i], isCall[i])
+			pnl = (shocked - _value(base, strike[i], np.log(base / \
+					strike[i]), vol[i] / 100 * root[i], isCall[i])) * \
+					quantity[i]
+			if aggregate:
+				result += pnl.sum(axis=2)
+			else:
+				result[:, :, i] = pnl
+	return result
+
+def _value(underlying, strike, moneyness, a, isCall):
+	'''Returns the call or put values from the pricing factors and the total
+	volatilities a, the put from the call by put-call parity'''
+	d1 = moneyness / a + a / 2
+	call = underlying * cdfArray(d1) - strike * cdfArray(d1 - a)
+	# Zero total volatility: the discounted intrinsic value
+	call = np.where(a > 0, call, np.maximum(underlying - strike, 0))
+	# The parity difference in float64 whatever the precision of the values
+	return np.where(isCall, call, call - underlying.astype(np.float64) + \
+			strike)
@@ -0,0 +1,382 @@
+'''
+MibianLib - Options Pricing Open Source Library - http://code.mibian.net/
+Copyright (C) 2011 Yassine Maaroufi - <yassinemaaroufi@mibian.net>
+Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
+
+MibianLib pricing server
+
+python -m mibian.server [--host 127.0.0.1] [--port 8765] [--path sock] \
+		[--maxBatchSize 256] [--maxWait 0.001] [--maxPending 10000]
+'''
+
+import argparse
+import asyncio
+import json
+import socket
+from collections import deque
+from time import perf_counter
+
+import numpy as np
+
+import mibian
+import mibian.batch
+from mibian.batch import _arguments
+
+# Protocol: one JSON object per line each way. Requests carry an id echoed
+# in their response and an op:
+#	{"id": 1, "op": "price", "model": "BS", "args": [81, 80, 6, 60],
+#			"volatility": 30, "fields": ["callPrice", "callDelta"]}
+#	{"id": 2, "op": "impliedVolatility", "model": "BS",
+#			"args": [52, 60, 5, 30], "callPrice": 3}
+#	{"id": 3, "op": "stats"}
+# Responses are {"id": 1, "result": ...} or {"id": 1, "error": "..."}, in
+# completion order, with null for undefined (NaN) values. price results map
+# each field (by default the prices and every greek of the model) to its value.
+# Lines that are not JSON objects are answered with a null id, as are lines
+# longer than the stream limit (64 kB), which also end their connection.
+
+class PricingServer:
+	'''Pricing server grouping concurrent requests into micro-batches priced
+	through mibian.batch
+
+	PricingServer(maxBatchSize=256, maxWait=0.001, maxPending=10000)
+
+	A batch is evaluated as soon as it holds maxBatchSize requests or maxWait
+	seconds after its first request. At most maxPending requests are queued:
+	beyond that, connections are no longer read until the queue drains.
+
+	eg:
+		server = mibian.server.PricingServer(maxBatchSize=512)
+		asyncio.run(server.serve(port=8765))
+	'''
+
+	def __init__(self, maxBatchSize=256, maxWait=0.001, maxPending=10000):
+		self.maxBatchSize = maxBatchSize
+		self.maxWait = maxWait
+		self.maxPending = maxPending
+		self._queue = None
+		self._server = None
+		# The batch being collected or evaluated
+		self._current = []
+		self._closing = False
+		self._latencies = deque(maxlen=10000)
+		self._started = perf_counter()
+		self._requests = self._batches = self._errors = 0
+
+	async def start(self, host='127.0.0.1', port=8765, path=None):
+		'''Starts listening on a Unix socket path, or on host and port, and
+		returns the address actually bound'''
+		self._queue = asyncio.Queue(self.maxPending)
+		self._batcher = asyncio.ensure_future(self._batch())
+		if path is not None:
+			self._server = await asyncio.start_unix_server(self._connection, \
+					path)
+			return path
+		self._server = await asyncio.start_server(self._connection, host, port)
+		return self._server.sockets[0].getsockname()[:2]
+
+	async def serve(self, host='127.0.0.1', port=8765, path=None):
+		'''Starts the server and serves until cancelled'''
+		await self.start(host, port, path)
+		async with self._server:
+			await self._server.serve_forever()
+
+	async def close(self):
+		'''Stops listening and evaluating, failing the requests not evaluated
+		yet'''
+		self._closing = True
+		self._server.close()
+		error = ConnectionError('The server is closing')
+		while not self._queue.empty():
+			_fail(self._queue.get_nowait()[1], error)
+		self._batcher.cancel()
+		for item in self._current:
+			_fail(item[1], error)
+		await asyncio.gather(self._batcher, return_exceptions=True)
+		await self._server.wait_closed()
+
+	def stats(self):
+		'''Returns the server statistics: {requests, batches, errors,
+		meanBatchSize, pending, throughput, latency}, the throughput in
+		requests per second since the start and the latency percentiles of
+		the last 10000 requests in seconds'''
+		latencies = sorted(self._latencies)
+		percentile = lambda p: latencies[min(len(latencies) - 1, \
+				int(p / 100.0 * len(latencies)))] if latencies else 0.0
+		return {'requests': self._requests, 'batches': self._batches, \
+				'errors': self._errors, \
+				'meanBatchSize': self._requests / max(self._batches, 1), \
+				'pending': self._queue.qsize() if self._queue else 0, \
+				'throughput': self._requests / (perf_counter() - self._started), \
+				'latency': {'p50': percentile(50), 'p90': percentile(90), \
+						'p99': percentile(99), 'max': percentile(100)}}
+
+	async def _connection(self, reader, writer):
+		'''Reads the requests of a connection, answering each one when its
+		batch is evaluated'''
+		pending = set()
+		try:
+			while True:
+				try:
+					line = await reader.readline()
+				except ValueError as error:
+					# A line over the stream limit: the following lines cannot
+					# be told apart from its remainder
+					await self._reply(writer, {'id': None, 'error': str(error)})
+					break
+				if not line:
+					break
+				try:
+					request = json.loads(line)
+				except ValueError as error:
+					await self._reply(writer, {'id': None, 'error': str(error)})
+					continue
+				if not isinstance(request, dict):
+					await self._reply(writer, {'id': None, \
+							'error': 'request must be an object'})
+					continue
+				if request.get('op') == 'stats':
+					await self._reply(writer, {'id': request.get('id'), \
+							'result': self.stats()})
+					continue
+				future = asyncio.get_running_loop().create_future()
+				# Blocks while the queue is full, leaving the socket unread
+				await self._queue.put((request, future, perf_counter()))
+				if self._closing:
+					_fail(future, ConnectionError('The server is closing'))
+				task = asyncio.ensure_future(self._answer(writer, request, \
+						future))
+				pending.add(task)
+				task.add_done_callback(pending.discard)
+		except ConnectionError:
+			pass
+		finally:
+			if pending:
+				await asyncio.wait(pending)
+			writer.close()
+
+	async def _answer(self, writer, request, future):
+		'''Writes the response of a request'''
+		try:
+			response = {'id': request.get('id'), \
+					'result': _standard(await future)}
+		except Exception as error:
+			response = {'id': request.get('id'), 'error': str(error)}
+		await self._reply(writer, response)
+
+	async def _reply(self, writer, response):
+		'''Writes a response line, waiting while the client is slow to read
+		them. The responses of a lost connection are dropped.'''
+		if writer.is_closing():
+			return
+		writer.write(json.dumps(response).encode() + b'\n')
+		try:
+			await writer.drain()
+		except ConnectionError:
+			pass
+
+	async def _batch(self):
+		'''Collects the queued requests into batches and evaluates them in the
+		default executor, so that connections are served meanwhile'''
+		loop = asyncio.get_running_loop()
+		while True:
+			batch = self._current = [await self._queue.get()]
+			deadline = loop.time() + self.maxWait
+			while len(batch) < self.maxBatchSize:
+				timeout = deadline - loop.time()
+				if timeout <= 0:
+					break
+				try:
+					batch.append(await asyncio.wait_for(self._queue.get(), \
+							timeout))
+				except asyncio.TimeoutError:
+					break
+			results = await loop.run_in_executor(None, _evaluate, \
+					[item[0] for item in batch])
+			self._current = []
+			for [request, future, start], result in zip(batch, results):
+				if future.done():
+					continue
+				if isinstance(result, Exception):
+					self._errors += 1
+					future.set_exception(result)
+				else:
+					future.set_result(result)
+			now = perf_counter()
+			self._batches += 1
+			self._requests += len(batch)
+			self._latencies.extend(now - start for request, future, start \
+					in batch)
+
+def _fail(future, error):
+	'''Fails a request not answered yet'''
+	if not future.done():
+		future.set_exception(error)
+
+def _evaluate(requests):
+	'''Returns the results of a batch of requests, or their exceptions, one
+	vectorized call per operation and model'''
+	groups = {}
+	for i, request in enumerate(requests):
+		key = (request.get('op'), request.get('model'), 'callPrice' in request)
+		groups.setdefault(key, []).append(i)
+	results = [None] * len(requests)
+	for key, indices in groups.items():
+		try:
+			values = _vectorized(key, [requests[i] for i in indices])
+		except Exception:
+			# Evaluated one by one so that a bad request only fails itself
+			values = []
+			for i in indices:
+				try:
+					values.append(_vectorized(key, [requests[i]])[0])
+				except Exception as error:
+					values.append(error)
+		for i, value in zip(indices, values):
+			results[i] = value
+	return results
+
+def _standard(value):
+	'''Returns a result with its NaN and infinite numbers as None, which
+	standard JSON cannot represent'''
+	if isinstance(value, float):
+		return value if value - value == 0 else None
+	if isinstance(value, dict):
+		return dict((name, _standard(i)) for name, i in value.items())
+	if isinstance(value, list):
+		return [_standard(i) for i in value]
+	return value
+
+def _vectorized(key, requests):
+	'''Returns the results of requests of the same operation and model'''
+	[op, className, isCall] = key
+	if className not in _arguments:
+		raise ValueError('Unknown model: ' + str(className))
+	size = len(_arguments[className])
+	columns = [np.array([float(r['args'][i]) for r in requests]) \
+			for i in range(size)]
+	if op == 'price':
+		model = getattr(mibian.batch, className)(columns, \
+				volatility=np.array([float(r['volatility']) for r in requests]))
+		defaults = ['callPrice', 'putPrice'] + \
+				list(getattr(mibian, className)._greeks_)
+		values = {}
+		results = []
+		for i, request in enumerate(requests):
+			fields = request.get('fields') or defaults
+			for name in fields:
+				if name not in values:
+					if name not in defaults:
+						raise ValueError('Unknown field: ' + str(name))
+					values[name] = getattr(model, name).tolist()
+			results.append(dict((name, values[name][i]) for name in fields))
+		return results
+	if op == 'impliedVolatility':
+		quotes = np.array([float(r['callPrice' if isCall else 'putPrice']) \
+				for r in requests])
+		if isCall:
+			return mibian.batch.impliedVolatility(className, columns, \
+					callPrice=quotes).tolist()
+		return mibian.batch.impliedVolatility(className, columns, \
+				putPrice=quotes).tolist()
+	raise ValueError('Unknown operation: ' + str(op))
+
+class Client:
+	'''Blocking client of a pricing server
+
+	Client(host='127.0.0.1', port=8765, path=None)
+
+	eg:
+		client = mibian.server.Client(port=8765)
+		client.price('BS', [81, 80, 6, 60], 30, fields=['callPrice'])
+		client.impliedVolatility('BS', [52, 60, 5, 30], callPrice=3)
+		client.many([{'op': 'price', 'model': 'BS', 'args': [81, 80, 6, 60], \
+				'volatility': 30}] * 100)
+		client.stats()
+	'''
+
+	def __init__(self, host='127.0.0.1', port=8765, path=None):
+		if path is not None:
+			self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+			self._socket.connect(path)
+		else:
+			self._socket = socket.create_connection((host, port))
+		self._file = self._socket.makefile('rb')
+		self._nextId = 0
+
+	def price(self, className, args, volatility, fields=None):
+		'''Returns the prices and greeks of an option: {field: value}'''
+		return self.request({'op': 'price', 'model': className, \
+				'args': list(args), 'volatility': volatility, 'fields': fields})
+
+	def impliedVolatility(self, className, args, callPrice=None, \
+			putPrice=None):
+		'''Returns the implied volatility of a call or put price'''
+		request = {'op': 'impliedVolatility', 'model': className, \
+				'args': list(args)}
+		if callPrice is not None:
+			request['callPrice'] = callPrice
+		else:
+			request['putPrice'] = putPrice
+		return self.request(request)
+
+	def stats(self):
+		'''Returns the server statistics'''
+		return self.request({'op': 'stats'})
+
+	def request(self, request):
+		'''Sends a request and returns its result, raising its error'''
+		return self.many([request])[0]
+
+	def many(self, requests, returnExceptions=False):
+		'''Sends requests at once, so that the server can batch them, and
+		returns their results in order. A failed request raises its error,
+		or is returned as a ValueError with returnExceptions.'''
+		ids = []
+		lines = []
+		for request in requests:
+			request = dict(request, id=self._nextId)
+			ids.append(self._nextId)
+			self._nextId += 1
+			lines.append(json.dumps(request).encode() + b'\n')
+		self._socket.sendall(b''.join(lines))
+		responses = {}
+		while len(responses) < len(ids):
+			line = self._file.readline()
+			if not line:
+				raise ConnectionError('The server closed the connection')
+			response = json.loads(line)
+			responses[response['id']] = response
+		results = []
+		for i in ids:
+			if 'error' in responses[i]:
+				error = ValueError(responses[i]['error'])
+				if not returnExceptions:
+					raise error
+				results.append(error)
+			else:
+				results.append(responses[i]['result'])
+		return results
+
+	def close(self):
+		self._file.close()
+		self._socket.close()
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='MibianLib pricing server')
+	parser.add_argument('--host', default='127.0.0.1')
+	parser.add_argument('--port', type=int, default=8765)
+	parser.add_argument('--path', help='Unix socket path, instead of TCP')
+	parser.add_argument('--maxBatchSize', type=int, default=256)
+	parser.add_argument('--maxWait', type=float, default=0.001)
+	parser.add_argument('--maxPending', type=int, default=10000)
+	options = parser.parse_args(argv)
+	server = PricingServer(options.maxBatchSize, options.maxWait, \
+			options.maxPending)
+	try:
+		asyncio.run(server.serve(options.host, options.port, options.path))
+	except KeyboardInterrupt:
+		pass
+
+if __name__ == '__main__':
+	main()
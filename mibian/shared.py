@@ -0,0 +1,231 @@
+'''
+MibianLib - Options Pricing Open Source Library - http://code.mibian.net/
+Copyright (C) 2011 Yassine Maaroufi - <yassinemaaroufi@mibian.net>
+Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
+
+MibianLib shared memory results
+'''
+
+import mmap
+import os
+from multiprocessing import shared_memory
+from threading import Lock
+from time import monotonic, sleep
+
+import numpy as np
+
+from mibian.batch import OptionResults
+
+# Fixed schema: one float64 row per field, in this order, whatever the model.
+# Fields a model does not have are NaN.
+SCHEMA = ('callPrice', 'putPrice', 'callDelta', 'putDelta', 'callDelta2', \
+		'putDelta2', 'callTheta', 'putTheta', 'callRho', 'putRho', 'callRhoD', \
+		'putRhoD', 'callRhoF', 'putRhoF', 'vega', 'gamma', \
+		'exerciceProbability', 'impliedVolatility', 'status')
+
+# Status flags, or'ed in the status row
+PRICED = 1
+IMPLIED = 2
+INVALID = 4
+
+# Header: magic, sequence, size, field count as uint64, padded to a cache line.
+# The sequence is odd while a write is in progress and increases by two per
+# write: a copy taken between two equal even reads of it is consistent.
+_MAGIC = 0x313053455242494d		# 'MIBRES01'
+_HEADER = 64
+
+_trackerLock = Lock()
+
+def create(size, name=None, path=None):
+	'''Returns new shared results for size options, in a named shared memory
+	block or, with path, a memory-mapped file
+
+	eg:
+		r = mibian.shared.create(3, name='greeks')
+		r.publish(mibian.batch.BS([81, [75, 80, 85], 6, 60], volatility=30))
+	'''
+	length = _HEADER + len(SCHEMA) * size * 8
+	if path is not None:
+		with open(path, 'wb') as f:
+			f.truncate(length)
+		results = SharedResults(None, path)
+	else:
+		results = SharedResults(shared_memory.SharedMemory(name, create=True, \
+				size=length), None)
+	results._header[:] = [_MAGIC, 0, size, len(SCHEMA)]
+	results._map(size)
+	results.values[...] = np.nan
+	results.status[...] = 0
+	return results
+
+def attach(name=None, path=None):
+	'''Returns the shared results created under name or path, mapped without
+	copy
+
+	eg:
+		r = mibian.shared.attach('greeks')
+		r.callDelta				# Returns a live view of the call deltas
+		[snapshot, sequence] = r.read()
+	'''
+	if path is not None:
+		results = SharedResults(None, path)
+	else:
+		results = SharedResults(_attach(name), None)
+	[magic, sequence, size, count] = results._header.tolist()
+	if magic != _MAGIC or count != len(SCHEMA):
+		results.close()
+		raise ValueError('Not MibianLib shared results')
+	results._map(size)
+	return results
+
+def _attach(name):
+	'''Opens an existing shared memory block, leaving its removal to its
+	creator'''
+	try:
+		return shared_memory.SharedMemory(name, track=False)
+	except TypeError:
+		pass
+	# Before Python 3.13 every process opening a block registers it with its
+	# resource tracker, which removes the block when the process exits or,
+	# for a tracker shared with the creator, forgets the creator's registration
+	# on unregister: opened without registering instead
+	from multiprocessing import resource_tracker
+	with _trackerLock:
+		register = resource_tracker.register
+		resource_tracker.register = lambda name, rtype: None
+		try:
+			return shared_memory.SharedMemory(name)
+		finally:
+			resource_tracker.register = register
+
+class SharedResults(OptionResults):
+	'''Results of the SCHEMA fields kept in shared memory, written by one
+	process and read by any number of others without locks nor copies
+
+	Attribute access returns live views on the shared rows. read returns a
+	consistent copy and the sequence it was taken at, changed tells whether a
+	write happened since a sequence.
+
+	eg:
+		r = mibian.shared.create(3, name='greeks')
+		r.publish(mibian.batch.BS([81, [75, 80, 85], 6, 60], volatility=30), \
+				impliedVolatility=[31, 30, 29])
+		r.sequence				# Returns 2, the count of writes times two
+	'''
+
+	__slots__ = ('name', 'path', '_block', '_file', '_header')
+
+	def __init__(self, block, path):
+		self.name = block.name if block is not None else None
+		self.path = path
+		self._block = block
+		if path is not None:
+			with open(path, 'r+b') as f:
+				self._file = mmap.mmap(f.fileno(), 0)
+			buffer = self._file
+		else:
+			self._file = None
+			buffer = block.buf
+		self._header = np.frombuffer(buffer, dtype=np.uint64, count=4)
+		self.fields = SCHEMA
+		self._index = dict((name, i) for i, name in enumerate(SCHEMA))
+
+	def _map(self, size):
+		'''Maps the values after the header'''
+		buffer = self._file if self._file is not None else self._block.buf
+		self.values = np.frombuffer(buffer, dtype=np.float64, \
+				count=len(SCHEMA) * size, offset=_HEADER).reshape(len(SCHEMA), \
+				size)
+
+	def __del__(self):
+		# The views go first, a block being only closable once unreferenced
+		self.values = self._header = None
+
+	def __reduce__(self):
+		# Worker processes attach the block rather than receive a copy
+		return (attach, (self.name, self.path))
+
+	@property
+	def sequence(self):
+		'''Returns the write sequence, odd while a write is in progress'''
+		return int(self._header[1])
+
+	def changed(self, sequence):
+		'''Returns whether the results were written since sequence'''
+		return int(self._header[1]) != sequence
+
+	def publish(self, batch, impliedVolatility=None, start=0):
+		'''Writes the prices and greeks of a batch model, and optionally
+		implied volatilities, for the options from start on'''
+		size = np.size(batch.callPrice)
+		rows = slice(start, start + size)
+		with self.writing():
+			for i, name in enumerate(SCHEMA[:-2]):
+				value = getattr(batch, name, None)
+				self.values[i, rows] = np.nan if value is None else \
+						np.ravel(value)
+			status = np.where(np.isfinite(self.callPrice[rows]) & \
+					np.isfinite(self.putPrice[rows]), PRICED, INVALID)
+			if impliedVolatility is None:
+				self.impliedVolatility[rows] = np.nan
+			else:
+				self.impliedVolatility[rows] = np.ravel(impliedVolatility)
+				status = status | np.where(np.isfinite( \
+						self.impliedVolatility[rows]), IMPLIED, INVALID)
+			self.status[rows] = status
+
+	def writing(self):
+		'''Returns a context in which the values can be written, readers
+		retrying meanwhile'''
+		return _Writing(self._header)
+
+	def read(self, fields=None, timeout=1.0):
+		'''Returns a consistent copy of the results, or of the given fields,
+		and the sequence it was taken at: [OptionResults, Sequence]
+
+		Raises TimeoutError if no write finished within timeout seconds.'''
+		rows = [self._index[i] for i in fields] if fields else None
+		deadline = monotonic() + timeout
+		while True:
+			before = int(self._header[1])
+			if not before & 1:
+				values = self.values.copy() if rows is None else \
+						self.values[rows]
+				if int(self._header[1]) == before:
+					break
+			if monotonic() > deadline:
+				raise TimeoutError('The results are being written')
+			sleep(0)
+		results = OptionResults(0, fields or SCHEMA)
+		results.values = values
+		return [results, before]
+
+	def close(self):
+		'''Unmaps the results'''
+		self.values = self._header = None
+		if self._file is not None:
+			self._file.close()
+		else:
+			self._block.close()
+
+	def unlink(self):
+		'''Removes the shared memory block or file, once every process has
+		closed it'''
+		if self.path is not None:
+			os.remove(self.path)
+		else:
+			self._block.unlink()
+
+class _Writing:
+	'''Write context bumping the sequence to odd on entry and even on exit'''
+
+	__slots__ = ['header']
+
+	def __init__(self, header):
+		self.header = header
+
+	def __enter__(self):
+		self.header[1] += 1
+
+	def __exit__(self, *exception):
+		self.header[1] += 1
@@ -0,0 +1,112 @@
+'''
+MibianLib - Options Pricing Open Source Library - http://code.mibian.net/
+Copyright (C) 2011 Yassine Maaroufi - <yassinemaaroufi@mibian.net>
+Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
+
+MibianLib streaming file pipeline
+'''
+
+import csv
+from itertools import islice
+
+import numpy as np
+
+import mibian
+import mibian.batch
+from mibian.batch import _arguments
+
+# Input files hold one option per row with the model inputs as columns,
+# named as in mibian.batch._arguments, plus either a volatility column or
+# callPrice/putPrice quote columns. Only one batch of rows is held in memory
+# at a time.
+
+def run(className, inputPath, outputPath, batchSize=10000, fields=None):
+	'''Prices or inverts every row of inputPath into the CSV file outputPath
+	and returns the number of rows processed
+
+	eg:
+		mibian.stream.run('BS', 'quotes.csv', 'greeks.csv', batchSize=50000)
+	'''
+	return writeBatches(outputPath, (processBatch(className, batch, fields) \
+			for batch in readBatches(inputPath, batchSize)))
+
+def readBatches(path, batchSize=10000, columns=None):
+	'''Yields the rows of a CSV or .npy file in batches: {column: array}
+
+	.npy files are memory-mapped; they hold a structured array, or a 2D
+	array whose column names are given by columns.'''
+	if str(path).endswith('.npy'):
+		data = np.load(path, mmap_mode='r')
+		if not data.dtype.names:
+			if data.ndim != 2:
+				raise ValueError('.npy files hold a structured or 2D array, ' \
+						'not %dD' % data.ndim)
+			if columns is None:
+				raise ValueError('The column names of a 2D .npy file are ' \
+						'required')
+			if len(columns) != data.shape[1]:
+				raise ValueError('%d column names for %d columns' % \
+						(len(columns), data.shape[1]))
+		for i in range(0, len(data), batchSize):
+			rows = data[i:i + batchSize]
+			if rows.dtype.names:
+				yield dict((name, np.array(rows[name], dtype=np.float64)) \
+						for name in rows.dtype.names)
+			else:
+				yield dict((name, np.array(rows[:, j], dtype=np.float64)) \
+						for j, name in enumerate(columns))
+		return
+	with open(path, newline='') as f:
+		reader = csv.reader(f)
+		header = columns or next(reader)
+		while True:
+			rows = list(islice(reader, batchSize))
+			if not rows:
+				return
+			values = np.array([[float(value) if value else np.nan \
+					for value in row] for row in rows], dtype=np.float64)
+			yield dict((name, values[:, j]) for j, name in enumerate(header))
+
+def processBatch(className, batch, fields=None):
+	'''Returns a batch extended with its prices and greeks. Without a
+	volatility column, the implied volatility is solved from the call quotes,
+	or the put quotes where there is no call quote.'''
+	args = [batch[i] for i in _arguments[className]]
+	if fields is None:
+		fields = ['callPrice', 'putPrice'] + \
+				list(getattr(mibian, className)._greeks_)
+	output = dict(batch)
+	if 'volatility' in batch:
+		volatility = batch['volatility']
+	else:
+		volatility = np.full(len(args[0]), np.nan)
+		if 'callPrice' in batch:
+			volatility = mibian.batch.impliedVolatility(className, args, \
+					callPrice=batch['callPrice'])
+		if 'putPrice' in batch:
+			volatility = np.where(np.isnan(volatility), \
+					mibian.batch.impliedVolatility(className, args, \
+					putPrice=batch['putPrice']), volatility)
+		output['impliedVolatility'] = volatility
+	with np.errstate(invalid='ignore', divide='ignore'):
+		model = getattr(mibian.batch, className)(args, volatility=volatility)
+	for i in fields:
+		if i not in output:
+			output[i] = getattr(model, i)
+	return output
+
+def writeBatches(path, batches):
+	'''Writes batches to a CSV file as they come and returns the number of
+	rows written'''
+	count = 0
+	with open(path, 'w', newline='') as f:
+		writer = csv.writer(f)
+		header = None
+		for batch in batches:
+			if header is None:
+				header = list(batch)
+				writer.writerow(header)
+			writer.writerows(np.column_stack([batch[i] for i in header]) \
+					.tolist())
+			count += len(batch[header[0]])
+	return count
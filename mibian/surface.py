@@ -0,0 +1,130 @@
+'''
+MibianLib - Options Pricing Open Source Library - http://code.mibian.net/
+Copyright (C) 2011 Yassine Maaroufi - <yassinemaaroufi@mibian.net>
+Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
+
+MibianLib implied volatility surface
+'''
+
+from math import e
+import numpy as np
+
+from mibian.batch import _solve
+
+class VolatilitySurface:
+	'''Implied volatility surface of an option chain
+
+	VolatilitySurface(className, args, strikes, days, callPrices=None, \
+			putPrices=None)
+
+	args are the model inputs without the strike and the expiration:
+		BS: [underlyingPrice, interestRate]
+		GK: [underlyingPrice, domesticRate, foreignRate]
+		Me: [underlyingPrice, interestRate, annualDividends]
+	Rates and dividends are numbers or one value per expiry. Prices are
+	(expiries x strikes) arrays, NaN where there is no quote.
+
+	The discount factors are computed once per expiry, and the whole grid is
+	solved in one batch. Updates re-solve the affected cells only, starting
+	from their previous implied volatilities.
+
+	eg:
+		s = mibian.surface.VolatilitySurface('BS', [81, 6], [75, 80, 85], \
+				[30, 60], callPrices=[[6.9, 3.5, 1.2], [7.8, 4.8, 2.5]])
+		s.callVolatility		# Returns the (expiries x strikes) call volatilities
+		s.update(underlyingPrice=81.4)
+		s.update(callPrices={(30, 80): 3.6})
+	'''
+
+	def __init__(self, className, args, strikes, days, callPrices=None, \
+			putPrices=None, high=500.0, low=0.0, tolerance=1e-10, \
+			relTolerance=1e-10, maxIterations=100):
+		if className not in ['BS', 'GK', 'Me']:
+			raise ValueError('Unknown model: ' + str(className))
+		self.className = className
+		self.underlyingPrice = float(args[0])
+		self.strikes = np.asarray(strikes, dtype=np.float64)
+		self.days = np.asarray(days, dtype=np.float64)
+		self._solver = [high, low, tolerance, relTolerance, maxIterations]
+		# Per expiry inputs are kept as columns
+		self._args = [np.asarray(i, dtype=np.float64).reshape(-1, 1) \
+				for i in args[1:]]
+		self._strikeIndex = dict((k, i) for i, k in enumerate(strikes))
+		self._expiryIndex = dict((d, i) for i, d in enumerate(days))
+
+		shape = (2, len(self.days), len(self.strikes))
+		self.prices = np.full(shape, np.nan)
+		for side, prices in enumerate([callPrices, putPrices]):
+			if prices is not None:
+				self.prices[side] = prices
+		self.volatility = np.full(shape, np.nan)
+		self.iterations = np.zeros(shape, dtype=np.int64)
+
+		self._expiryFactors()
+		self._underlyingFactors()
+		self._solveCells(np.arange(self.prices.size))
+
+	@property
+	def callVolatility(self):
+		'''Returns the (expiries x strikes) call implied volatilities'''
+		return self.volatility[0]
+
+	@property
+	def putVolatility(self):
+		'''Returns the (expiries x strikes) put implied volatilities'''
+		return self.volatility[1]
+
+	def update(self, underlyingPrice=None, callPrices=None, putPrices=None):
+		'''Re-solves the cells affected by a new underlying price or by new
+		quotes given as {(daysToExpiration, strikePrice): price}. Returns
+		the number of cells solved.'''
+		cells = []
+		for side, prices in enumerate([callPrices, putPrices]):
+			for (days, strike), price in (prices or {}).items():
+				cell = (side, self._expiryIndex[days], \
+						self._strikeIndex[strike])
+				self.prices[cell] = price
+				cells.append(np.ravel_multi_index(cell, self.prices.shape))
+		if underlyingPrice is not None and \
+				float(underlyingPrice) != self.underlyingPrice:
+			self.underlyingPrice = float(underlyingPrice)
+			self._underlyingFactors()
+			cells = np.flatnonzero(~np.isnan(self.prices))
+		cells = np.unique(np.asarray(cells, dtype=np.int64))
+		self._solveCells(cells)
+		return len(cells)
+
+	def _rates(self):
+		'''Returns the per expiry rate and carry: [Rate, Carry]'''
+		if self.className == 'GK':
+			return [self._args[0] / 100, self._args[1] / 100]
+		if self.className == 'BS':
+			return [self._args[0] / 100, 0.0]
+		return [self._args[0] / 100, self._args[1] / self.underlyingPrice]
+
+	def _expiryFactors(self):
+		'''Computes the factors that do not depend on the underlying price'''
+		t = self.days.reshape(-1, 1) / 365
+		self._root = t**0.5
+		self._strike = self.strikes * e**(-self._rates()[0] * t)
+		self._logStrike = np.log(self._strike)
+
+	def _underlyingFactors(self):
+		'''Computes the factors that depend on the underlying price: one
+		discount and one logarithm per expiry'''
+		t = self.days.reshape(-1, 1) / 365
+		self._underlying = np.broadcast_to(self.underlyingPrice * \
+				e**(-self._rates()[1] * t), t.shape)
+		self._moneyness = np.log(self._underlying) - self._logStrike
+
+	def _solveCells(self, cells):
+		'''Solves the given flat cell indices, warm-started from the current
+		volatilities'''
+		[side, expiry, strike] = np.unravel_index(cells, self.prices.shape)
+		target = self.prices.ravel()[cells]
+		[volatility, iterations] = _solve(self._underlying[expiry, 0], \
+				self._strike[expiry, strike], self._moneyness[expiry, strike], \
+				self._root[expiry, 0], target, side == 0, \
+				self.volatility.ravel()[cells], *self._solver)
+		self.volatility.flat[cells] = volatility
+		self.iterations.flat[cells] = iterations
@@ -0,0 +1,147 @@
+'''
+MibianLib - Options Pricing Open Source Library - http://code.mibian.net/
+Copyright (C) 2011 Yassine Maaroufi - <yassinemaaroufi@mibian.net>
+Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
+
+MibianLib implied volatility inversion table
+'''
+
+import os
+from math import exp, log, sqrt
+
+import numpy as np
+
+from mibian import rational
+from mibian.normal import cdfArray
+
+# The table holds ln(s), s being the total volatility volatility * T**0.5,
+# over a regular grid of the normalized out of the money call price of
+# mibian.rational: rows are sqrt(-x) for the log moneyness x in
+# [-MONEYNESS, 0], columns N^-1(b / e**(x/2)) for the normalized price b in
+# [PRICES[0], PRICES[1]]. Both coordinates keep ln(s) smooth down to deep out
+# of the money prices of 1e-300. The grid bounds are fixed so that a table is
+# a plain .npy array, memory-mapped at load and shared between processes
+# through the page cache.
+MONEYNESS = 4.0
+PRICES = [-37.0, 8.0]
+
+_tables = {}
+
+def build(path, moneynessSize=256, priceSize=1024):
+	'''Computes a table, saves it to path and returns it loaded
+
+	eg:
+		mibian.table.build('iv.npy')
+	'''
+	rows = np.linspace(0, sqrt(MONEYNESS), moneynessSize).reshape(-1, 1)
+	columns = np.linspace(PRICES[0], PRICES[1], priceSize)
+	x = -rows**2
+	beta = np.exp(x / 2) * cdfArray(columns)
+	with np.errstate(divide='ignore'):
+		values = np.log(rational.normalizedVolatilityArray(beta, x))
+	values = np.maximum(values, log(1e-300))
+	# Written aside then renamed so that readers never see a partial table
+	temporary = str(path) + '.tmp.npy'
+	np.save(temporary, values)
+	os.replace(temporary, path)
+	_tables.pop(str(path), None)
+	return load(path)
+
+def load(path):
+	'''Returns the table saved at path, memory-mapped once per process'''
+	key = str(path)
+	if key not in _tables:
+		_tables[key] = InversionTable(key)
+	return _tables[key]
+
+class InversionTable:
+	'''Implied volatility inversion table, interpolating an estimate of the
+	implied volatility and a bracket around it
+
+	eg:
+		t = mibian.table.load('iv.npy')
+		t.estimate('BS', [52, 60, 5, 30], putPrice=7.86)
+		mibian.impliedVolatility('BS', [52, 60, 5, 30], putPrice=7.86, \
+				table=t)
+	'''
+	__slots__ = ['path', 'values', '_flat']
+
+	def __init__(self, path):
+		self.path = path
+		self.values = np.load(path, mmap_mode='r')
+		# Scalar lookups index the mapped buffer directly, numpy indexing
+		# costing more than the whole interpolation
+		self._flat = memoryview(self.values).cast('B').cast('d')
+
+	def __reduce__(self):
+		# Worker processes map the file again rather than receive a copy
+		return (load, (self.path,))
+
+	def estimate(self, className, args, callPrice=None, putPrice=None):
+		'''Returns the interpolated implied volatility of a call or put price
+		and a bracket around it: [Implied volatility, Low, High]
+
+		Prices out of the table give NaNs.'''
+		[underlying, strike, t] = rational._factors(className, args)
+		isCall = callPrice is not None
+		price = float(callPrice if isCall else putPrice)
+		[beta, x] = rational._outOfTheMoney(price / sqrt(underlying * strike), \
+				log(underlying / strike), isCall)
+		bMax = exp(x / 2)
+		[rows, columns] = self.values.shape
+		i = sqrt(-x / MONEYNESS) * (rows - 1)
+		if not 0 < beta < bMax or i > rows - 1:
+			return [float('nan')] * 3
+		j = (rational._inverseCdf(beta / bMax) - PRICES[0]) / \
+				(PRICES[1] - PRICES[0]) * (columns - 1)
+		if not 0 <= j <= columns - 1:
+			return [float('nan')] * 3
+		i0 = min(int(i), rows - 2)
+		j0 = min(int(j), columns - 2)
+		k = i0 * columns + j0
+		flat = self._flat
+		[a, b, c, d] = [flat[k], flat[k + 1], flat[k + columns], \
+				flat[k + columns + 1]]
+		[u, v] = [i - i0, j - j0]
+		s = exp((1 - u) * ((1 - v) * a + v * b) + u * ((1 - v) * c + v * d))
+		scale = 100 / sqrt(t)
+		return [s * scale, exp(min(a, b, c, d)) * 0.9 * scale, \
+				exp(max(a, b, c, d)) * 1.1 * scale]
+
+	def estimateArray(self, className, args, callPrice=None, putPrice=None):
+		'''Returns arrays of interpolated implied volatilities of call or put
+		prices and brackets around them: [Implied volatilities, Lows, Highs]'''
+		from scipy.special import ndtri
+		from mibian.batch import _factors
+		[underlying, strike, moneyness, root] = _factors(className, args)
+		isCall = callPrice is not None
+		price = np.asarray(callPrice if isCall else putPrice, dtype=np.float64)
+		[beta, x] = np.broadcast_arrays(price / (underlying * strike)**0.5, \
+				moneyness)
+		sign = 1.0 if isCall else -1.0
+		beta = np.where(sign * x > 0, \
+				beta - sign * (np.exp(x / 2) - np.exp(-x / 2)), beta)
+		x = -np.abs(x)
+		bMax = np.exp(x / 2)
+		[rows, columns] = self.values.shape
+		with np.errstate(invalid='ignore', divide='ignore'):
+			i = (-x / MONEYNESS)**0.5 * (rows - 1)
+			j = (ndtri(beta / bMax) - PRICES[0]) / (PRICES[1] - PRICES[0]) * \
+					(columns - 1)
+			inside = (beta > 0) & (beta < bMax) & (i <= rows - 1) & \
+					(j >= 0) & (j <= columns - 1)
+			i = np.where(inside, i, 0)
+			j = np.where(inside, j, 0)
+			i0 = np.minimum(i.astype(np.int64), rows - 2)
+			j0 = np.minimum(j.astype(np.int64), columns - 2)
+			[u, v] = [i - i0, j - j0]
+			a = self.values[i0, j0]
+			b = self.values[i0, j0 + 1]
+			c = self.values[i0 + 1, j0]
+			d = self.values[i0 + 1, j0 + 1]
+			scale = np.where(inside, 100 / root, np.nan)
+			s = np.exp((1 - u) * ((1 - v) * a + v * b) + \
+					u * ((1 - v) * c + v * d))
+			low = np.exp(np.minimum(np.minimum(a, b), np.minimum(c, d))) * 0.9
+			high = np.exp(np.maximum(np.maximum(a, b), np.maximum(c, d))) * 1.1
+		return [s * scale, low * scale, high * scale]
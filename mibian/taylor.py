@@ -0,0 +1,173 @@
+'''
+MibianLib - Options Pricing Open Source Library - http://code.mibian.net/
+Copyright (C) 2011 Yassine Maaroufi - <yassinemaaroufi@mibian.net>
+Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
+
+MibianLib Taylor expansion revaluation
+'''
+
+import numpy as np
+
+import mibian.batch
+from mibian.batch import _inputs
+
+class TaylorRepricer:
+	'''Revaluation of a book of options by a second order expansion in the
+	underlying price, the volatility and the time to expiration
+
+	TaylorRepricer(className, args, volatility, tolerance=1e-4, \
+			maxDaysMove=1, rebase=True)
+
+	args and volatility are those of the mibian.batch model. The expansion
+	is around the prices, deltas, gamma, vega and thetas of the last full
+	pricing of each option. Its error is estimated from the terms it leaves
+	out: the speed, the vanna and volga, the charms and color (the drifts of
+	the deltas and gamma with time) and the change of the thetas over the
+	time move, from their derivative and their value maxDaysMove later,
+	priced with each expansion. The options whose estimate exceeds tolerance, or whose time
+	to expiration moved by more than maxDaysMove, are repriced in full and,
+	with rebase, expanded from there on.
+
+	eg:
+		r = mibian.taylor.TaylorRepricer('BS', [81, [75, 80, 85], 6, 60], \
+				volatility=[32, 30, 29])
+		[calls, puts] = r.price(underlyingPrice=81.02)
+		[calls, puts] = r.price(volatility=[32.1, 30, 29.1])
+		r.stats()				# Returns the expanded and repriced counts
+	'''
+
+	def __init__(self, className, args, volatility, tolerance=1e-4, \
+			maxDaysMove=1, rebase=True):
+		if className not in mibian.batch._arguments:
+			raise ValueError('Unknown model: ' + str(className))
+		self.className = className
+		self.tolerance = tolerance
+		self.maxDaysMove = maxDaysMove
+		self.rebase = rebase
+		self.args = [np.array(i) for i in _inputs(*(list(args) + \
+				[volatility]))]
+		self.volatility = self.args.pop()
+		self.underlyingPrice = self.args[0]
+		self.daysToExpiration = self.args[-1]
+		self.expanded = self.repriced = 0
+		self._base = {}
+		self._expand(np.ones(self.volatility.shape, dtype=bool))
+
+	def price(self, underlyingPrice=None, volatility=None, \
+			daysToExpiration=None):
+		'''Returns the prices of the book after a move, inputs left to None
+		keeping their last value: [Call prices, Put prices]'''
+		if underlyingPrice is not None:
+			self.underlyingPrice[...] = underlyingPrice
+		if volatility is not None:
+			self.volatility[...] = volatility
+		if daysToExpiration is not None:
+			self.daysToExpiration[...] = daysToExpiration
+		base = self._base
+		spot = self.underlyingPrice - base['underlyingPrice']
+		vol = self.volatility - base['volatility']
+		elapsed = base['daysToExpiration'] - self.daysToExpiration
+
+		call = base['callPrice'] + (base['callDelta'] + 0.5 * \
+				base['callGamma'] * spot) * spot + base['vega'] * vol + \
+				base['callTheta'] * elapsed
+		put = base['putPrice'] + (base['putDelta'] + 0.5 * \
+				base['putGamma'] * spot) * spot + base['vega'] * vol + \
+				base['putTheta'] * elapsed
+		error = np.abs(base['speed'] * spot**3) / 6 + \
+				np.abs(base['vanna'] * spot * vol) + \
+				np.abs(base['volga'] * vol * vol) / 2 + \
+				np.abs(base['charm'] * spot * elapsed) + \
+				np.abs(base['color'] * spot * spot * elapsed) / 2 + \
+				np.abs(base['thetaChange'] * elapsed * elapsed) / 2 + \
+				np.abs(base['thetaCurvature'] * elapsed**3) / 3
+		full = ~(error <= self.tolerance) | \
+				~(np.abs(elapsed) <= self.maxDaysMove)
+
+		count = int(np.count_nonzero(full))
+		self.expanded += call.size - count
+		self.repriced += count
+		if count:
+			if self.rebase:
+				self._expand(full)
+				call[full] = base['callPrice'][full]
+				put[full] = base['putPrice'][full]
+			else:
+				model = self._model(full)
+				call[full] = model.callPrice
+				put[full] = model.putPrice
+		return [call, put]
+
+	def stats(self):
+		'''Returns the revaluation counts: {expanded, repriced}'''
+		return {'expanded': self.expanded, 'repriced': self.repriced}
+
+	def _model(self, index, higherOrder=None):
+		'''Returns the batch model of the options selected by index at the
+		current inputs'''
+		return getattr(mibian.batch, self.className)([i[index] for i in \
+				self.args], volatility=self.volatility[index], \
+				higherOrder=higherOrder)
+
+	def _expand(self, index):
+		'''Reprices the options selected by index and makes the current
+		inputs their expansion point'''
+		model = self._model(index, higherOrder=['speed', 'vanna', 'volga', \
+				'callCharm', 'putCharm', 'color'])
+		if self.className == 'GK':
+			[r, q] = [model.domesticRate, model.foreignRate]
+		elif self.className == 'BS':
+			[r, q] = [model.interestRate, 0.0]
+		else:
+			[r, q] = [model.interestRate, model.dividendYield]
+		# Daily change of the thetas, from the pricing equation in time:
+		# theta = r V - (r - q) S delta - (v S)**2 gamma / 2 per year
+		[s, v] = [model.underlyingPrice, model.volatility]
+		thetaChange = [(r * theta - (r - q) * s * charm - \
+				(v * s)**2 * model.color / 2) / 365 for theta, charm in \
+				[(model.callTheta, model.callCharm), \
+				(model.putTheta, model.putCharm)]]
+		# The thetas at the end of the time window of the expansion give the
+		# curvature of the thetas in time, which dominates near expiration
+		window = np.minimum(self.maxDaysMove, self.daysToExpiration[index] / 2)
+		later = getattr(mibian.batch, self.className)([i[index] for i in \
+				self.args[:-1]] + [self.daysToExpiration[index] - window], \
+				volatility=self.volatility[index])
+		thetaCurvature = [(end - theta - change * window) / window**2 \
+				for end, theta, change in [(later.callTheta, model.callTheta, \
+				thetaChange[0]), (later.putTheta, model.putTheta, \
+				thetaChange[1])]]
+		# Me dividends are a yield of the underlying price: the discounted
+		# underlying S e**(-D T / S) grows as e**(-q T) (1 + q T) and curves
+		# as e**(-q T) (q T)**2 / S in S, where the model greeks hold q fixed
+		if self.className == 'Me':
+			yieldTime = model.dividendYield * model.daysToExpiration
+			curvature = yieldTime**2 / model.underlyingPrice
+		else:
+			yieldTime = curvature = 0.0
+		scale = 1 + yieldTime
+		gamma = model.gamma * scale**2
+		values = {'underlyingPrice': self.underlyingPrice[index], \
+				'volatility': self.volatility[index], \
+				'daysToExpiration': self.daysToExpiration[index], \
+				'callPrice': model.callPrice, 'putPrice': model.putPrice, \
+				'callDelta': model.callDelta * scale, \
+				'putDelta': model.putDelta * scale, \
+				'callGamma': gamma + model.callDelta * curvature, \
+				'putGamma': gamma + model.putDelta * curvature, \
+				'callTheta': model.callTheta, 'putTheta': model.putTheta, \
+				# Per volatility point, GK vegas being per unit of volatility
+				'vega': model.vega / (100 if self.className == 'GK' else 1), \
+				'speed': model.speed * scale**3, \
+				'vanna': model.vanna * scale, 'volga': model.volga, \
+				'charm': np.maximum(np.abs(model.callCharm), \
+						np.abs(model.putCharm)) * scale, \
+				'color': model.color * scale**2, \
+				'thetaChange': np.maximum(np.abs(thetaChange[0]), \
+						np.abs(thetaChange[1])), \
+				'thetaCurvature': np.maximum(np.abs(thetaCurvature[0]), \
+						np.abs(thetaCurvature[1]))}
+		for name, value in values.items():
+			if name not in self._base:
+				self._base[name] = np.empty(self.volatility.shape)
+			self._base[name][index] = value
@@ -0,0 +1,280 @@
+'''
+MibianLib - Options Pricing Open Source Library - http://code.mibian.net/
+Copyright (C) 2011 Yassine Maaroufi - <yassinemaaroufi@mibian.net>
+Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
+
+MibianLib streaming implied volatility
+'''
+
+from math import exp, log, sqrt
+
+import numpy as np
+
+from mibian import rational
+from mibian.batch import _arguments
+
+# Each tick is solved by Newton steps on the normalized price of
+# mibian.rational from the last implied volatility, kept within a bracket of
+# that volatility times 1 -/+ width. A step leaving the bracket falls back to
+# the one-shot rational solver and widens the bracket; converged ticks narrow
+# it down to a few times the last move, between MIN_WIDTH and MAX_WIDTH.
+WIDTH = 0.05
+MIN_WIDTH = 0.002
+MAX_WIDTH = 0.5
+
+class VolatilityTracker:
+	'''Implied volatility of one instrument over a stream of quotes, each
+	solve starting from the last one
+
+	VolatilityTracker(className, args, isCall=True, volatility=None, \
+			tolerance=1e-10, relTolerance=1e-10, maxIterations=4)
+
+	eg:
+		t = mibian.tracker.VolatilityTracker('Me', [52, 50, 1, 1, 30])
+		t.update(52.1, 3.05)			# Returns the implied volatility
+		t.update(52.15, 3.08, 29)		# New days to expiration
+		t.iterations					# Returns the Newton steps of the last tick
+	'''
+
+	__slots__ = ['className', 'args', 'isCall', 'volatility', 'width', \
+			'iterations', 'tolerance', 'relTolerance', 'maxIterations']
+
+	def __init__(self, className, args, isCall=True, volatility=None, \
+			tolerance=1e-10, relTolerance=1e-10, maxIterations=4):
+		if className not in _arguments:
+			raise ValueError('Unknown model: ' + str(className))
+		self.className = className
+		self.args = [float(i) for i in args[:len(_arguments[className])]]
+		self.isCall = isCall
+		self.volatility = volatility
+		self.width = WIDTH
+		self.iterations = 0
+		self.tolerance = tolerance
+		self.relTolerance = relTolerance
+		self.maxIterations = maxIterations
+
+	def update(self, underlyingPrice, price, daysToExpiration=None):
+		'''Returns the implied volatility of a new quote'''
+		self.args[0] = float(underlyingPrice)
+		if daysToExpiration is not None:
+			self.args[-1] = float(daysToExpiration)
+		[volatility, self.width, self.iterations] = _solve(self.className, \
+				self.args, self.isCall, float(price), self.volatility, \
+				self.width, self.tolerance, self.relTolerance, \
+				self.maxIterations)
+		if 0 < volatility < float('inf'):
+			self.volatility = volatility
+		return volatility
+
+class VolatilityBook:
+	'''Implied volatilities of many instruments of one model, keyed by any
+	hashable, their state held in one set of columns
+
+	VolatilityBook(className, tolerance=1e-10, relTolerance=1e-10, \
+			maxIterations=4)
+
+	Each instrument costs its row of the columns and its key. Ticks are
+	applied one at a time with update, or many at once, vectorized, with
+	updateMany.
+
+	eg:
+		b = mibian.tracker.VolatilityBook('BS')
+		b.add('XYZ 80C', [81, 80, 6, 60])
+		b.add('XYZ 80P', [81, 80, 6, 60], isCall=False)
+		b.update('XYZ 80C', 81.2, 4.9)		# Returns the implied volatility
+		b.updateMany(['XYZ 80C', 'XYZ 80P'], [81.3, 81.3], [5.0, 3.0])
+		b.volatility('XYZ 80P')
+		b.stats()
+	'''
+
+	_COLUMNS = ['strikePrice', 'rate', 'carry', 'daysToExpiration', \
+			'volatility', 'width', 'isCall']
+
+	def __init__(self, className, tolerance=1e-10, relTolerance=1e-10, \
+			maxIterations=4):
+		if className not in _arguments:
+			raise ValueError('Unknown model: ' + str(className))
+		self.className = className
+		self.tolerance = tolerance
+		self.relTolerance = relTolerance
+		self.maxIterations = maxIterations
+		self._values = np.empty((len(self._COLUMNS), 16))
+		self._rows = {}
+		self._keys = []
+		self._updates = self._iterations = self._fallbacks = 0
+
+	def add(self, key, args, isCall=True, volatility=None):
+		'''Adds an instrument from its model inputs, the underlying price being
+		given by each tick'''
+		if key in self._rows:
+			raise KeyError('Instrument already tracked: ' + str(key))
+		size = len(self._keys)
+		if size == self._values.shape[1]:
+			self._values = np.concatenate([self._values, \
+					np.empty(self._values.shape)], axis=1)
+		args = [float(i) for i in args[:len(_arguments[self.className])]]
+		carry = args[3] if len(args) == 5 else 0.0
+		self._values[:, size] = [args[1], args[2], carry, args[-1], \
+				np.nan if volatility is None else volatility, WIDTH, isCall]
+		self._rows[key] = size
+		self._keys.append(key)
+
+	def remove(self, key):
+		'''Stops tracking an instrument'''
+		row = self._rows.pop(key)
+		last = len(self._keys) - 1
+		if row != last:
+			self._values[:, row] = self._values[:, last]
+			self._keys[row] = self._keys[last]
+			self._rows[self._keys[row]] = row
+		self._keys.pop()
+
+	def volatility(self, key):
+		'''Returns the last implied volatility of an instrument, None before
+		its first tick'''
+		volatility = self._values[4, self._rows[key]]
+		return None if volatility != volatility else float(volatility)
+
+	def update(self, key, underlyingPrice, price, daysToExpiration=None):
+		'''Returns the implied volatility of a new quote of an instrument'''
+		row = self._rows[key]
+		[strike, rate, carry, days, volatility, width, isCall] = \
+				self._values[:, row].tolist()
+		if daysToExpiration is not None:
+			days = self._values[3, row] = float(daysToExpiration)
+		[volatility, width, iterations] = _solve(self.className, \
+				_args(self.className, float(underlyingPrice), strike, rate, \
+				carry, days), isCall != 0, float(price), \
+				None if volatility != volatility else volatility, width, \
+				self.tolerance, self.relTolerance, self.maxIterations)
+		self._values[5, row] = width
+		if 0 < volatility < float('inf'):
+			self._values[4, row] = volatility
+		self._updates += 1
+		self._iterations += iterations
+		self._fallbacks += iterations > self.maxIterations
+		return volatility
+
+	def updateMany(self, keys, underlyingPrices, prices, \
+			daysToExpiration=None):
+		'''Returns an array of the implied volatilities of new quotes of
+		instruments, each instrument appearing at most once'''
+		rows = np.array([self._rows[key] for key in keys], dtype=np.int64)
+		values = self._values[:, rows]
+		if daysToExpiration is not None:
+			values[3] = daysToExpiration
+			self._values[3, rows] = values[3]
+		[strike, rate, carry, days, volatility, width, isCall] = values
+		[underlyingPrices, prices] = [np.broadcast_to(np.asarray(i, \
+				dtype=np.float64), rows.shape) for i in [underlyingPrices, \
+				prices]]
+		[volatility, width, iterations] = _solveArray(self.className, \
+				_args(self.className, underlyingPrices, strike, rate, carry, \
+				days), isCall != 0, prices, volatility, width, \
+				self.tolerance, self.relTolerance, self.maxIterations)
+		self._values[5, rows] = width
+		self._values[4, rows] = np.where((volatility > 0) & \
+				(volatility < np.inf), volatility, self._values[4, rows])
+		self._updates += len(rows)
+		self._iterations += int(iterations.sum())
+		self._fallbacks += int((iterations > self.maxIterations).sum())
+		return volatility
+
+	def stats(self):
+		'''Returns the tick statistics: {updates, meanIterations, fallbacks},
+		fallbacks counting the ticks solved by the rational solver'''
+		return {'updates': self._updates, 'fallbacks': self._fallbacks, \
+				'meanIterations': self._iterations / max(self._updates, 1)}
+
+	def __len__(self):
+		return len(self._keys)
+
+	def __contains__(self, key):
+		return key in self._rows
+
+def _args(className, underlying, strike, rate, carry, days):
+	'''Returns the model inputs of an instrument'''
+	if className == 'BS':
+		return [underlying, strike, rate, days]
+	return [underlying, strike, rate, carry, days]
+
+def _adapt(width, move):
+	'''Returns the bracket width of the next tick after one converged with
+	a relative move of the volatility'''
+	return min(max(width / 2, 4 * move, MIN_WIDTH), MAX_WIDTH)
+
+def _solve(className, args, isCall, price, volatility, width, tolerance, \
+		relTolerance, maxIterations):
+	'''Returns the implied volatility of a quote from the last one, the next
+	bracket width and the Newton steps taken, maxIterations + 1 when the
+	rational solver was used: [Implied volatility, Width, Iterations]'''
+	[underlying, strike, t] = rational._factors(className, args)
+	scale = sqrt(underlying * strike)
+	[beta, x] = rational._outOfTheMoney(price / scale, \
+			log(underlying / strike), isCall)
+	if volatility is not None and 0 < beta < exp(x / 2):
+		s = start = volatility / 100 * sqrt(t)
+		[low, high] = [s * (1 - width), s * (1 + width)]
+		tolerance = (tolerance + relTolerance * abs(price)) / scale
+		for i in range(maxIterations):
+			diff = rational._black(x, s) - beta
+			if abs(diff) <= tolerance:
+				return [100 * s / sqrt(t), _adapt(width, abs(s / start - 1)), i]
+			# Far out of the money, the vega can underflow: the step is then
+			# left to the rational solver, as steps leaving the bracket
+			vega = rational._vega(x, s)
+			if not vega > 0:
+				break
+			s -= diff / vega
+			if not low < s < high:
+				break
+	s = rational.normalizedVolatility(beta, x)
+	if volatility is not None:
+		width = min(width * 4, MAX_WIDTH)
+	return [100 * s / sqrt(t), width, maxIterations + 1]
+
+def _solveArray(className, args, isCall, price, volatility, width, \
+		tolerance, relTolerance, maxIterations):
+	'''Returns arrays of implied volatilities of quotes from the last ones,
+	NaN for none, of next bracket widths and of Newton steps taken:
+	[Implied volatilities, Widths, Iterations]'''
+	from mibian.batch import _factors
+	from mibian.normal import cdfArray
+	[underlying, strike, x, root] = _factors(className, args)
+	scale = (underlying * strike)**0.5
+	with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+		side = np.where(isCall, 1.0, -1.0)
+		beta = price / scale
+		beta = np.where(side * x > 0, \
+				beta - side * (np.exp(x / 2) - np.exp(-x / 2)), beta)
+		x = -np.abs(x)
+		tolerance = (tolerance + relTolerance * np.abs(price)) / scale
+		s = start = volatility / 100 * root
+		[low, high] = [s * (1 - width), s * (1 + width)]
+		iterations = np.zeros(s.shape, dtype=np.int64)
+		active = (beta > 0) & (beta < np.exp(x / 2)) & (s > 0)
+		done = np.zeros(s.shape, dtype=bool)
+		for i in range(maxIterations + 1):
+			diff = np.exp(x / 2) * cdfArray(x / s + s / 2) - \
+					np.exp(-x / 2) * cdfArray(x / s - s / 2) - beta
+			converged = active & (np.abs(diff) <= tolerance)
+			done |= converged
+			iterations[converged] = i
+			active &= ~converged
+			if i == maxIterations or not active.any():
+				break
+			vega = np.exp(-0.5 * ((x / s)**2 + s * s / 4) - \
+					rational._LOG_SQRT_2PI)
+			s = np.where(active, s - diff / vega, s)
+			active &= (s > low) & (s < high)
+
+		fallback = ~done
+		if fallback.any():
+			s = np.where(fallback, rational.normalizedVolatilityArray( \
+					np.where(fallback, beta, 0.5 * np.exp(x / 2)), x), s)
+		iterations[fallback] = maxIterations + 1
+		move = np.abs(s / start - 1)
+		width = np.where(done, np.clip(np.maximum(np.maximum(width / 2, \
+				4 * move), MIN_WIDTH), None, MAX_WIDTH), np.where( \
+				np.isnan(volatility), width, np.minimum(width * 4, MAX_WIDTH)))
+	return [100 * s / root, width, iterations]
@@ -4,17 +4,278 @@ Copyright (C) 2011 Yassine Maaroufi -  <yassinemaaroufi@mibian.net>
 Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
 
 MibianLib Performance Tests
+
+python performanceTests.py [--output results.json] [--baseline base.json] \
+		[--threshold 0.1] [--repeat 7] [--filter BS] [--quick]
+
+Times every case, writes the per-call timings (seconds) with their
+percentiles as JSON, and with --baseline flags the cases whose median is
+more than threshold slower than in the baseline (exit status 1). Import
+cases are timed in fresh interpreters, which also give the resident memory
+(kB) added by the import, flagged the same way.
 '''
 
-#from time import time
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
 from timeit import Timer
-#import mibian
 
-# Implied volatility performance
-print 'Implied volatility: ',
-#t = time()
-#test = mibian.GK([1.4565, 1.45, 1, 2, 30], callPrice=0.021)
-#print time() - t
+import numpy as np
+
+import mibian
+import mibian.batch
+import mibian.chain
+import mibian.lattice
+import mibian.montecarlo
+import mibian.rational
+import mibian.tracker
+
+# Options and steps of the American lattice cases
+LATTICE_SIZE = 1000
+LATTICE_STEPS = 100
+# Strikes and expiries of the option chain cases
+CHAIN_STRIKES = 200
+CHAIN_EXPIRIES = 10
+# Paths and dates of the Monte Carlo cases
+MONTE_CARLO_PATHS = 100000
+MONTE_CARLO_STEPS = 30
+
+# Statements timed first thing in fresh interpreters: the pricing core, then
+# the vectorized features, which load NumPy and SciPy
+IMPORTS = {'import.core': 'import mibian', \
+		'import.rational': 'import mibian.rational', \
+		'import.batch': 'import mibian.batch', \
+		'import.batchFirstPrice': 'import mibian.batch; ' \
+		'mibian.batch.BS([100, [90, 110], 3, 30], volatility=25)'}
+
+# Run in the fresh interpreters: prints the seconds taken by the statement
+# and the peak resident memory it added, in kB. The peak of getrusage spans
+# the process forked before exec, so Linux reads the one of /proc instead.
+_IMPORT_PROBE = '''
+import sys, time
+def peak():
+	try:
+		with open('/proc/self/status') as f:
+			return [int(i.split()[1]) for i in f if i.startswith('VmHWM')][0]
+	except OSError:
+		import resource
+		rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+		return rss / 1024 if sys.platform == 'darwin' else rss
+before = peak()
+start = time.perf_counter()
+exec(sys.argv[1])
+print(time.perf_counter() - start, peak() - before)
+'''
+
+# Model inputs for a 100 underlying at the given strike and expiration
+MODELS = {'GK': lambda strike, days: [100, strike, 3, 1, days], \
+		'BS': lambda strike, days: [100, strike, 3, days], \
+		'Me': lambda strike, days: [100, strike, 3, 2, days]}
+MONEYNESS = {'deepITM': 70, 'ATM': 100, 'deepOTM': 130}
+EXPIRIES = {'short': 7, 'long': 365}
+VOLATILITY = 25
+BATCH_SIZES = [1000, 100000]
+
+def cases():
+	'''Returns the benchmark cases: [[name, callable], ...]'''
+	result = []
+	for className, inputs in MODELS.items():
+		model = getattr(mibian, className)
+		greeks = list(model._greeks_)
+		for moneyness, strike in MONEYNESS.items():
+			for expiry, days in EXPIRIES.items():
+				args = inputs(strike, days)
+				name = '%s.%s.%s.' % (className, moneyness, expiry)
+				option = model(args, volatility=VOLATILITY)
+				result += [[name + 'construction', \
+						lambda m=model, a=args: m(a, volatility=VOLATILITY)], \
+						[name + 'prices', lambda m=model, a=args: \
+						m(a, volatility=VOLATILITY, performance=True)], \
+						[name + 'greeks', lambda m=model, a=args, g=greeks: \
+						allGreeks(m(a, volatility=VOLATILITY), g)], \
+						[name + 'higherOrder', lambda m=model, a=args: \
+						allGreeks(m(a, volatility=VOLATILITY), \
+						mibian.HIGHER_ORDER_GREEKS)], \
+						[name + 'callIV', lambda c=className, a=args, \
+						p=option.callPrice: mibian.impliedVolatility(c, a, \
+						callPrice=p)], \
+						[name + 'putIV', lambda c=className, a=args, \
+						p=option.putPrice: mibian.impliedVolatility(c, a, \
+						putPrice=p)], \
+						[name + 'rationalIV', lambda c=className, a=args, \
+						p=option.callPrice: mibian.rational.impliedVolatility(c, \
+						a, callPrice=p)]]
+
+		for size in BATCH_SIZES:
+			strikes = np.linspace(70, 130, size)
+			args = inputs(strikes, np.where(np.arange(size) % 2, 7, 365))
+			batch = getattr(mibian.batch, className)
+			option = batch(args, volatility=VOLATILITY)
+			name = '%s.batch%d.' % (className, size)
+			result += [[name + 'prices', lambda b=batch, a=args: \
+					b(a, volatility=VOLATILITY, performance=True)], \
+					[name + 'greeks', lambda b=batch, a=args: \
+					b(a, volatility=VOLATILITY)], \
+					[name + 'greeksFloat32', lambda b=batch, a=args: \
+					b(a, volatility=VOLATILITY, dtype=np.float32)], \
+					[name + 'higherOrder', lambda b=batch, a=args: \
+					b(a, volatility=VOLATILITY, performance=True, \
+					higherOrder=True)], \
+					[name + 'callIV', lambda c=className, a=args, \
+					p=option.callPrice: mibian.batch.impliedVolatility(c, a, \
+					callPrice=p)], \
+					[name + 'putIV', lambda c=className, a=args, \
+					p=option.putPrice: mibian.batch.impliedVolatility(c, a, \
+					putPrice=p)], \
+					[name + 'rationalIV', lambda c=className, a=args, \
+					p=option.callPrice: mibian.rational.impliedVolatilityArray(c, \
+					a, callPrice=p)]]
+
+		strikes = np.linspace(70, 130, LATTICE_SIZE)
+		args = inputs(strikes, np.where(np.arange(LATTICE_SIZE) % 2, 7, 365))
+		for method in ['binomial', 'trinomial']:
+			name = '%s.american%d.%s.' % (className, LATTICE_SIZE, method)
+			result += [[name + 'prices', lambda c=className, a=args, \
+					m=method: mibian.lattice.American(c, a, VOLATILITY, \
+					steps=LATTICE_STEPS, method=m, performance=True)]]
+
+		name = '%s.montecarlo%d.asian' % (className, MONTE_CARLO_PATHS)
+		result += [[name, lambda c=className, a=inputs(100, 365): \
+				mibian.montecarlo.price(c, a, VOLATILITY, payoff='asian', \
+				steps=MONTE_CARLO_STEPS, paths=MONTE_CARLO_PATHS, seed=1)]]
+
+		# A chain priced against its cached factors, and as one batch
+		strikes = np.linspace(70, 130, CHAIN_STRIKES)
+		days = 30 * np.arange(1, CHAIN_EXPIRIES + 1)
+		args = inputs(100, 0)
+		chain = mibian.chain.OptionChain(className, [args[0]] + args[2:-1], \
+				strikes, days)
+		batchArgs = inputs(chain.strikePrice, chain.daysToExpiration)
+		name = '%s.chain%dx%d.' % (className, CHAIN_EXPIRIES, CHAIN_STRIKES)
+		result += [[name + 'prices', lambda c=chain: c.price(VOLATILITY, \
+				performance=True)], \
+				[name + 'greeks', lambda c=chain: c.price(VOLATILITY)], \
+				[name + 'batchGreeks', lambda c=className, a=batchArgs: \
+				getattr(mibian.batch, c)(a, volatility=VOLATILITY)]]
+
+		# Warm ticks alternating between two quotes a volatility point apart
+		args = inputs(100, 30)
+		quotes = [model(args, volatility=v).callPrice for v in [VOLATILITY, \
+				VOLATILITY + 1]]
+		tracker = mibian.tracker.VolatilityTracker(className, args)
+		tracker.update(100, quotes[0])
+		result += [['%s.tracker.callIV' % className, lambda t=tracker, \
+				q=quotes: [t.update(100, q[1]), t.update(100, q[0])]]]
+	return result
+
+def allGreeks(option, greeks):
+	'''Returns every greek of an option'''
+	return [getattr(option, i) for i in greeks]
+
+def measure(function, repeat=7, minTime=0.02):
+	'''Returns the per-call timing statistics of function'''
+	timer = Timer(function)
+	number = 1
+	while timer.timeit(number) < minTime and number < 10**6:
+		number *= 10
+	timings = sorted(t / number for t in timer.repeat(repeat, number))
+	return {'repeat': repeat, 'number': number, \
+			'min': timings[0], 'mean': sum(timings) / len(timings), \
+			'median': percentile(timings, 50), 'p90': percentile(timings, 90), \
+			'p99': percentile(timings, 99), 'max': timings[-1]}
+
+def measureImport(statement, repeat=7):
+	'''Returns the timing statistics of a statement run first thing in
+	fresh interpreters started next to this file, so that they import this
+	mibian, with the median resident memory it added (kB)'''
+	timings = []
+	memory = []
+	for i in range(repeat):
+		output = subprocess.run([sys.executable, '-c', _IMPORT_PROBE, \
+				statement], cwd=os.path.dirname(os.path.abspath(__file__)), \
+				check=True, capture_output=True, text=True).stdout
+		[seconds, rss] = output.split()
+		timings.append(float(seconds))
+		memory.append(float(rss))
+	timings.sort()
+	memory.sort()
+	return {'repeat': repeat, 'number': 1, 'min': timings[0], \
+			'mean': sum(timings) / len(timings), \
+			'median': percentile(timings, 50), 'p90': percentile(timings, 90), \
+			'p99': percentile(timings, 99), 'max': timings[-1], \
+			'rss': percentile(memory, 50)}
+
+def percentile(timings, p):
+	'''Returns the p-th percentile of sorted timings, interpolated'''
+	rank = (len(timings) - 1) * p / 100.0
+	low = int(rank)
+	high = min(low + 1, len(timings) - 1)
+	return timings[low] + (timings[high] - timings[low]) * (rank - low)
+
+def compare(results, baseline, threshold):
+	'''Returns the regressions of the medians, and of the memory of import
+	cases, against a baseline: [[name, measure, baseline, value, ratio],
+	...]'''
+	regressions = []
+	for name, result in sorted(results.items()):
+		for measure in ['median', 'rss']:
+			if name in baseline and measure in result and \
+					baseline[name].get(measure):
+				ratio = result[measure] / baseline[name][measure]
+				if ratio > 1 + threshold:
+					regressions.append([name, measure, \
+							baseline[name][measure], result[measure], ratio])
+	return regressions
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description='MibianLib benchmarks')
+	parser.add_argument('--output', help='JSON file for the results')
+	parser.add_argument('--baseline', help='JSON results to compare with')
+	parser.add_argument('--threshold', type=float, default=0.1, \
+			help='Tolerated slowdown of the median against the baseline')
+	parser.add_argument('--repeat', type=int, default=7)
+	parser.add_argument('--filter', default='', \
+			help='Only run the cases whose name contains this string')
+	parser.add_argument('--quick', action='store_true', \
+			help='Fewer repeats and shorter timings')
+	options = parser.parse_args(argv)
+	repeat = 3 if options.quick else options.repeat
+	minTime = 0.002 if options.quick else 0.02
+
+	results = {}
+	for name, function in cases():
+		if options.filter in name:
+			results[name] = measure(function, repeat, minTime)
+			print('%-32s %12.3f us' % (name, results[name]['median'] * 1e6))
+	for name, statement in IMPORTS.items():
+		if options.filter in name:
+			results[name] = measureImport(statement, repeat)
+			print('%-32s %12.3f us %10.0f kB' % (name, \
+					results[name]['median'] * 1e6, results[name]['rss']))
+
+	report = {'meta': {'python': platform.python_version(), \
+			'numpy': np.__version__, 'platform': platform.platform()}, \
+			'results': results}
+	if options.output:
+		with open(options.output, 'w') as f:
+			json.dump(report, f, indent=1, sort_keys=True)
+
+	if options.baseline:
+		with open(options.baseline) as f:
+			baseline = json.load(f)['results']
+		regressions = compare(results, baseline, options.threshold)
+		for name, kind, before, after, ratio in regressions:
+			if kind == 'rss':
+				print('REGRESSION %-32s %12.0f kB -> %12.0f kB (x%.2f)' % \
+						(name, before, after, ratio))
+			else:
+				print('REGRESSION %-32s %12.3f us -> %12.3f us (x%.2f)' % \
+						(name, before * 1e6, after * 1e6, ratio))
+		return 1 if regressions else 0
+	return 0
 
-print Timer('mibian.GK([1.4565, 1.45, 1, 2, 30], callPrice=0.021)', 'import mibian').timeit(number=1)
-#print t.timeit(number=1)
+if __name__ == '__main__':
+	sys.exit(main())
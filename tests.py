@@ -6,9 +6,39 @@ Distributed under GPLv3 - http://www.gnu.org/copyleft/gpl.html
 MibianLib Unit Tests
 '''
 
+import asyncio
+import csv
+import json
+import os
+import pickle
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
 import unittest
 
+import numpy as np
+
 import mibian
+import mibian.batch
+import mibian.cache
+import mibian.chain
+import mibian.instrumentation
+import mibian.lattice
+import mibian.montecarlo
+import mibian.parallel
+import mibian.portfolio
+import mibian.rational
+import mibian.scenario
+import mibian.server
+import mibian.shared
+import mibian.stream
+import mibian.surface
+import mibian.table
+import mibian.taylor
+import mibian.tracker
+from mibian import normal
 
 class UnitTesting(unittest.TestCase):
 	'''Unit tests for MibianLib'''
@@ -31,10 +61,10 @@ class UnitTesting(unittest.TestCase):
 		self.assertEqual(test.gamma, 4.7488658326126272)
 
 		test = mibian.GK([1.4565, 1.45, 1, 2, 30], callPrice=0.021)
-		self.assertEqual(test.impliedVolatility, 10.7421875)
+		self.assertAlmostEqual(test.impliedVolatility, 10.980692473959806)
 
 		test = mibian.GK([1.4565, 1.45, 1, 2, 30], putPrice=0.0306)
-		self.assertEqual(test.impliedVolatility, 20.01953125)
+		self.assertAlmostEqual(test.impliedVolatility, 19.991074706227806)
 
 		test = mibian.GK([1.4565, 1.45, 1, 2, 30],
 				callPrice=0.036133685584059827, putPrice=0.030851333789832069)
@@ -57,10 +87,10 @@ class UnitTesting(unittest.TestCase):
 		self.assertEqual(test.gamma, 0.039304536595328565)
 
 		test = mibian.BS([52, 60, 5, 30], callPrice=3)
-		self.assertEqual(test.impliedVolatility, 95.703125)
+		self.assertAlmostEqual(test.impliedVolatility, 96.06620563981497)
 		
 		test = mibian.BS([52, 60, 5, 30], putPrice=7.86)
-		self.assertEqual(test.impliedVolatility, 29.78515625)
+		self.assertAlmostEqual(test.impliedVolatility, 29.93382250032474)
 
 		test = mibian.BS([81, 80, 6, 60], callPrice=4.8422936422068901,
 							putPrice=3.0571309465072147)
@@ -83,15 +113,1131 @@ class UnitTesting(unittest.TestCase):
 		self.assertEqual(test.gamma, 0.07897789426868787)
 
 		test = mibian.Me([52, 50, 1, 1, 30], callPrice=3)
-		self.assertEqual(test.impliedVolatility, 31.25)
+		self.assertAlmostEqual(test.impliedVolatility, 31.916900570756706)
 		
 		test = mibian.Me([52, 50, 1, 1, 30], putPrice=0.84)
-		self.assertEqual(test.impliedVolatility, 28.076171875)
+		self.assertAlmostEqual(test.impliedVolatility, 28.097614794392808)
 		
 #		test = mibian.Me([52, 50, 1, 1, 30], callPrice=4.8422936422068901,
 #							putPrice=3.0571309465072147)
 #		self.assertEqual(test.putCallParity, 0.02254482311879258)
 
+	def testLazyGreeks(self):
+		'''Greeks are computed on first access'''
+		test = mibian.BS([81, 80, 6, 60], volatility=30)
+		self.assertRaises(AttributeError, mibian.BS.callDelta.__get__, test)
+		self.assertEqual(test.callDelta, 0.5963986247019829)
+		self.assertEqual(mibian.BS.putDelta.__get__(test), -0.4036013752980171)
+		self.assertRaises(AttributeError, mibian.BS.vega.__get__, test)
+		self.assertFalse(hasattr(test, '__dict__'))
+		self.assertRaises(AttributeError, getattr, test, 'callRhoD')
+
+		test = mibian.GK([1.4565, 1.45, 1, 2, 30], callPrice=0.021)
+		self.assertEqual([test.callDelta, test.putRhoF, test.gamma],
+				[None, None, None])
+
+	def testImpliedVolatility(self):
+		'''Implied volatility solver tests'''
+		for model, args in [('GK', [1.4565, 1.45, 1, 2, 30]),
+				('BS', [81, 80, 6, 60]), ('Me', [52, 50, 1, 1, 30])]:
+			for vol in [5, 30, 150]:
+				test = getattr(mibian, model)(args, volatility=vol)
+				[iv, iterations] = mibian.solveImpliedVolatility(model, args,
+						callPrice=test.callPrice)
+				self.assertAlmostEqual(iv, vol, places=6)
+				self.assertTrue(0 < iterations <= 10)
+				iv = mibian.impliedVolatility(model, args,
+						putPrice=test.putPrice, tolerance=0, relTolerance=1e-14)
+				self.assertAlmostEqual(iv, vol, places=9)
+
+		[iv, iterations] = mibian.solveImpliedVolatility('BS', [81, 80, 6, 60],
+				callPrice=4.84, maxIterations=2)
+		self.assertEqual(iterations, 2)
+		# Prices outside of the bracket
+		self.assertEqual(mibian.impliedVolatility('BS', [81, 80, 6, 60],
+				callPrice=90), 500.0)
+		self.assertEqual(mibian.impliedVolatility('BS', [81, 80, 6, 60],
+				callPrice=1), 0.001)
+
+	def testNormal(self):
+		'''Normal distribution kernel tests'''
+		for x, cdf in [(0, 0.5), (1, 0.8413447460685429),
+				(-10, 7.619853024160526e-24), (-30, 4.906713927148187e-198),
+				(8, 0.9999999999999993)]:
+			self.assertAlmostEqual(normal.cdf(x) / cdf, 1, places=12)
+		self.assertEqual(normal.pdf(0), 0.3989422804014327)
+		self.assertAlmostEqual(normal.pdf(-3), 0.0044318484119380075, places=17)
+
+		x = np.linspace(-35, 10, 91)
+		for i in range(len(x)):
+			self.assertAlmostEqual(normal.cdfArray(x)[i] / normal.cdf(x[i]), 1,
+					places=12)
+			self.assertAlmostEqual(normal.pdfArray(x)[i], normal.pdf(x[i]),
+					places=15)
+
+	def testBatch(self):
+		'''Vectorized batch pricing tests'''
+		strikes = [60, 75, 80, 85, 120]
+		vols = [45, 25, 30, 35, 50]
+		for model, args in [('GK', [1.4565, [1.2, 1.4, 1.45, 1.5, 1.8], 1, 2,
+				[7, 30, 30, 90, 365]]), ('BS', [81, strikes, 6, 60]),
+				('Me', [52, strikes, 1, 1, [30, 60, 90, 180, 365]])]:
+			batch = getattr(mibian.batch, model)(args, volatility=vols)
+			for i in range(len(vols)):
+				scalarArgs = [a[i] if isinstance(a, list) else a for a in args]
+				test = getattr(mibian, model)(scalarArgs, volatility=vols[i])
+				for name in ['callPrice', 'putPrice', 'callDelta', 'putDelta',
+						'callDelta2', 'putDelta2', 'callTheta', 'putTheta',
+						'callRho', 'putRho', 'callRhoD', 'putRhoD', 'callRhoF',
+						'putRhoF', 'vega', 'gamma', 'exerciceProbability']:
+					if hasattr(test, name):
+						self.assertAlmostEqual(getattr(batch, name)[i],
+								getattr(test, name), places=12)
+
+		test = mibian.batch.BS([81, 80, 6, 60], volatility=30, performance=True)
+		self.assertEqual(test.callPrice.shape, ())
+		self.assertEqual(test.callDelta, None)
+		self.assertRaises(ZeroDivisionError, mibian.batch.BS, [81, [80, 0], 6,
+				60], volatility=30)
+
+	def testInstrumentation(self):
+		'''Instrumentation tests'''
+		instrumentation = mibian.instrumentation
+		cdf = normal.cdf
+		instrumentation.reset()
+		instrumentation.enable()
+		try:
+			test = mibian.BS([81, 80, 6, 60], volatility=30)
+			test.callDelta
+			mibian.BS([52, 60, 5, 30], putPrice=7.86)
+			mibian.BS([81, 80, 6, 60], callPrice=90)
+			mibian.solveImpliedVolatility('BS', [81, 80, 6, 60], callPrice=4.8,
+					maxIterations=1)
+		finally:
+			instrumentation.disable()
+		mibian.BS([81, 80, 6, 60], volatility=30)
+		self.assertIs(normal.cdf, cdf)
+
+		stats = instrumentation.snapshot()
+		self.assertEqual(stats['solver']['calls'], 3)
+		self.assertEqual(stats['solver']['exits']['high'], 1)
+		self.assertEqual(stats['solver']['exits']['maxIterations'], 1)
+		self.assertEqual(stats['solver']['exits']['converged'] +
+				stats['solver']['exits']['brent'], 1)
+		self.assertEqual(stats['constructions']['BS'], 8 +
+				stats['solver']['iterations'])
+		self.assertEqual(stats['constructions']['GK'], 0)
+		self.assertEqual(sum(stats['latency']['BS']['counts']), 8 +
+				stats['solver']['iterations'])
+		self.assertGreater(stats['cdfEvaluations'], 4 * 6)
+		self.assertEqual(stats['pdfEvaluations'],
+				stats['solver']['iterations'] - 1)
+
+		# The rational solver evaluates the normal distribution as well
+		instrumentation.reset()
+		instrumentation.enable()
+		try:
+			mibian.rational.impliedVolatility('BS', [81, 80, 6, 60],
+					callPrice=4.8)
+			mibian.rational.impliedVolatility('BS', [100, 200, 1, 30],
+					callPrice=1e-12)
+		finally:
+			instrumentation.disable()
+		stats = instrumentation.snapshot()
+		self.assertGreater(stats['cdfEvaluations'], 0)
+		self.assertGreater(stats['pdfEvaluations'], 0)
+
+		# The array kernels count an evaluation per element
+		cdfArray = mibian.batch.cdfArray
+		counts = []
+		for strikes in [[80], [75, 80, 85]]:
+			instrumentation.reset()
+			instrumentation.enable()
+			try:
+				mibian.batch.BS([81, strikes, 6, 60], volatility=30)
+			finally:
+				instrumentation.disable()
+			stats = instrumentation.snapshot()
+			counts.append([stats['cdfEvaluations'], stats['pdfEvaluations']])
+		self.assertIs(mibian.batch.cdfArray, cdfArray)
+		self.assertGreater(counts[0][0], 0)
+		self.assertEqual(counts[1], [3 * i for i in counts[0]])
+
+		instrumentation.reset()
+		self.assertEqual(instrumentation.snapshot()['cdfEvaluations'], 0)
+
+	def testBatchImpliedVolatility(self):
+		'''Vectorized implied volatility tests'''
+		vols = np.array([10, 25, 40, 80])
+		for model, args in [('GK', [1.4565, 1.45, 1, 2, [30, 60, 90, 365]]),
+				('BS', [81, [75, 80, 85, 90], 6, 60]),
+				('Me', [52, 50, 1, 1, [30, 60, 90, 365]])]:
+			batch = getattr(mibian.batch, model)(args, volatility=vols)
+			[iv, iterations] = mibian.batch.solveImpliedVolatility(model, args,
+					callPrice=batch.callPrice)
+			self.assertTrue(np.allclose(iv, vols, rtol=0, atol=1e-6))
+			self.assertTrue((iterations <= 10).all())
+			iv = mibian.batch.impliedVolatility(model, args,
+					putPrice=batch.putPrice)
+			self.assertTrue(np.allclose(iv, vols, rtol=0, atol=1e-6))
+
+		iv = mibian.batch.impliedVolatility('BS', [52, 60, 5, 30],
+				putPrice=[7.86, 100, np.nan, 1])
+		self.assertAlmostEqual(iv[0], mibian.impliedVolatility('BS',
+				[52, 60, 5, 30], putPrice=7.86))
+		self.assertEqual(iv[1], 500)
+		self.assertTrue(np.isnan(iv[2]))
+		self.assertEqual(iv[3], 0.001)
+
+	def testRationalImpliedVolatility(self):
+		'''Rational guess implied volatility tests'''
+		for model, args in [('GK', [1.4565, 1.45, 1, 2, 30]),
+				('BS', [81, 75, 6, 60]), ('Me', [52, 50, 1, 1, 365])]:
+			for vol in [15, 25, 150]:
+				batch = getattr(mibian.batch, model)(args, volatility=vol)
+				self.assertAlmostEqual(mibian.rational.impliedVolatility(model,
+						args, callPrice=float(batch.callPrice)), vol, places=9)
+				self.assertAlmostEqual(mibian.rational.impliedVolatility(model,
+						args, putPrice=float(batch.putPrice)), vol, places=9)
+
+		# Deep out of the money quotes keep their relative precision
+		batch = mibian.batch.BS([81, 120, 6, 3], volatility=15)
+		self.assertAlmostEqual(mibian.rational.impliedVolatility('BS',
+				[81, 120, 6, 3], callPrice=float(batch.callPrice)), 15, places=9)
+		self.assertAlmostEqual(mibian.rational.normalizedVolatility(
+				mibian.rational._black(-1.5, 0.1), -1.5), 0.1, places=14)
+		self.assertAlmostEqual(mibian.rational.normalizedVolatility(
+				mibian.rational._black(-0.01, 0.002), 0.01, False), 0.002,
+				places=14)
+
+		x = np.array([-2, -0.3, 0, 0.3, 2, 0.1, 0.1])
+		s = np.array([0.2, 1, 0.2, 3, 0.5, 0.1, 0.1])
+		beta = np.array([mibian.rational._black(-abs(i), j)
+				for i, j in zip(x, s)])
+		beta[5:] = [np.nan, 10]
+		result = mibian.rational.normalizedVolatilityArray(beta, x, x < 0)
+		self.assertTrue(np.allclose(result[:5], s[:5], rtol=1e-12, atol=0))
+		self.assertTrue(np.isnan(result[5]))
+		self.assertEqual(result[6], np.inf)
+		self.assertAlmostEqual(result[0], mibian.rational.normalizedVolatility(
+				beta[0], x[0], True), places=14)
+
+		strikes = np.linspace(60, 140, 9)
+		batch = mibian.batch.Me([100, strikes, 3, 2, 90], volatility=30)
+		iv = mibian.rational.impliedVolatilityArray('Me',
+				[100, strikes, 3, 2, 90], putPrice=batch.putPrice)
+		self.assertTrue(np.allclose(iv, 30, rtol=0, atol=1e-9))
+
+	def testInversionTable(self):
+		'''Implied volatility inversion table tests'''
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, 'iv.npy')
+			table = mibian.table.build(path, moneynessSize=64, priceSize=256)
+			self.assertIs(mibian.table.load(path), table)
+			self.assertIs(pickle.loads(pickle.dumps(table)), table)
+
+			for model, args in [('GK', [1.4565, 1.45, 1, 2, 30]),
+					('BS', [81, 90, 6, 60]), ('Me', [52, 50, 1, 1, 365])]:
+				batch = getattr(mibian.batch, model)(args, volatility=30)
+				[vol, low, high] = table.estimate(model, args,
+						putPrice=float(batch.putPrice))
+				self.assertAlmostEqual(vol / 30, 1, places=2)
+				self.assertTrue(low < 30 < high)
+				[vol, iterations] = mibian.solveImpliedVolatility(model, args,
+						callPrice=float(batch.callPrice), table=table)
+				self.assertAlmostEqual(vol, 30, places=6)
+				self.assertTrue(iterations <= 3)
+				# The seeded steps and the fallback share maxIterations
+				for budget in [1, 2, 5]:
+					self.assertLessEqual(mibian.solveImpliedVolatility(model,
+							args, callPrice=float(batch.callPrice), tolerance=0,
+							relTolerance=0, maxIterations=budget,
+							table=table)[1], budget)
+
+			strikes = np.array([60, 81, 100, 1e6])
+			batch = mibian.batch.BS([81, strikes, 6, 60], volatility=30)
+			[vols, lows, highs] = table.estimateArray('BS',
+					[81, strikes, 6, 60], callPrice=batch.callPrice)
+			self.assertAlmostEqual(vols[1], table.estimate('BS',
+					[81, 81, 6, 60], callPrice=float(batch.callPrice[1]))[0])
+			self.assertTrue(np.isnan(vols[3]))
+			self.assertTrue(np.isnan(table.estimate('BS', [81, 90, 6, 60],
+					callPrice=100)[0]))
+			self.assertTrue(np.allclose(mibian.batch.impliedVolatility('BS',
+					[81, strikes[:3], 6, 60], callPrice=batch.callPrice[:3],
+					table=table), 30, atol=1e-6))
+			del table, vols, lows, highs
+			mibian.table._tables.clear()
+
+	def testTaylorRepricer(self):
+		'''Taylor expansion revaluation tests'''
+		strikes = np.linspace(80, 120, 21)
+		for model, args in [('GK', [100, strikes, 3, 1, 30]),
+				('BS', [100, strikes, 3, 30]), ('Me', [100, strikes, 3, 8, 365])]:
+			repricer = mibian.taylor.TaylorRepricer(model, args, volatility=25,
+					tolerance=1e-4)
+			moved = list(args)
+			for spot, vol, days in [(100.05, 25, None), (100.1, 25.1, None),
+					(100.1, 25.1, args[-1] - 0.01), (104, 25, None)]:
+				[call, put] = repricer.price(spot, vol, days)
+				moved[0] = spot
+				if days is not None:
+					moved[-1] = days
+				batch = getattr(mibian.batch, model)(moved, volatility=vol)
+				self.assertTrue(np.allclose(call, batch.callPrice, rtol=0,
+						atol=2e-4))
+				self.assertTrue(np.allclose(put, batch.putPrice, rtol=0,
+						atol=2e-4))
+			stats = repricer.stats()
+			self.assertEqual(stats['expanded'] + stats['repriced'], 4 * 21)
+			# The first move is within the bound, the last one is not
+			self.assertTrue(stats['expanded'] >= 21)
+			self.assertTrue(np.array_equal(call, batch.callPrice))
+
+		# Short dated books stay within tolerance as time passes
+		for model, args in [('GK', [100, strikes, 3, 1, 5]),
+				('BS', [100, strikes, 3, 5]), ('Me', [100, strikes, 3, 4, 5])]:
+			repricer = mibian.taylor.TaylorRepricer(model, args, volatility=25,
+					tolerance=1e-4, maxDaysMove=1)
+			moved = list(args)
+			for tick in range(1, 31):
+				moved[0] = 100 + 0.01 * np.sin(tick)
+				moved[-1] = args[-1] - 0.05 * tick
+				[call, put] = repricer.price(moved[0], 25, moved[-1])
+				batch = getattr(mibian.batch, model)(moved, volatility=25)
+				self.assertTrue(np.allclose(call, batch.callPrice, rtol=0,
+						atol=1e-4))
+				self.assertTrue(np.allclose(put, batch.putPrice, rtol=0,
+						atol=1e-4))
+			self.assertTrue(repricer.stats()['expanded'] > 15 * 21)
+
+		repricer = mibian.taylor.TaylorRepricer('BS', [100, strikes, 3, 30],
+				volatility=25, rebase=False)
+		repricer.price(underlyingPrice=110)
+		repricer.price(underlyingPrice=110)
+		self.assertEqual(repricer.stats(), {'expanded': 0, 'repriced': 42})
+		self.assertRaises(ValueError, mibian.taylor.TaylorRepricer, 'XX',
+				[100, 100, 3, 30], 25)
+
+	def testPortfolio(self):
+		'''Portfolio risk aggregation tests'''
+		positions = [('BS', [81, 75, 6, 60], 30, 10, True, 'XYZ'),
+				('BS', [81, 80, 6, 60], 30, -5, True, 'XYZ'),
+				('BS', [81, 85, 6, 30], 29, 3, False, 'XYZ'),
+				('Me', [81, 80, 6, 1, 60], 25, 7, False, 'XYZ'),
+				('GK', [1.45, 1.4, 1, 2, 30], 20, 1000, False, 'EURUSD')]
+		portfolio = mibian.portfolio.Portfolio()
+		ids = [portfolio.add(*i)[0] for i in positions]
+		portfolio.remove(ids[1])
+		del positions[1]
+		self.assertEqual(len(portfolio), 4)
+
+		expected = {}
+		for model, args, vol, quantity, isCall, underlying in positions:
+			option = getattr(mibian, model)(args, volatility=vol)
+			side = 'call' if isCall else 'put'
+			total = expected.setdefault((underlying, args[-1]),
+					dict((i, 0) for i in mibian.portfolio.FIELDS))
+			total['delta'] += getattr(option, side + 'Delta') * quantity
+			total['vega'] += option.vega * quantity / \
+					(100 if model == 'GK' else 1)
+			if model == 'GK':
+				total['rhoF'] += getattr(option, side + 'RhoF') * quantity
+			else:
+				total['rho'] += getattr(option, side + 'Rho') * quantity
+		risk = portfolio.risk()
+		self.assertEqual(sorted(risk), sorted(expected))
+		for key, total in expected.items():
+			for field in ['delta', 'vega', 'rho', 'rhoF']:
+				self.assertAlmostEqual(risk[key][field], total[field], places=8)
+		self.assertAlmostEqual(portfolio.risk(groupBy=[])[()]['delta'],
+				sum(i['delta'] for i in expected.values()), places=8)
+		self.assertEqual(sorted(portfolio.risk(groupBy=['underlying'])),
+				[('EURUSD',), ('XYZ',)])
+
+		ids = portfolio.add('BS', [81, np.linspace(70, 90, 50), 6, 60],
+				volatility=30, quantity=1, underlying='XYZ')
+		portfolio.remove(ids)
+		portfolio.setUnderlyingPrice('XYZ', 90)
+		option = mibian.BS([90, 75, 6, 60], volatility=30)
+		self.assertAlmostEqual(portfolio.risk()[('XYZ', 60)]['gamma'],
+				option.gamma * 10 + mibian.Me([90, 80, 6, 1, 60],
+				volatility=25).gamma * 7, places=8)
+
+		# Positions without a label are grouped by their current price
+		portfolio = mibian.portfolio.Portfolio()
+		portfolio.add('BS', [81, [75, 80], 6, 60], volatility=30,
+				quantity=[2, 3])
+		portfolio.add('BS', [82, 85, 6, 60], volatility=30, quantity=4)
+		portfolio.setUnderlyingPrice(81, 82)
+		risk = portfolio.risk(groupBy=['underlying'])
+		self.assertEqual(sorted(risk), [(82.0,)])
+		self.assertAlmostEqual(risk[(82.0,)]['delta'], sum(quantity *
+				mibian.BS([82, strike, 6, 60], volatility=30).callDelta
+				for strike, quantity in [(75, 2), (80, 3), (85, 4)]), places=8)
+		portfolio.setUnderlyingPrice(82, 83)
+		self.assertEqual(sorted(portfolio.risk(groupBy=['underlying'])),
+				[(83.0,)])
+
+		# The codes of the prices no position is on are reused
+		for i in range(1000):
+			portfolio.setUnderlyingPrice(83 + i / 100.0, 83 + (i + 1) / 100.0)
+		ids = portfolio.add('BS', [[70, 71], 85, 6, 60], volatility=30,
+				quantity=1)
+		portfolio.remove(ids)
+		self.assertEqual(sorted(portfolio.risk(groupBy=['underlying'])),
+				[(93.0,)])
+		self.assertEqual(len(portfolio._labels), 3)
+
+	def testScenarioGrid(self):
+		'''Spot and volatility scenario grid tests'''
+		strikes = np.array([70, 90, 100, 110, 130])
+		quantity = np.array([10, -5, 3, 1, -2])
+		isCall = np.array([True, False, True, False, True])
+		spotShocks = np.linspace(-0.2, 0.2, 5)
+		volShocks = np.array([-30, -5, 0, 5])
+		for model, args in [('GK', [100, strikes, 3, 1, 30]),
+				('BS', [100, strikes, 3, [30, 30, 60, 90, 365]]),
+				('Me', [100, strikes, 3, 5, 90])]:
+			grid = mibian.scenario.grid(model, args, 25, spotShocks, volShocks,
+					quantity=quantity, isCall=isCall)
+			self.assertEqual(grid.shape, (5, 4, 5))
+			self.assertTrue((grid[2, 2] == 0).all())
+			base = getattr(mibian.batch, model)(args, volatility=25)
+			base = np.where(isCall, base.callPrice, base.putPrice)
+			for i, j in [(0, 1), (4, 3), (1, 0)]:
+				shocked = list(args)
+				shocked[0] = 100 * (1 + spotShocks[i])
+				option = getattr(mibian.batch, model)(shocked,
+						volatility=max(25 + volShocks[j], 1e-12))
+				pnl = (np.where(isCall, option.callPrice, option.putPrice) -
+						base) * quantity
+				self.assertTrue(np.allclose(grid[i, j], pnl, rtol=0,
+						atol=1e-9))
+			self.assertTrue(np.allclose(mibian.scenario.grid(model, args, 25,
+					spotShocks, volShocks, quantity=quantity, isCall=isCall,
+					aggregate=True, chunkSize=2), grid.sum(axis=2), rtol=0,
+					atol=1e-9))
+
+		absolute = mibian.scenario.grid('BS', [100, strikes, 3, 30], 25,
+				[-20, 0, 20], [0], relative=False)
+		self.assertTrue(np.allclose(absolute[:, 0], mibian.scenario.grid('BS',
+				[100, strikes, 3, 30], 25, [-0.2, 0, 0.2], [0])[:, 0]))
+
+	def testServer(self):
+		'''Micro-batching pricing server tests'''
+		server = mibian.server.PricingServer(maxBatchSize=64, maxWait=0.005)
+		loop = asyncio.new_event_loop()
+		address = asyncio.run_coroutine_threadsafe(server.start(port=0), loop)
+		thread = threading.Thread(target=loop.run_forever, daemon=True)
+		thread.start()
+		[host, port] = address.result(10)
+		client = mibian.server.Client(host, port)
+		try:
+			option = mibian.BS([81, 80, 6, 60], volatility=30)
+			result = client.price('BS', [81, 80, 6, 60], 30)
+			for name in ['callPrice', 'putPrice'] + list(mibian.BS._greeks_):
+				self.assertAlmostEqual(result[name], getattr(option, name),
+						places=10)
+			self.assertAlmostEqual(client.impliedVolatility('BS',
+					[52, 60, 5, 30], putPrice=7.86), mibian.impliedVolatility(
+					'BS', [52, 60, 5, 30], putPrice=7.86), places=6)
+
+			# Pipelined requests are batched, a bad one failing alone
+			requests = [{'op': 'price', 'model': 'GK', 'volatility': 20,
+					'args': [1.45, 1.3 + i / 1000.0, 1, 2, 30],
+					'fields': ['callPrice']} for i in range(300)]
+			requests += [{'op': 'impliedVolatility', 'model': 'Me',
+					'args': [52, 60, 5, 5, 30], 'callPrice': 0.5},
+					{'op': 'price', 'model': 'BS', 'args': [81, 0, 6, 60],
+					'volatility': 30}, {'op': 'delta'}]
+			results = client.many(requests, returnExceptions=True)
+			for i in [0, 150, 299]:
+				self.assertAlmostEqual(results[i]['callPrice'], mibian.GK(
+						requests[i]['args'], volatility=20).callPrice, places=10)
+			self.assertAlmostEqual(results[300], mibian.impliedVolatility('Me',
+					[52, 60, 5, 5, 30], callPrice=0.5), places=6)
+			self.assertIsInstance(results[301], ValueError)
+			self.assertIsInstance(results[302], ValueError)
+			stats = client.stats()
+			self.assertEqual(stats['requests'], 305)
+			self.assertEqual(stats['errors'], 2)
+			self.assertLess(stats['batches'], 50)
+			self.assertGreater(stats['latency']['max'], 0)
+
+			# Lines that are not objects fail alone, undefined values are null
+			raw = socket.create_connection((host, port))
+			lines = raw.makefile('rb')
+			try:
+				raw.sendall(b'[1, 2]\n3\n{"id": 7, "op": "price", '
+						b'"model": "BS", "args": [81, 80, 6, 60], '
+						b'"volatility": 30, "fields": ["callPrice"]}\n')
+				responses = [json.loads(lines.readline()) for i in range(3)]
+			finally:
+				lines.close()
+				raw.close()
+			self.assertEqual(responses[:2], [{'id': None,
+					'error': 'request must be an object'}] * 2)
+			self.assertAlmostEqual(responses[2]['result']['callPrice'],
+					option.callPrice, places=10)
+			self.assertEqual(client.price('BS', [81, 80, 6, 60], float('nan'),
+					fields=['callPrice']), {'callPrice': None})
+
+			# A line over the stream limit ends its connection once the
+			# requests before it are answered
+			raw = socket.create_connection((host, port))
+			lines = raw.makefile('rb')
+			try:
+				raw.sendall(b'{"id": 8, "op": "price", "model": "BS", '
+						b'"args": [81, 80, 6, 60], "volatility": 30}\n' +
+						b' ' * 70000 + b'\n')
+				responses = [json.loads(i) for i in lines]
+			finally:
+				lines.close()
+				raw.close()
+			self.assertEqual(sorted(i['id'] is None for i in responses),
+					[False, True])
+		finally:
+			client.close()
+			asyncio.run_coroutine_threadsafe(server.close(), loop).result(10)
+			loop.call_soon_threadsafe(loop.stop)
+			thread.join(10)
+			loop.close()
+
+		# Closing fails the requests not evaluated yet
+		server = mibian.server.PricingServer(maxBatchSize=1000, maxWait=60)
+		loop = asyncio.new_event_loop()
+		address = asyncio.run_coroutine_threadsafe(server.start(port=0), loop)
+		thread = threading.Thread(target=loop.run_forever, daemon=True)
+		thread.start()
+		raw = socket.create_connection(address.result(10))
+		lines = raw.makefile('rb')
+		try:
+			raw.sendall(b''.join(b'{"id": %d, "op": "price", "model": "BS", '
+					b'"args": [81, 80, 6, 60], "volatility": 30}\n' % i
+					for i in range(3)))
+			raw.shutdown(socket.SHUT_WR)
+			while server.stats()['pending'] + len(server._current) < 3:
+				threading.Event().wait(0.01)
+			asyncio.run_coroutine_threadsafe(server.close(), loop).result(10)
+			responses = [json.loads(i) for i in lines]
+		finally:
+			lines.close()
+			raw.close()
+			loop.call_soon_threadsafe(loop.stop)
+			thread.join(10)
+			loop.close()
+		self.assertEqual(sorted(i['id'] for i in responses), [0, 1, 2])
+		self.assertEqual(set(i['error'] for i in responses),
+				{'The server is closing'})
+
+	def testSharedResults(self):
+		'''Shared memory results tests'''
+		batch = mibian.batch.BS([81, [75, 80, 85], 6, 60], volatility=30)
+		results = mibian.shared.create(3, name='mibianTest%d' % os.getpid())
+		try:
+			self.assertEqual(results.sequence, 0)
+			self.assertTrue((results.status == 0).all())
+			results.publish(batch, impliedVolatility=[31, 30, float('nan')])
+			self.assertEqual(results.sequence, 2)
+			self.assertTrue(np.array_equal(results.status, [3, 3, 5]))
+			self.assertTrue(np.isnan(results.callRhoD).all())
+
+			# Readers map the block, live and without copies
+			reader = pickle.loads(pickle.dumps(results))
+			self.assertTrue(np.array_equal(reader.callDelta, batch.callDelta))
+			[snapshot, sequence] = reader.read(['gamma', 'impliedVolatility'])
+			self.assertEqual(sequence, 2)
+			self.assertTrue(np.array_equal(snapshot.gamma, batch.gamma))
+			self.assertEqual(snapshot[1].impliedVolatility, 30)
+			self.assertFalse(reader.changed(sequence))
+			with results.writing():
+				self.assertEqual(reader.sequence, 3)
+				self.assertRaises(TimeoutError, reader.read, timeout=0.01)
+			self.assertTrue(reader.changed(sequence))
+			reader.close()
+		finally:
+			results.close()
+			results.unlink()
+
+		with tempfile.TemporaryDirectory() as directory:
+			path = os.path.join(directory, 'results')
+			results = mibian.shared.create(4, path=path)
+			results.publish(mibian.batch.GK([1.45, [1.4, 1.5], 1, 2, 30],
+					volatility=20), start=2)
+			reader = mibian.shared.attach(path=path)
+			self.assertTrue(np.array_equal(reader.status, [0, 0, 1, 1]))
+			self.assertTrue(np.isnan(reader.callRhoF[:2]).all())
+			self.assertEqual(reader.read()[0][3].callPrice,
+					results.callPrice[3])
+			reader.close()
+			results.close()
+			with open(path, 'wb') as f:
+				f.write(bytes(64))
+			self.assertRaises(ValueError, mibian.shared.attach, path=path)
+
+	def testLattice(self):
+		'''American options lattice tests'''
+		# Without dividends, American calls are European ones
+		args = [81, [75, 80, 85], 6, [30, 60, 365]]
+		american = mibian.lattice.American('BS', args, volatility=30)
+		european = mibian.batch.BS(args, volatility=30)
+		for name in ['callPrice', 'callDelta', 'callTheta']:
+			self.assertTrue(np.allclose(getattr(american, name),
+					getattr(european, name), rtol=0, atol=1e-10))
+		self.assertTrue(np.allclose(american.callGamma, european.gamma,
+				rtol=0, atol=1e-10))
+		self.assertTrue(np.allclose(american.callVega, european.vega,
+				rtol=0, atol=1e-4))
+
+		# Reference American put, from 8000 and 8001 step lattices
+		for method, steps, places in [('binomial', 200, 3),
+				('trinomial', 400, 2)]:
+			test = mibian.lattice.American('BS', [100, 100, 5, 365], 20,
+					steps=steps, method=method)
+			self.assertAlmostEqual(test.putPrice, 6.09041656, places=places)
+		for model, args in [('Me', [100, [90, 100, 110], 2, 4, 180]),
+				('GK', [1.45, [1.4, 1.45, 1.5], 1, 5, 180])]:
+			american = mibian.lattice.American(model, args, 25, steps=100)
+			european = getattr(mibian.batch, model)(args, volatility=25)
+			self.assertTrue((american.callPrice > european.callPrice).all())
+			self.assertTrue((american.putPrice >= european.putPrice).all())
+
+		# Tree deltas against lattice prices
+		test = mibian.lattice.American('BS', [100, [90, 100, 110], 5, 180], 25,
+				steps=400)
+		up = mibian.lattice.American('BS', [100.1, [90, 100, 110], 5, 180], 25,
+				steps=400, performance=True)
+		down = mibian.lattice.American('BS', [99.9, [90, 100, 110], 5, 180],
+				25, steps=400, performance=True)
+		self.assertTrue(np.allclose(test.putDelta, (up.putPrice -
+				down.putPrice) / 0.2, rtol=0, atol=1e-3))
+		self.assertIsNone(up.putVega)
+
+		quotes = mibian.lattice.American('Me', [52, [45, 50, 55], 1, 3, 90],
+				[35, 30, 28], steps=100).putPrice.tolist() + [float('nan')]
+		volatility = mibian.lattice.impliedVolatility('Me', [52,
+				[45, 50, 55, 50], 1, 3, 90], putPrice=quotes, steps=100)
+		self.assertTrue(np.allclose(volatility[:3], [35, 30, 28], atol=1e-6))
+		self.assertTrue(np.isnan(volatility[3]))
+		self.assertRaises(ValueError, mibian.lattice.American, 'BS',
+				[100, 100, 5, 365], 20, method='pentanomial')
+
+	def testMonteCarlo(self):
+		'''Monte Carlo pricing tests'''
+		# The control variate of European options is the option itself
+		option = mibian.Me([52, 50, 1, 1, 90], volatility=30)
+		[price, error, paths] = mibian.montecarlo.price('Me',
+				[52, 50, 1, 1, 90], 30, isCall=False, paths=20000, seed=1)
+		self.assertAlmostEqual(price, option.putPrice, places=10)
+		self.assertEqual(paths, 20000)
+		# Odd chunks are rounded to whole antithetic pairs
+		for [total, chunkSize] in [[20000, 4999], [10002, 3001], [6, 3]]:
+			self.assertEqual(mibian.montecarlo.price('Me', [52, 50, 1, 1, 90],
+					30, paths=total, chunkSize=chunkSize, seed=1)[2], total)
+		self.assertEqual(mibian.montecarlo.price('Me', [52, 50, 1, 1, 90],
+				30, paths=20001, chunkSize=4999, antithetic=False,
+				seed=1)[2], 20001)
+		self.assertRaises(ValueError, mibian.montecarlo.price, 'Me',
+				[52, 50, 1, 1, 90], 30, paths=20001)
+		[price, error, paths] = mibian.montecarlo.price('Me',
+				[52, 50, 1, 1, 90], 30, paths=20000, chunkSize=5000,
+				controlVariate=False, antithetic=False, seed=1)
+		self.assertLess(abs(price - option.callPrice), 4 * error)
+
+		# Variance reduction, reproducible streams whatever the workers
+		args = ['GK', [1.45, 1.45, 1, 2, 180], 20]
+		plain = mibian.montecarlo.price(*args, payoff='asian', steps=30,
+				paths=40000, chunkSize=10000, antithetic=False,
+				controlVariate=False, seed=2)
+		reduced = mibian.montecarlo.price(*args, payoff='asian', steps=30,
+				paths=40000, chunkSize=10000, seed=2)
+		self.assertLess(reduced[1], plain[1] / 1.5)
+		self.assertLess(abs(reduced[0] - plain[0]), 4 * plain[1])
+		self.assertEqual(mibian.montecarlo.price(*args, payoff='asian',
+				steps=30, paths=40000, chunkSize=10000, seed=2, workers=2),
+				reduced)
+		self.assertEqual(mibian.montecarlo.price(*args,
+				payoff=mibian.montecarlo.asian, steps=30, paths=40000,
+				chunkSize=10000, seed=2), reduced)
+
+		# Early stop
+		[price, error, paths] = mibian.montecarlo.price('BS', [81, 80, 6, 60],
+				30, payoff='lookback', isCall=False, steps=20, paths=1000000,
+				chunkSize=10000, targetError=0.01, seed=3)
+		self.assertLessEqual(error, 0.01)
+		self.assertLess(paths, 1000000)
+		self.assertRaises(ValueError, mibian.montecarlo.price, 'BS',
+				[81, 80, 6, 60], 30, payoff='barrier')
+
+	def testVolatilityTracker(self):
+		'''Streaming implied volatility tests'''
+		# Ticks of small moves converge from the last volatility in few steps
+		tracker = mibian.tracker.VolatilityTracker('Me', [52, 50, 1, 1, 30])
+		for i, [underlying, volatility] in enumerate([[52, 30], [52.1, 30.1],
+				[52.05, 30.15], [51.9, 30.1], [52, 30.05]]):
+			price = mibian.Me([underlying, 50, 1, 1, 30],
+					volatility=volatility).callPrice
+			self.assertAlmostEqual(tracker.update(underlying, price),
+					volatility, places=6)
+			self.assertLessEqual(tracker.iterations, 5 if i == 0 else 2)
+		# Jumps fall back to the rational solver, days move expiration
+		price = mibian.Me([52, 50, 1, 1, 20], volatility=60).callPrice
+		self.assertAlmostEqual(tracker.update(52, price, 20), 60, places=6)
+		self.assertEqual(tracker.iterations, 5)
+		tracker = mibian.tracker.VolatilityTracker('GK', [1.45, 1.5, 1, 2, 30],
+				isCall=False, volatility=20)
+		price = mibian.GK([1.46, 1.5, 1, 2, 30], volatility=20.5).putPrice
+		self.assertAlmostEqual(tracker.update(1.46, price), 20.5, places=6)
+		self.assertEqual(tracker.update(1.46, 0.001), 0)
+		# Vegas underflowing to zero fall back to the rational solver, as books
+		tracker = mibian.tracker.VolatilityTracker('BS', [100, 200, 1, 30],
+				volatility=1)
+		self.assertAlmostEqual(tracker.update(100, 0.5),
+				mibian.rational.impliedVolatility('BS', [100, 200, 1, 30],
+				callPrice=0.5), places=8)
+		self.assertEqual(tracker.iterations, 5)
+		book = mibian.tracker.VolatilityBook('BS')
+		book.add('far', [100, 200, 1, 30], volatility=1)
+		self.assertAlmostEqual(book.updateMany(['far'], 100, 0.5)[0],
+				tracker.volatility, places=8)
+
+		# Books of instruments, one at a time or vectorized
+		book = mibian.tracker.VolatilityBook('BS')
+		strikes = [70, 80, 90, 100]
+		for strike in strikes:
+			book.add(('C', strike), [80, strike, 5, 60])
+			book.add(('P', strike), [80, strike, 5, 60], isCall=False)
+		self.assertRaises(KeyError, book.add, ('C', 70), [80, 70, 5, 60])
+		keys = [(side, strike) for side in 'CP' for strike in strikes]
+		volatilities = np.array([32, 30, 29, 31] * 2)
+		for tick, underlying in enumerate([80, 80.3, 79.8]):
+			volatilities = volatilities + 0.05
+			options = mibian.batch.BS([underlying, strikes * 2, 5, 60],
+					volatility=volatilities)
+			prices = np.concatenate([options.callPrice[:4],
+					options.putPrice[4:]])
+			if tick == 1:
+				implied = [book.update(key, underlying, price)
+						for key, price in zip(keys, prices)]
+			else:
+				implied = book.updateMany(keys, underlying, prices)
+			np.testing.assert_allclose(implied, volatilities, atol=1e-6)
+		stats = book.stats()
+		self.assertEqual(stats['updates'], 24)
+		self.assertEqual(stats['fallbacks'], 8)
+		self.assertLessEqual(stats['meanIterations'], 3)
+		self.assertAlmostEqual(book.volatility(('P', 90)), 29.15, places=6)
+		book.remove(('C', 70))
+		self.assertEqual(len(book), 7)
+		self.assertNotIn(('C', 70), book)
+		self.assertAlmostEqual(book.volatility(('P', 100)), 31.15, places=6)
+
+	def testOptionChain(self):
+		'''Option chain tests'''
+		strikes = [45, 50, 55]
+		days = [30, 90]
+		expiries = np.repeat(days, 3)
+		# Chain inputs and the per option inputs of the batch model
+		for className, args, batchArgs in [
+				['BS', [52, [1, 2]], [52, [1] * 3 + [2] * 3]],
+				['GK', [52, 1, [2, 3]], [52, 1, [2] * 3 + [3] * 3]],
+				['Me', [52, 1, 1], [52, 1, 1]]]:
+			chain = mibian.chain.OptionChain(className, args, strikes, days)
+			self.assertEqual(len(chain), 6)
+			batch = getattr(mibian.batch, className)([batchArgs[0],
+					chain.strikePrice] + batchArgs[1:] + [expiries],
+					volatility=25)
+			results = chain.price(25)
+			for field in results.fields:
+				np.testing.assert_allclose(getattr(results, field),
+						getattr(batch, field), rtol=1e-12, atol=1e-15)
+			implied = chain.impliedVolatility(putPrices=results.putPrice,
+					guess=20)
+			np.testing.assert_allclose(implied, 25, rtol=1e-8)
+
+		# Bumps recompute the factors of the changed expiries only
+		chain = mibian.chain.OptionChain('Me', [52, 1, 1], strikes, days)
+		self.assertEqual(chain.update(annualDividends={90: 1.5}), [1, 0])
+		self.assertEqual(chain.update(interestRate=[1, 1.25]), [1, 3])
+		self.assertEqual(chain.update(interestRate=[1, 1.25]), [0, 0])
+		self.assertEqual(chain.update(underlyingPrice=53), [2, 0])
+		self.assertRaises(TypeError, chain.update, foreignRate=1)
+		batch = mibian.batch.Me([53, chain.strikePrice, [1] * 3 + [1.25] * 3,
+				[1] * 3 + [1.5] * 3, chain.daysToExpiration], volatility=30)
+		np.testing.assert_allclose(chain.price(30).callTheta,
+				batch.callTheta, rtol=1e-12)
+		np.testing.assert_allclose(chain.price(30, performance=True).putPrice,
+				batch.putPrice, rtol=1e-12)
+
+		# Strikes per expiry
+		chain = mibian.chain.OptionChain('BS', [81, 6], {30: [75, 80],
+				60: [80, 85, 90]}, [30, 60])
+		self.assertEqual(chain.index(60, 85), 3)
+		self.assertAlmostEqual(chain.price(30).callPrice[3],
+				mibian.BS([81, 85, 6, 60], volatility=30).callPrice, places=10)
+
+	def testSinglePrecision(self):
+		'''Single precision pricing tests'''
+		# Documented error bounds versus float64 over random options
+		generator = np.random.default_rng(5)
+		size = 20000
+		s = generator.uniform(20, 200, size)
+		k = s * np.exp(generator.uniform(-0.7, 0.7, size))
+		days = generator.uniform(1, 730, size)
+		vol = generator.uniform(5, 150, size)
+		r = generator.uniform(0, 10, size)
+		q = generator.uniform(0, 8, size)
+		t = days / 365
+		scales = {'Price': 1e-6 * (s + k), 'Delta': 1e-5, 'Delta2': 1e-5,
+				'exerciceProbability': 1e-5, 'Theta': 1e-5 * (s + k) / 365,
+				'Rho': 1e-5 * (s + k) * t / 100, 'RhoD': 1e-5 * (s + k) * t / 100,
+				'RhoF': 1e-5 * (s + k) * t / 100,
+				'gamma': 1e-5 / (s * vol / 100 * t**0.5)}
+		for model, args in [('GK', [s, k, r, q, days]), ('BS', [s, k, r, days]),
+				('Me', [s, k, r, q * s / 100, days])]:
+			double = getattr(mibian.batch, model)(args, volatility=vol)
+			single = getattr(mibian.batch, model)(args, volatility=vol,
+					dtype=np.float32)
+			scales['vega'] = 1e-5 * (s + k) * t**0.5 / \
+					(1 if model == 'GK' else 100)
+			for name, bound in scales.items():
+				for field in [name] if name in ['exerciceProbability', 'vega',
+						'gamma'] else ['call' + name, 'put' + name]:
+					if getattr(double, field, None) is None:
+						continue
+					self.assertEqual(getattr(single, field).dtype, np.float32)
+					self.assertTrue((np.abs(getattr(single, field) -
+							getattr(double, field)) <= bound).all(), field)
+
+		# Scenario grids: single precision cells, float64 sums
+		strikes = np.array([70, 90, 100, 110, 130])
+		args = [100, strikes, 3, 4, [7, 30, 90, 365, 730]]
+		quantity = [10, -5, 3, 1, -2]
+		isCall = [True, False, True, False, False]
+		spotShocks = np.linspace(-0.3, 0.3, 7)
+		double = mibian.scenario.grid('Me', args, 30, spotShocks, [-10, 0, 10],
+				quantity=quantity, isCall=isCall)
+		single = mibian.scenario.grid('Me', args, 30, spotShocks, [-10, 0, 10],
+				quantity=quantity, isCall=isCall, dtype=np.float32)
+		self.assertEqual(single.dtype, np.float32)
+		bound = 1e-6 * (100 * (1 + spotShocks.reshape(-1, 1, 1)) + strikes) * \
+				np.abs(quantity)
+		self.assertTrue((np.abs(single - double) <= bound).all())
+		total = mibian.scenario.grid('Me', args, 30, spotShocks, [-10, 0, 10],
+				quantity=quantity, isCall=isCall, aggregate=True,
+				dtype=np.float32)
+		self.assertEqual(total.dtype, np.float64)
+		self.assertTrue((np.abs(total - double.sum(axis=2)) <=
+				bound.sum(axis=2)).all())
+
+		# Puts from put-call parity, the difference being taken in float64
+		spots = np.array([80, 100, 120, 200])
+		parity = mibian.scenario._value(spots.astype(np.float32),
+				np.float32(100), np.log(spots / 100).astype(np.float32),
+				np.float32(0.1), False)
+		self.assertEqual(parity.dtype, np.float64)
+		puts = [mibian.scenario.grid('BS', [100, strikes, 3,
+				[30, 90, 180, 365, 730]], 30, spotShocks, [-10, 0, 10],
+				isCall=False, dtype=i) for i in [np.float64, np.float32]]
+		self.assertTrue((np.abs(puts[1] - puts[0]) <= 1e-7 *
+				(100 * (1 + spotShocks.reshape(-1, 1, 1)) + strikes)).all())
+
+		# Aggregated risk and chains
+		book = mibian.portfolio.Portfolio()
+		book.add('BS', [81, [75, 80, 85], 6, 60], volatility=30,
+				quantity=[10, -5, 3], underlying='XYZ')
+		double = book.risk(groupBy=[])[()]
+		single = book.risk(groupBy=[], dtype=np.float32)[()]
+		self.assertEqual(type(single['delta']), float)
+		for name in double:
+			self.assertAlmostEqual(single[name], double[name], places=3)
+		chain = mibian.chain.OptionChain('GK', [1.45, 1, 2], [1.4, 1.5],
+				[30, 90])
+		single = chain.price(20, dtype=np.float32)
+		self.assertEqual(single.values.dtype, np.float32)
+		np.testing.assert_allclose(single.values, chain.price(20).values,
+				rtol=1e-4, atol=1e-6)
+
+	def testLazyImport(self):
+		'''Package import tests, in fresh interpreters'''
+		def run(code):
+			return subprocess.run([sys.executable, '-c', code], check=True,
+					capture_output=True, text=True,
+					cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split()
+		# The pricing core only loads the standard library
+		self.assertEqual(run(
+				'import sys, mibian\n'
+				'mibian.BS([81, 80, 6, 60], volatility=30).callDelta\n'
+				'mibian.impliedVolatility("Me", [52, 50, 1, 1, 30], '
+				'callPrice=3)\n'
+				'mibian.rational.impliedVolatility("BS", [81, 80, 6, 60], '
+				'callPrice=4.8)\n'
+				'print([i in sys.modules for i in ["numpy", "scipy"]])\n'
+				'mibian.batch.BS([81, [80, 85], 6, 60], volatility=30)\n'
+				'print([i in sys.modules for i in ["numpy", "scipy"]])'),
+				['[False,', 'False]', '[True,', 'True]'])
+		# Missing dependencies are reported on first use
+		self.assertEqual(run(
+				'import sys\n'
+				'sys.modules["numpy"] = None\n'
+				'import mibian\n'
+				'try:\n'
+				'	mibian.chain\n'
+				'except ImportError as error:\n'
+				'	print(error.name)'), ['numpy'])
+		self.assertIn('tracker', dir(mibian))
+		self.assertRaises(AttributeError, getattr, mibian, 'missing')
+
+	def testHigherOrderGreeks(self):
+		'''Higher order greeks tests'''
+		# Central differences of the first order greeks, vegas per point
+		def check(model, args, volatility):
+			option = getattr(mibian, model)(args, volatility=volatility)
+			vega = lambda o: o.vega / (100 if model == 'GK' else 1)
+			def bumped(position, step, field):
+				[up, down] = [list(args), list(args)]
+				[up[position], down[position]] = [args[position] + step,
+						args[position] - step]
+				return [getattr(getattr(mibian, model)(i,
+						volatility=volatility), field) for i in [up, down]]
+			def shifted(step, get):
+				return [get(getattr(mibian, model)(args,
+						volatility=volatility + i)) for i in [step, -step]]
+			h = 1e-4
+			[up, down] = shifted(h, lambda o: o.callDelta)
+			self.assertAlmostEqual(option.vanna, (up - down) / (2 * h), places=8)
+			[up, down] = shifted(h, vega)
+			self.assertAlmostEqual(option.volga, (up - down) / (2 * h), places=8)
+			for field, name in [('callDelta', 'callCharm'),
+					('putDelta', 'putCharm'), ('gamma', 'color')]:
+				[up, down] = bumped(-1, h, field)
+				self.assertAlmostEqual(getattr(option, name),
+						(down - up) / (2 * h), places=8)
+			step = args[0] * 1e-5
+			[up, down] = bumped(0, step, 'gamma')
+			self.assertAlmostEqual(option.speed / ((up - down) / (2 * step)),
+					1, places=6)
+		check('BS', [81, 80, 6, 60], 30)
+		check('BS', [81, 95, 6, 10], 45)
+		check('GK', [1.45, 1.4, 1, 3, 30], 20)
+		check('GK', [1.45, 1.55, 4, 1, 200], 12)
+
+		# Me is GK with the dividend yield as foreign rate
+		me = mibian.Me([52, 50, 1, 1, 30], volatility=20)
+		gk = mibian.GK([52, 50, 1, 100 / 52, 30], volatility=20)
+		for name in mibian.HIGHER_ORDER_GREEKS:
+			self.assertAlmostEqual(getattr(me, name), getattr(gk, name),
+					places=12)
+		self.assertEqual(mibian.BS([81, 80, 6, 60]).vanna, None)
+		# Each scalar greek is computed on its own access only
+		bs = mibian.BS([81, 80, 6, 60], volatility=30)
+		bs.vanna
+		for name in mibian.HIGHER_ORDER_GREEKS[1:]:
+			self.assertRaises(AttributeError, getattr(mibian.BS, name).__get__,
+					bs)
+
+		# Vectorized, selected greeks only
+		strikes = [75, 80, 85]
+		c = mibian.batch.Me([52, strikes, 1, 1, 30], volatility=20,
+				higherOrder=True)
+		for i, strike in enumerate(strikes):
+			scalar = mibian.Me([52, strike, 1, 1, 30], volatility=20)
+			for name in mibian.HIGHER_ORDER_GREEKS:
+				self.assertAlmostEqual(getattr(c, name)[i],
+						getattr(scalar, name), places=12)
+		c = mibian.batch.GK([1.45, [1.4, 1.5], 1, 3, 30], volatility=20,
+				higherOrder=['volga', 'color'])
+		self.assertAlmostEqual(c.volga[0],
+				mibian.GK([1.45, 1.4, 1, 3, 30], volatility=20).volga,
+				places=12)
+		self.assertEqual([c.vanna, c.callCharm, c.speed], [None] * 3)
+		self.assertEqual(mibian.batch.BS([81, 80, 6, 60], volatility=30).vanna,
+				None)
+		self.assertRaises(ValueError, mibian.batch.BS, [81, 80, 6, 60], 30,
+				higherOrder=['vomma'])
+
+	def testVolatilitySurface(self):
+		'''Implied volatility surface tests'''
+		strikes = np.array([80, 90, 100, 110, 120])
+		days = np.array([30, 90, 365])
+		vols = 20 + (strikes - 100)**2 / 100 + days.reshape(-1, 1) / 365
+		rates = np.array([[2], [3], [4]])
+		for model, args, surfaceArgs in [
+				('BS', [100, strikes, rates, days.reshape(-1, 1)], [100, rates]),
+				('Me', [100, strikes, rates, 2, days.reshape(-1, 1)],
+						[100, rates, 2]),
+				('GK', [100, strikes, rates, 1, days.reshape(-1, 1)],
+						[100, rates, 1])]:
+			batch = getattr(mibian.batch, model)(args, volatility=vols)
+			surface = mibian.surface.VolatilitySurface(model, surfaceArgs,
+					strikes, days, callPrices=batch.callPrice,
+					putPrices=batch.putPrice)
+			self.assertTrue(np.allclose(surface.callVolatility, vols, atol=1e-6))
+			self.assertTrue(np.allclose(surface.putVolatility, vols, atol=1e-6))
+
+			# A small underlying move re-solves every cell from the previous
+			# volatilities
+			iterations = surface.iterations.sum()
+			self.assertEqual(surface.update(underlyingPrice=100.2), 30)
+			self.assertLess(surface.iterations.sum(), iterations * 0.75)
+			args[0] = 100.2
+			batch = getattr(mibian.batch, model)(args,
+					volatility=surface.putVolatility)
+			self.assertTrue(np.allclose(batch.putPrice, surface.prices[1],
+					rtol=1e-9))
+
+			# A new quote re-solves its cell only
+			volatility = surface.volatility.copy()
+			self.assertEqual(surface.update(putPrices={(90, 110):
+					surface.prices[1, 1, 3] + 0.1}), 1)
+			self.assertGreater(surface.putVolatility[1, 3], volatility[1, 1, 3])
+			volatility[1, 1, 3] = surface.putVolatility[1, 3]
+			self.assertTrue((surface.volatility == volatility).all())
+
+	def testParallel(self):
+		'''Parallel pricing tests'''
+		argsList = [[52, 40 + i, 1, 1, 10 + i] for i in range(40)]
+		volatilities = [20 + i for i in range(40)]
+		serial = [[test.callPrice, test.putPrice, test.callDelta, test.vega]
+				for test in [mibian.Me(args, volatility=v)
+				for args, v in zip(argsList, volatilities)]]
+		results = mibian.parallel.price('Me', argsList, volatilities,
+				fields=['callPrice', 'putPrice', 'callDelta', 'vega'],
+				workers=2, chunkSize=7)
+		self.assertEqual(results, serial)
+		self.assertEqual(len(mibian.parallel.price('Me', argsList[:3],
+				volatilities, workers=1)[0]), 13)
+
+		prices = [row[0] for row in serial]
+		self.assertEqual(mibian.parallel.impliedVolatility('Me', argsList,
+				callPrices=prices, workers=2, chunkSize=7),
+				[mibian.impliedVolatility('Me', args, callPrice=p)
+				for args, p in zip(argsList, prices)])
+
+		argsList[10] = [52, 0, 1, 1, 30]
+		self.assertRaises(ZeroDivisionError, mibian.parallel.price, 'Me',
+				argsList, volatilities, workers=2, chunkSize=7)
+		results = mibian.parallel.price('Me', argsList, volatilities,
+				workers=2, chunkSize=7, returnExceptions=True)
+		self.assertIsInstance(results[10], ZeroDivisionError)
+		self.assertEqual(results[11], mibian.parallel.price('Me',
+				argsList[11:12], volatilities[11:12])[0])
+
+	def testStream(self):
+		'''Streaming file pipeline tests'''
+		strikes = np.linspace(40, 60, 101)
+		test = mibian.batch.Me([52, strikes, 1, 1, 30], volatility=30)
+		with tempfile.TemporaryDirectory() as directory:
+			inputPath = os.path.join(directory, 'quotes.csv')
+			outputPath = os.path.join(directory, 'greeks.csv')
+			with open(inputPath, 'w', newline='') as f:
+				writer = csv.writer(f)
+				writer.writerow(['underlyingPrice', 'strikePrice',
+						'interestRate', 'annualDividends', 'daysToExpiration',
+						'callPrice', 'putPrice'])
+				for i, strike in enumerate(strikes):
+					writer.writerow([52, strike, 1, 1, 30,
+							test.callPrice[i] if i % 2 else '', test.putPrice[i]])
+			self.assertEqual(mibian.stream.run('Me', inputPath, outputPath,
+					batchSize=16), 101)
+			with open(outputPath, newline='') as f:
+				rows = list(csv.DictReader(f))
+			self.assertEqual(len(rows), 101)
+			for i in [35, 50, 51, 65]:
+				self.assertAlmostEqual(float(rows[i]['impliedVolatility']), 30,
+						places=6)
+				self.assertAlmostEqual(float(rows[i]['callDelta']),
+						test.callDelta[i], places=6)
+
+			# Memory-mapped structured arrays
+			inputPath = os.path.join(directory, 'options.npy')
+			data = np.zeros(101, dtype=[('underlyingPrice', 'f8'),
+					('strikePrice', 'f8'), ('interestRate', 'f8'),
+					('annualDividends', 'f8'), ('daysToExpiration', 'f8'),
+					('volatility', 'f8')])
+			data['underlyingPrice'] = 52
+			data['strikePrice'] = strikes
+			data['interestRate'] = data['annualDividends'] = 1
+			data['daysToExpiration'] = 30
+			data['volatility'] = 30
+			np.save(inputPath, data)
+			batches = list(mibian.stream.readBatches(inputPath, 40))
+			self.assertEqual([len(i['strikePrice']) for i in batches],
+					[40, 40, 21])
+			self.assertEqual(mibian.stream.run('Me', inputPath, outputPath,
+					batchSize=40, fields=['callPrice', 'gamma']), 101)
+			with open(outputPath, newline='') as f:
+				rows = list(csv.DictReader(f))
+			self.assertNotIn('impliedVolatility', rows[0])
+			self.assertAlmostEqual(float(rows[70]['gamma']), test.gamma[70])
+
+			# 2D arrays take their column names from columns
+			names = list(data.dtype.names)
+			np.save(inputPath, data.view('f8').reshape(101, 6))
+			batches = list(mibian.stream.readBatches(inputPath, 60, names))
+			self.assertTrue(np.array_equal(batches[1]['strikePrice'],
+					strikes[60:]))
+			for columns in [None, names[:5]]:
+				self.assertRaises(ValueError, list,
+						mibian.stream.readBatches(inputPath, 60, columns))
+			np.save(inputPath, np.zeros(6))
+			self.assertRaises(ValueError, list,
+					mibian.stream.readBatches(inputPath, 60, names))
+
+	def testOptionResults(self):
+		'''Columnar result container tests'''
+		batch = mibian.batch.Me([52, [48, 50, 52], 1, 1, 30], volatility=30)
+		results = mibian.batch.OptionResults.fromBatch(batch)
+		self.assertEqual(len(results), 3)
+		self.assertEqual(results.values.dtype, np.float64)
+		self.assertTrue(results.values.flags['C_CONTIGUOUS'])
+		self.assertEqual(results[1].callPrice, batch.callPrice[1])
+		self.assertEqual(results[-1].asDict()['putRho'], batch.putRho[2])
+		self.assertEqual([row.gamma for row in results],
+				batch.gamma.tolist())
+		self.assertRaises(AttributeError, getattr, results[0], 'callRhoD')
+		self.assertRaises(IndexError, results.__getitem__, 3)
+
+		results = mibian.batch.OptionResults.fromBatch(batch,
+				['callPrice', 'vega'])
+		self.assertEqual(results.fields, ('callPrice', 'vega'))
+		self.assertEqual(results.values.shape, (2, 3))
+
+	def testPricingCache(self):
+		'''Pricing cache tests'''
+		cache = mibian.cache.PricingCache(maxSize=2)
+		test = cache.price('BS', [81, 80, 6, 60], volatility=30)
+		self.assertEqual(test.callPrice, 4.8422936422068901)
+		self.assertIs(cache.price('BS', [81.0, 80, 6, 60.000000000001],
+				volatility=30), test)
+		self.assertAlmostEqual(cache.impliedVolatility('BS', [52, 60, 5, 30],
+				putPrice=7.86), 29.93382250032474)
+		cache.impliedVolatility('BS', [52, 60, 5, 30], callPrice=3)
+		stats = cache.stats()
+		self.assertEqual([stats['hits'], stats['misses'], stats['evictions'],
+				stats['size']], [1, 3, 1, 2])
+
+		cache = mibian.cache.PricingCache(ttl=0)
+		cache.price('GK', [1.4565, 1.45, 1, 2, 30], volatility=20)
+		cache.price('GK', [1.4565, 1.45, 1, 2, 30], volatility=20)
+		self.assertEqual(cache.stats()['expirations'], 1)
+		cache.clear()
+		self.assertEqual(len(cache), 0)
+
+		cache = mibian.cache.PricingCache(maxSize=50)
+		def worker():
+			for i in range(200):
+				cache.price('Me', [52, 50, 1, 1, 30], volatility=20 + i % 70)
+		threads = [threading.Thread(target=worker) for i in range(4)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+		stats = cache.stats()
+		self.assertEqual(stats['hits'] + stats['misses'], 800)
+		self.assertEqual(stats['size'], 50)
+
 if __name__ == '__main__':
 	unittest.main()
 